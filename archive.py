@@ -0,0 +1,271 @@
+import json
+import os
+import sqlite3
+import subprocess
+import threading
+import time
+from extract_cache import extractor_id, normalize_url
+from utils import get_ffprobe_path, get_user_data_dir
+
+# Tipologia di download: lo stesso video può essere archiviato come audio e come video
+KIND_AUDIO = "audio"
+KIND_VIDEO = "video"
+KIND_AUDIO_VIDEO = "av"
+
+AUDIO_EXTS = {"mp3", "m4a", "aac", "opus", "ogg", "oga", "wav", "flac", "wma"}
+MEDIA_EXTS = AUDIO_EXTS | {"mp4", "mkv", "webm", "mov", "avi", "flv", "m4v", "3gp", "ts"}
+
+
+def get_archive_path():
+    return os.path.join(get_user_data_dir(), "download_archive.sqlite3")
+
+
+def make_archive_id(ie_key, video_id):
+    """Stesso formato di yt_dlp.utils.make_archive_id ("youtube <id>")."""
+    return f"{ie_key.lower()} {video_id}"
+
+
+def _folder_key(folder):
+    return os.path.normcase(os.path.abspath(folder))
+
+
+def _probe_tags(path):
+    """Tag del contenitore letti con ffprobe ({} se non disponibile)."""
+    ffprobe = get_ffprobe_path()
+    if not ffprobe:
+        return {}
+    try:
+        result = subprocess.run(
+            [ffprobe, "-v", "quiet", "-print_format", "json", "-show_format", path],
+            capture_output=True,
+            check=True,
+            timeout=30,
+        )
+        data = json.loads(result.stdout or b"{}")
+    except (OSError, subprocess.SubprocessError, ValueError):
+        return {}
+    tags = (data.get("format") or {}).get("tags") or {}
+    return {k.lower(): v for k, v in tags.items()}
+
+
+def _generic_archive_id(url):
+    """Id assegnato dall'extractor generico di yt-dlp (nome del file nell'URL)."""
+    from yt_dlp.extractor.generic import GenericIE
+
+    return make_archive_id("Generic", GenericIE._generic_id(url))
+
+
+def _identify_file(path):
+    """(archive_id, format_id, url) di un file già scaricato, o (None, None, None).
+
+    Usa il sidecar .info.json di yt-dlp se presente, altrimenti l'URL della pagina
+    salvato nei metadati (tag purl/comment scritti da MediaPlanPP).
+    """
+    stem = os.path.splitext(path)[0]
+    info_json = stem + ".info.json"
+    if os.path.isfile(info_json):
+        try:
+            with open(info_json, encoding="utf-8") as handle:
+                info = json.load(handle)
+            if info.get("extractor_key") and info.get("id"):
+                return (
+                    make_archive_id(info["extractor_key"], info["id"]),
+                    info.get("format_id"),
+                    info.get("original_url") or info.get("webpage_url"),
+                )
+        except (OSError, ValueError):
+            pass
+
+    tags = _probe_tags(path)
+    for tag in ("purl", "comment"):
+        url = tags.get(tag, "")
+        if url.startswith(("http://", "https://")):
+            ie_key, video_id = extractor_id(url)
+            if video_id:
+                return make_archive_id(ie_key, video_id), None, url
+            # URL del solo extractor generico: find_url lo cerca per URL normalizzato
+            return _generic_archive_id(url), None, url
+    return None, None, None
+
+
+class DownloadArchive:
+    """Archivio SQLite dei download completati per cartella di destinazione.
+
+    Implementa __contains__/add/__len__ così da poter essere passato come
+    "download_archive" a yt-dlp: le voci di playlist già scaricate vengono
+    saltate prima dell'estrazione.
+    """
+
+    def __init__(self, folder, kind, path=None):
+        self.folder = _folder_key(folder)
+        self.kind = kind
+        self.path = path or get_archive_path()
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS items ("
+            "archive_id TEXT NOT NULL, kind TEXT NOT NULL, folder TEXT NOT NULL, "
+            "url TEXT, format_id TEXT, ext TEXT, filesize INTEGER, path TEXT, "
+            "recorded REAL NOT NULL, PRIMARY KEY (archive_id, kind, folder))"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS items_url ON items(url, kind, folder)"
+        )
+        self._conn.commit()
+
+    def _row_valid(self, row):
+        """Una voce conta solo se il file registrato esiste ancora."""
+        if row is None:
+            return False
+        path = row[0]
+        return path is None or os.path.exists(path)
+
+    def __contains__(self, archive_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT path FROM items WHERE archive_id = ? AND kind = ? AND folder = ?",
+                (archive_id, self.kind, self.folder),
+            ).fetchone()
+        return self._row_valid(row)
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM items WHERE kind = ? AND folder = ?",
+                (self.kind, self.folder),
+            ).fetchone()[0]
+
+    def add(self, archive_id):
+        """Chiamato da yt-dlp (record_download_archive) a download concluso."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO items (archive_id, kind, folder, recorded) "
+                "VALUES (?, ?, ?, ?)",
+                (archive_id, self.kind, self.folder, time.time()),
+            )
+            self._conn.commit()
+
+    def find_url(self, url):
+        """Percorso (o "") del download già presente per l'URL, None se assente.
+
+        Non effettua richieste di rete: l'id viene ricavato dall'URL tramite
+        l'extractor yt-dlp corrispondente, con fallback sull'URL normalizzato.
+        """
+        ie_key, video_id = extractor_id(url)
+        with self._lock:
+            if video_id:
+                row = self._conn.execute(
+                    "SELECT path FROM items "
+                    "WHERE archive_id = ? AND kind = ? AND folder = ?",
+                    (make_archive_id(ie_key, video_id), self.kind, self.folder),
+                ).fetchone()
+            else:
+                row = self._conn.execute(
+                    "SELECT path FROM items WHERE url = ? AND kind = ? AND folder = ?",
+                    (normalize_url(url), self.kind, self.folder),
+                ).fetchone()
+        if not self._row_valid(row):
+            return None
+        return row[0] or ""
+
+    def record(self, info):
+        """Registra un download concluso a partire dall'info dict finale di yt-dlp."""
+        extractor = info.get("extractor_key") or info.get("ie_key")
+        if not extractor or not info.get("id"):
+            return
+        path = info.get("filepath")
+        filesize = None
+        if path and os.path.isfile(path):
+            filesize = os.path.getsize(path)
+        url = info.get("original_url") or info.get("webpage_url")
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO items (archive_id, kind, folder, url, "
+                "format_id, ext, filesize, path, recorded) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    make_archive_id(extractor, info["id"]),
+                    self.kind,
+                    self.folder,
+                    normalize_url(url) if url else None,
+                    info.get("format_id"),
+                    info.get("ext"),
+                    filesize,
+                    os.path.abspath(path) if path else None,
+                    time.time(),
+                ),
+            )
+            self._conn.commit()
+
+    def rebuild(self, progress_callback=None):
+        """Riallinea l'indice con i file presenti nella cartella di destinazione.
+
+        Rimuove le voci il cui file non esiste più e aggiunge i file multimediali
+        riconoscibili non ancora indicizzati. Restituisce (aggiunti, rimossi).
+        """
+        removed = 0
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT archive_id, path FROM items WHERE kind = ? AND folder = ?",
+                (self.kind, self.folder),
+            ).fetchall()
+            known_paths = set()
+            for archive_id, path in rows:
+                if path and not os.path.exists(path):
+                    self._conn.execute(
+                        "DELETE FROM items "
+                        "WHERE archive_id = ? AND kind = ? AND folder = ?",
+                        (archive_id, self.kind, self.folder),
+                    )
+                    removed += 1
+                elif path:
+                    known_paths.add(os.path.normcase(path))
+            self._conn.commit()
+
+        try:
+            names = sorted(os.listdir(self.folder))
+        except OSError:
+            names = []
+        candidates = []
+        for name in names:
+            ext = os.path.splitext(name)[1][1:].lower()
+            path = os.path.join(self.folder, name)
+            if ext not in MEDIA_EXTS or os.path.normcase(path) in known_paths:
+                continue
+            if (self.kind == KIND_AUDIO) != (ext in AUDIO_EXTS):
+                continue
+            if os.path.isfile(path):
+                candidates.append((path, ext))
+
+        added = 0
+        for i, (path, ext) in enumerate(candidates, 1):
+            archive_id, format_id, url = _identify_file(path)
+            if archive_id:
+                with self._lock:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO items (archive_id, kind, folder, url, "
+                        "format_id, ext, filesize, path, recorded) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (
+                            archive_id,
+                            self.kind,
+                            self.folder,
+                            normalize_url(url) if url else None,
+                            format_id,
+                            ext,
+                            os.path.getsize(path),
+                            os.path.abspath(path),
+                            time.time(),
+                        ),
+                    )
+                    self._conn.commit()
+                added += 1
+            if progress_callback:
+                progress_callback(i, len(candidates))
+        return added, removed
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,151 @@
+import threading
+import time
+import re
+from urllib.parse import urlsplit
+
+MB = 1024 * 1024
+DEFAULT_PER_HOST_CONNECTIONS = 4
+# Durata del "burst" consentito dal token bucket, in secondi di banda
+BURST_SECONDS = 0.5
+# Granularità delle attese: l'annullamento viene controllato tra una pausa e l'altra
+_SLEEP_SLICE = 0.2
+# Host[:porta] all'inizio di un URL senza schema (es. 127.0.0.1:8000/v.mp4)
+_BARE_HOST_RE = re.compile(r"^[\w.-]+(?::\d+)?(?:[/?#]|$)")
+
+
+def host_key(url):
+    """Host dell'URL in minuscolo, senza "www." (chiave per i limiti per host).
+
+    Stringa vuota se l'URL non ha un host (es. ricerche yt-dlp): questi URL
+    non hanno limiti per host.
+    """
+    url = url.strip()
+    if "://" not in url and _BARE_HOST_RE.match(url):
+        url = "//" + url
+    host = (urlsplit(url).hostname or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def _parse_minutes(text):
+    hours, minutes = text.strip().split(":")
+    value = int(hours) * 60 + int(minutes)
+    if not 0 <= value <= 24 * 60:
+        raise ValueError(f"Orario non valido: {text}")
+    return value
+
+
+def parse_bandwidth_profiles(text):
+    """Converte "08:00-18:00=2; 22:00-06:00=0" in [(inizio, fine, byte/s)].
+
+    Orari in minuti dalla mezzanotte, limite in MB/s (0 = nessun limite);
+    le fasce possono scavalcare la mezzanotte. Solleva ValueError se il testo
+    non è valido.
+    """
+    profiles = []
+    for part in text.replace(",", ";").split(";"):
+        part = part.strip()
+        if not part:
+            continue
+        try:
+            window, rate = part.split("=")
+            start, end = window.split("-")
+            profiles.append(
+                (_parse_minutes(start), _parse_minutes(end), float(rate) * MB)
+            )
+        except ValueError:
+            raise ValueError(f"Fascia oraria non valida: {part!r}") from None
+    return profiles
+
+
+class BandwidthLimiter:
+    """Token bucket condiviso tra tutti i download attivi.
+
+    Il limite di base si può cambiare a sessione in corso (set_rate); le fasce
+    orarie, se presenti, lo sostituiscono nell'intervallo indicato.
+    """
+
+    def __init__(self, rate=0, profiles=None):
+        self._lock = threading.Lock()
+        self._base_rate = max(0.0, float(rate or 0))
+        self._profiles = list(profiles or [])
+        self._tokens = 0.0
+        self._last = time.monotonic()
+
+    @property
+    def active(self):
+        return self._base_rate > 0 or bool(self._profiles)
+
+    def set_rate(self, rate):
+        with self._lock:
+            self._base_rate = max(0.0, float(rate or 0))
+
+    def set_profiles(self, profiles):
+        with self._lock:
+            self._profiles = list(profiles or [])
+
+    def effective_rate(self, now=None):
+        """Limite attuale in byte/s (0 = nessun limite)."""
+        if self._profiles:
+            local = time.localtime(now)
+            minute = local.tm_hour * 60 + local.tm_min
+            for start, end, rate in self._profiles:
+                inside = (
+                    start <= minute < end if start <= end
+                    else minute >= start or minute < end
+                )
+                if inside:
+                    return rate
+        return self._base_rate
+
+    def consume(self, nbytes, should_stop=None):
+        """Preleva nbytes dal bucket, attendendo se la banda è esaurita."""
+        rate = self.effective_rate()
+        if rate <= 0 or nbytes <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            burst = rate * BURST_SECONDS
+            self._tokens = min(burst, self._tokens + (now - self._last) * rate)
+            self._last = now
+            self._tokens -= nbytes
+            deficit = -self._tokens
+        if deficit <= 0:
+            return
+        deadline = time.monotonic() + deficit / rate
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or (should_stop and should_stop()):
+                return
+            time.sleep(min(remaining, _SLEEP_SLICE))
+
+
+class HostLimiter:
+    """Numero massimo di download contemporanei per host (0 = nessun limite)."""
+
+    def __init__(self, per_host=DEFAULT_PER_HOST_CONNECTIONS):
+        self.per_host = max(0, int(per_host or 0))
+        self._active = {}
+        self._cond = threading.Condition()
+
+    def acquire(self, host, timeout):
+        """Occupa uno slot per l'host; False se non si libera entro timeout."""
+        if not self.per_host or not host:
+            return True
+        with self._cond:
+            if not self._cond.wait_for(
+                lambda: self._active.get(host, 0) < self.per_host, timeout
+            ):
+                return False
+            self._active[host] = self._active.get(host, 0) + 1
+            return True
+
+    def release(self, host):
+        if not self.per_host or not host:
+            return
+        with self._cond:
+            count = self._active.get(host, 0) - 1
+            if count > 0:
+                self._active[host] = count
+            else:
+                self._active.pop(host, None)
+            self._cond.notify_all()
@@ -0,0 +1,743 @@
+"""Benchmark riproducibile del downloader contro un server multimediale locale.
+
+Genera con ffmpeg dei contenuti sintetici (MP4 progressivo, HLS, DASH) della
+dimensione richiesta, li serve da un server HTTP locale e li scarica con
+YtDlpDownloader tramite l'extractor generico di yt-dlp, senza rete esterna.
+Ogni scenario gira in un processo separato, così CPU e picco di memoria
+sono misurati per scenario; i risultati vengono salvati in JSON e possono
+essere confrontati con un riferimento (--baseline) per rilevare regressioni.
+Con --cancel misura invece il tempo tra l'annullamento e la fine del
+downloader durante un download lento, una connessione bloccata e una
+conversione ffmpeg.
+
+Esempio:
+    python benchmark.py --kinds progressive,hls --sizes 4,16 --count 8 \\
+        --concurrency 1,3 --output bench_results.json
+    python benchmark.py --cancel --output cancel_results.json
+"""
+
+import argparse
+import http.server
+import json
+import os
+import platform
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+KIND_PROGRESSIVE = "progressive"
+KIND_HLS = "hls"
+KIND_DASH = "dash"
+KINDS = (KIND_PROGRESSIVE, KIND_HLS, KIND_DASH)
+# Solo audio AAC, lungo: per questo tipo la "dimensione" è la durata in secondi
+KIND_LONG_AUDIO = "longaudio"
+
+MB = 1024 * 1024
+BASE_DURATION = 4  # secondi del clip di partenza
+SEGMENT_SECONDS = 1
+SERVE_CHUNK = 64 * 1024
+# Calo di throughput (relativo) oltre il quale un confronto è una regressione
+DEFAULT_TOLERANCE = 0.15
+# Tempo massimo tra annullamento e fine del downloader prima di segnalare una regressione
+DEFAULT_MAX_CANCEL_LATENCY = 2.0
+# Scenari di annullamento: stato dell'URL in cui si annulla, dopo quanti secondi, cosa si scarica
+CANCEL_SCENARIOS = {
+    # Download limitato dal server: gli hook di progresso vedono l'annullamento
+    "download": {"cancel_on": "downloading", "delay": 1.0, "kind": KIND_PROGRESSIVE,
+                 "size": 64, "rate": 512 * 1024},
+    # Il server smette di inviare dati: la lettura resta bloccata sul socket
+    "stalled": {"cancel_on": "downloading", "delay": 1.0, "kind": KIND_PROGRESSIVE,
+                "size": 16, "rate": 1024},
+    # Conversione MP3 di un audio lungo: ffmpeg va terminato
+    "postprocess": {"cancel_on": "postprocessing", "delay": 1.0, "kind": KIND_LONG_AUDIO,
+                    "size": 3600, "rate": 0, "audio_only": True},
+}
+
+EXIT_OK = 0
+EXIT_REGRESSION = 1
+EXIT_SETUP = 2
+
+_CONTENT_TYPES = {
+    ".mp4": "video/mp4",
+    ".m3u8": "application/vnd.apple.mpegurl",
+    ".ts": "video/mp2t",
+    ".mpd": "application/dash+xml",
+    ".m4s": "video/iso.segment",
+}
+# Pacchetto MPEG-TS nullo (PID 0x1FFF): i demuxer lo ignorano
+_TS_NULL_PACKET = b"\x47\x1f\xff\x10" + b"\xff" * 184
+_TS_PACKET_SIZE = 188
+_MANIFESTS = {
+    KIND_PROGRESSIVE: "media.mp4",
+    KIND_HLS: "index.m3u8",
+    KIND_DASH: "index.mpd",
+    KIND_LONG_AUDIO: "media.mp4",
+}
+
+
+def _ffmpeg_binary():
+    from utils import get_ffmpeg_snapshot
+
+    snap = get_ffmpeg_snapshot()
+    if snap["local_path"]:
+        return snap["local_path"]
+    return shutil.which("ffmpeg") if snap["system"] else None
+
+
+def _pad_mp4(path, size):
+    """Porta il file a size byte aggiungendo un box "free" (ignorato dai lettori)."""
+    current = os.path.getsize(path)
+    extra = size - current
+    if extra < 8:
+        return
+    extra = min(extra, 0xFFFFFFFF)
+    with open(path, "r+b") as handle:
+        handle.seek(current)
+        handle.write(extra.to_bytes(4, "big") + b"free")
+        handle.truncate(current + extra)
+
+
+def _pad_ts(path, size):
+    """Porta il segmento TS a circa size byte con pacchetti nulli."""
+    missing = (size - os.path.getsize(path)) // _TS_PACKET_SIZE
+    if missing <= 0:
+        return
+    with open(path, "ab") as handle:
+        for _ in range(missing):
+            handle.write(_TS_NULL_PACKET)
+
+
+class MediaLibrary:
+    """Contenuti sintetici per tipo e dimensione, generati una volta sola."""
+
+    def __init__(self, root, ffmpeg):
+        self.root = root
+        self.ffmpeg = ffmpeg
+        self._base = None
+
+    def _run_ffmpeg(self, args):
+        subprocess.run(
+            [self.ffmpeg, "-hide_banner", "-loglevel", "error", "-y", *args],
+            check=True,
+            stdout=subprocess.DEVNULL,
+        )
+
+    def base_clip(self):
+        """Clip MP4 breve (video mpeg4 + audio AAC) da cui derivano tutti i contenuti."""
+        if self._base is None:
+            path = os.path.join(self.root, "base.mp4")
+            self._run_ffmpeg([
+                "-f", "lavfi", "-i", f"testsrc=size=320x240:rate=25:duration={BASE_DURATION}",
+                "-f", "lavfi", "-i", f"sine=frequency=440:duration={BASE_DURATION}",
+                "-c:v", "mpeg4", "-q:v", "5", "-c:a", "aac", "-shortest", path,
+            ])
+            self._base = path
+        return self._base
+
+    def directory(self, kind, size_mb):
+        """Cartella con i file del contenuto (la crea al primo uso)."""
+        folder = os.path.join(self.root, kind, f"{size_mb:g}")
+        if os.path.isdir(folder):
+            return folder
+        temp = folder + ".tmp"
+        shutil.rmtree(temp, ignore_errors=True)
+        os.makedirs(temp)
+        size = int(size_mb * MB)
+        if kind == KIND_LONG_AUDIO:
+            self._run_ffmpeg([
+                "-f", "lavfi", "-i", f"sine=frequency=440:duration={size_mb:g}",
+                "-c:a", "aac", "-b:a", "64k", os.path.join(temp, _MANIFESTS[kind]),
+            ])
+            os.replace(temp, folder)
+            return folder
+        base = self.base_clip()
+        if kind == KIND_PROGRESSIVE:
+            path = os.path.join(temp, _MANIFESTS[kind])
+            shutil.copyfile(base, path)
+            _pad_mp4(path, size)
+        elif kind == KIND_HLS:
+            self._run_ffmpeg([
+                "-i", base, "-c", "copy", "-f", "hls",
+                "-hls_time", str(SEGMENT_SECONDS), "-hls_list_size", "0",
+                "-hls_segment_filename", os.path.join(temp, "seg%03d.ts"),
+                os.path.join(temp, _MANIFESTS[kind]),
+            ])
+            segments = sorted(n for n in os.listdir(temp) if n.endswith(".ts"))
+            for name in segments:
+                _pad_ts(os.path.join(temp, name), size // len(segments))
+        else:
+            self._run_ffmpeg([
+                "-i", base, "-map", "0:v", "-map", "0:a", "-c", "copy", "-f", "dash",
+                "-seg_duration", str(SEGMENT_SECONDS),
+                "-init_seg_name", "init-$RepresentationID$.m4s",
+                "-media_seg_name", "chunk-$RepresentationID$-$Number%05d$.m4s",
+                os.path.join(temp, _MANIFESTS[kind]),
+            ])
+            chunks = sorted(n for n in os.listdir(temp) if n.startswith("chunk-"))
+            for name in chunks:
+                path = os.path.join(temp, name)
+                _pad_mp4(path, os.path.getsize(path) + size // len(chunks))
+        os.replace(temp, folder)
+        return folder
+
+
+class _MediaHandler(http.server.BaseHTTPRequestHandler):
+    """/<tipo>/<MB>/<n>/<file>: ogni n è un URL distinto con lo stesso contenuto.
+
+    ?rate=<byte/s> sostituisce la banda del server per quella richiesta.
+    """
+
+    protocol_version = "HTTP/1.1"
+    _PATH_RE = re.compile(r"^/(\w+)/([\d.]+)/(\d+)/([\w.-]+)$")
+
+    def log_message(self, format, *args):
+        pass
+
+    def _resolve(self):
+        match = self._PATH_RE.match(self.path.split("?", 1)[0])
+        if not match or match.group(1) not in KINDS + (KIND_LONG_AUDIO,):
+            return None
+        kind, size, _, name = match.groups()
+        if name.startswith("item"):
+            name = _MANIFESTS[kind]
+        folder = self.server.library.directory(kind, float(size))
+        path = os.path.join(folder, name)
+        return path if os.path.isfile(path) else None
+
+    def _send(self, head_only):
+        path = self._resolve()
+        if path is None:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        size = os.path.getsize(path)
+        start, end = 0, size - 1
+        match = re.match(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+        if match and int(match.group(1)) < size:
+            start = int(match.group(1))
+            if match.group(2):
+                end = min(int(match.group(2)), size - 1)
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        else:
+            self.send_response(200)
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.send_header(
+            "Content-Type",
+            _CONTENT_TYPES.get(os.path.splitext(path)[1], "application/octet-stream"),
+        )
+        self.end_headers()
+        if head_only:
+            return
+        rate = self.server.rate
+        query = re.search(r"[?&]rate=([\d.]+)", self.path)
+        if query:
+            rate = float(query.group(1))
+        with open(path, "rb") as handle:
+            handle.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = handle.read(min(SERVE_CHUNK, remaining))
+                if not chunk:
+                    break
+                try:
+                    self.wfile.write(chunk)
+                except OSError:
+                    return
+                remaining -= len(chunk)
+                self.server.count(len(chunk))
+                if rate:
+                    time.sleep(len(chunk) / rate)
+
+    def do_GET(self):
+        self._send(False)
+
+    def do_HEAD(self):
+        self._send(True)
+
+
+class MediaServer(http.server.ThreadingHTTPServer):
+    """Server HTTP locale; rate limita la banda di ogni connessione (byte/s, 0 = no)."""
+
+    daemon_threads = True
+
+    def __init__(self, library, rate=0):
+        super().__init__(("127.0.0.1", 0), _MediaHandler)
+        self.library = library
+        self.rate = rate
+        self.bytes_served = 0
+        self._lock = threading.Lock()
+
+    def handle_error(self, request, client_address):
+        # Connessioni chiuse dal client (download annullati, ripetizioni): non sono errori
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    def count(self, nbytes):
+        with self._lock:
+            self.bytes_served += nbytes
+
+    def url(self, kind, size_mb, index, rate=None):
+        ext = os.path.splitext(_MANIFESTS[kind])[1]
+        host, port = self.server_address[:2]
+        url = f"http://{host}:{port}/{kind}/{size_mb:g}/{index}/item{index}{ext}"
+        return url if rate is None else f"{url}?rate={rate:g}"
+
+
+def _peak_rss():
+    """Picco di memoria residente del processo corrente, in byte (None se ignoto)."""
+    if sys.platform == "win32":
+        import ctypes
+        from ctypes import wintypes
+
+        class _Counters(ctypes.Structure):
+            _fields_ = [
+                ("cb", wintypes.DWORD),
+                ("PageFaultCount", wintypes.DWORD),
+                ("PeakWorkingSetSize", ctypes.c_size_t),
+                ("WorkingSetSize", ctypes.c_size_t),
+                ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                ("PagefileUsage", ctypes.c_size_t),
+                ("PeakPagefileUsage", ctypes.c_size_t),
+            ]
+
+        counters = _Counters()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(
+            process, ctypes.byref(counters), counters.cb
+        ):
+            return counters.PeakWorkingSetSize
+        return None
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux riporta KiB, macOS byte
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _download_options(scenario, output_path):
+    return {
+        "urls": scenario["urls"],
+        "audio_only": scenario.get("audio_only", False),
+        "audio_format": "mp3",
+        "video_only": False,
+        "quality": "best",
+        "output_path": output_path,
+        "subs": False,
+        "simulate": False,
+        "concurrency": scenario.get("concurrency", 1),
+        "fragment_concurrency": scenario.get("fragments", 0),
+        "per_host_connections": 0,  # tutti gli URL sono sullo stesso host locale
+        "extract_cache": False,
+        "archive": False,
+        "job_queue": False,
+        "log_file": False,
+        "throughput_history": False,
+    }
+
+
+def run_scenario(scenario):
+    """Esegue un download di prova nel processo corrente e restituisce le misure."""
+    from PySide6.QtCore import Qt
+    from downloader import YtDlpDownloader
+    from utils import get_ffmpeg_snapshot
+
+    get_ffmpeg_snapshot()  # rilevamento di ffmpeg fuori dalla misura
+    output_path = tempfile.mkdtemp(prefix="yt-dlp-gui-bench-")
+    options = _download_options(scenario, output_path)
+    errors = []
+    worker = YtDlpDownloader(options)
+    worker.log_signal.connect(
+        lambda text: errors.extend(
+            line for line in text.split("\n") if line.startswith("[ERRORE]")
+        ),
+        Qt.DirectConnection,
+    )
+    cpu_before = os.times()
+    started = time.perf_counter()
+    try:
+        worker.run()
+    finally:
+        elapsed = time.perf_counter() - started
+        cpu_after = os.times()
+        shutil.rmtree(output_path, ignore_errors=True)
+    cpu = sum(
+        getattr(cpu_after, field) - getattr(cpu_before, field)
+        for field in ("user", "system", "children_user", "children_system")
+    )
+    summary = worker.summary()
+    return {
+        "elapsed": elapsed,
+        "succeeded": summary["succeeded"],
+        "failed": summary["failed"],
+        "phases": summary["phases"],
+        "cpu_seconds": cpu,
+        "peak_rss": _peak_rss(),
+        "errors": errors[:5],
+    }
+
+
+def run_cancel_scenario(scenario):
+    """Annulla un download di prova nello stato indicato e misura quanto impiega a fermarsi.
+
+    La latenza va da request_stop() al ritorno di run(); dopo l'annullamento
+    non devono restare processi ffmpeg né file temporanei delle conversioni.
+    """
+    from PySide6.QtCore import Qt
+    import cancellation
+    from downloader import YtDlpDownloader
+    from utils import get_ffmpeg_snapshot
+
+    get_ffmpeg_snapshot()
+    output_path = tempfile.mkdtemp(prefix="yt-dlp-gui-bench-")
+    worker = YtDlpDownloader(_download_options(scenario, output_path))
+    stop = {}
+
+    def cancel():
+        stop["requested"] = time.perf_counter()
+        worker.request_stop()
+
+    def on_status(index, status):
+        if status == scenario["cancel_on"] and "timer" not in stop:
+            stop["timer"] = threading.Timer(scenario["delay"], cancel)
+            stop["timer"].start()
+
+    worker.item_status_signal.connect(on_status, Qt.DirectConnection)
+    try:
+        worker.run()
+        finished = time.perf_counter()
+        temp_files = [name for name in os.listdir(output_path) if ".temp." in name]
+    finally:
+        if "timer" in stop:
+            stop["timer"].cancel()
+        shutil.rmtree(output_path, ignore_errors=True)
+    summary = worker.summary()
+    requested = stop.get("requested")
+    return {
+        # None: l'URL si è concluso prima dell'annullamento
+        "latency": finished - requested if requested is not None else None,
+        "cancelled": summary["cancelled"],
+        "succeeded": summary["succeeded"],
+        "running_processes": cancellation.running_processes(),
+        "temp_files": len(temp_files),
+    }
+
+
+def _run_child(scenario):
+    """Esegue lo scenario in un processo Python separato (misure isolate)."""
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--scenario", json.dumps(scenario)],
+        capture_output=True,
+        text=True,
+    )
+    lines = [line for line in result.stdout.splitlines() if line.startswith("{")]
+    if result.returncode != 0 or not lines:
+        tail = (result.stderr or result.stdout).strip().splitlines()[-3:]
+        raise RuntimeError(f"scenario fallito: {' | '.join(tail)}")
+    return json.loads(lines[-1])
+
+
+def scenario_key(result):
+    return (
+        f"{result['kind']}/{result['size_mb']:g}MB/x{result['count']}"
+        f"/c{result['concurrency']}/f{result['fragments']}"
+    )
+
+
+def _measure(server, kind, size_mb, count, concurrency, fragments, repeat):
+    runs = []
+    for _ in range(repeat):
+        scenario = {
+            "urls": [server.url(kind, size_mb, i) for i in range(1, count + 1)],
+            "concurrency": concurrency,
+            "fragments": fragments,
+        }
+        served = server.bytes_served
+        run = _run_child(scenario)
+        run["bytes"] = server.bytes_served - served
+        runs.append(run)
+    # Mediana sul tempo: una ripetizione disturbata non sposta il risultato
+    run = sorted(runs, key=lambda r: r["elapsed"])[len(runs) // 2]
+    elapsed = max(run["elapsed"], 1e-9)
+    result = {
+        "kind": kind,
+        "size_mb": size_mb,
+        "count": count,
+        "concurrency": concurrency,
+        "fragments": fragments,
+        "repeat": repeat,
+        "elapsed": round(elapsed, 3),
+        "bytes": run["bytes"],
+        "mb_per_s": round(run["bytes"] / MB / elapsed, 2),
+        "items_per_min": round(run["succeeded"] * 60 / elapsed, 1),
+        "succeeded": run["succeeded"],
+        "failed": run["failed"],
+        "cpu_seconds": round(run["cpu_seconds"], 2),
+        "cpu_percent": round(run["cpu_seconds"] / elapsed * 100, 1),
+        "peak_rss_mb": round(run["peak_rss"] / MB, 1) if run["peak_rss"] else None,
+        "phases": run["phases"],
+        "errors": run["errors"],
+    }
+    result["key"] = scenario_key(result)
+    return result
+
+
+def _measure_cancel(server, name, repeat):
+    spec = CANCEL_SCENARIOS[name]
+    scenario = {
+        "urls": [server.url(spec["kind"], spec["size"], 1, spec["rate"] or None)],
+        "cancel_on": spec["cancel_on"],
+        "delay": spec["delay"],
+        "audio_only": spec.get("audio_only", False),
+    }
+    runs = [_run_child(scenario) for _ in range(repeat)]
+    latencies = sorted(r["latency"] for r in runs if r["latency"] is not None)
+    complete = len(latencies) == len(runs)
+    return {
+        "key": f"cancel/{name}",
+        "scenario": name,
+        "repeat": repeat,
+        "latency": round(latencies[len(latencies) // 2], 3) if complete else None,
+        "latency_max": round(latencies[-1], 3) if complete else None,
+        "cancelled": sum(1 for r in runs if r["cancelled"]),
+        "running_processes": max(r["running_processes"] for r in runs),
+        "temp_files": max(r["temp_files"] for r in runs),
+    }
+
+
+def cancel_problems(results, max_latency):
+    """Scenari di annullamento troppo lenti o che lasciano processi/file temporanei."""
+    problems = []
+    for result in results:
+        if result["latency_max"] is None:
+            problems.append((result["key"], "concluso prima dell'annullamento"))
+        elif result["latency_max"] > max_latency:
+            problems.append(
+                (result["key"], f"fermo dopo {result['latency_max']:.2f}s (max {max_latency:g}s)")
+            )
+        if result["running_processes"]:
+            problems.append((result["key"], f"{result['running_processes']} processi ancora attivi"))
+        if result["temp_files"]:
+            problems.append((result["key"], f"{result['temp_files']} file temporanei rimasti"))
+    return problems
+
+
+def compare(results, baseline, tolerance):
+    """Scenari il cui throughput è sceso oltre la tolleranza rispetto al riferimento."""
+    reference = {r["key"]: r for r in baseline.get("results", [])}
+    regressions = []
+    for result in results:
+        old = reference.get(result["key"])
+        if not old or not old.get("mb_per_s"):
+            continue
+        change = result["mb_per_s"] / old["mb_per_s"] - 1
+        if change < -tolerance or result["failed"] > old.get("failed", 0):
+            regressions.append((result["key"], old["mb_per_s"], result["mb_per_s"], change))
+    return regressions
+
+
+def _csv_numbers(text, cast):
+    try:
+        return [cast(part) for part in text.split(",") if part.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Elenco non valido: {text}") from None
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="benchmark.py",
+        description="Benchmark di YtDlpDownloader contro un server multimediale locale.",
+    )
+    parser.add_argument(
+        "--kinds",
+        default=",".join(KINDS),
+        help="tipi di contenuto: progressive, hls, dash (separati da virgola)",
+    )
+    parser.add_argument(
+        "--sizes",
+        type=lambda text: _csv_numbers(text, float),
+        default=[4.0, 16.0],
+        help="dimensioni per URL in MB, es. 4,16",
+    )
+    parser.add_argument("--count", type=int, default=8, help="URL per scenario")
+    parser.add_argument(
+        "--concurrency",
+        type=lambda text: _csv_numbers(text, int),
+        default=[1, 3],
+        help="download paralleli da provare, es. 1,3,6",
+    )
+    parser.add_argument(
+        "--fragments", type=int, default=0, help="frammenti paralleli (0 = automatico)"
+    )
+    parser.add_argument(
+        "--server-rate",
+        type=float,
+        default=0,
+        metavar="MB/S",
+        help="banda per connessione del server locale (0 = nessun limite)",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=1, help="ripetizioni per scenario (vale la mediana)"
+    )
+    parser.add_argument(
+        "-o", "--output", default="bench_results.json", help="file JSON dei risultati"
+    )
+    parser.add_argument("--baseline", help="risultati di riferimento da confrontare")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=DEFAULT_TOLERANCE,
+        help="calo di MB/s tollerato rispetto al riferimento (0.15 = 15%%)",
+    )
+    parser.add_argument(
+        "--cancel",
+        action="store_true",
+        help="misura la latenza di annullamento invece del throughput",
+    )
+    parser.add_argument(
+        "--cancel-scenarios",
+        default=",".join(CANCEL_SCENARIOS),
+        help="con --cancel: download, stalled, postprocess (separati da virgola)",
+    )
+    parser.add_argument(
+        "--max-cancel-latency",
+        type=float,
+        default=DEFAULT_MAX_CANCEL_LATENCY,
+        metavar="S",
+        help="con --cancel: secondi oltre i quali l'annullamento è una regressione",
+    )
+    parser.add_argument("--scenario", help=argparse.SUPPRESS)
+    return parser
+
+
+def _run_throughput_scenarios(server, kinds, args):
+    results = []
+    for kind in kinds:
+        for size_mb in args.sizes:
+            server.library.directory(kind, size_mb)
+            for concurrency in args.concurrency:
+                try:
+                    result = _measure(
+                        server, kind, size_mb, max(1, args.count),
+                        max(1, concurrency), max(0, args.fragments),
+                        max(1, args.repeat),
+                    )
+                except RuntimeError as e:
+                    print(f"[ERRORE] {kind} {size_mb:g} MB c{concurrency}: {e}")
+                    continue
+                results.append(result)
+                failed = f", {result['failed']} falliti" if result["failed"] else ""
+                print(
+                    f"{result['key']:<32} {result['mb_per_s']:>8.2f} MB/s "
+                    f"{result['items_per_min']:>7.1f} URL/min  "
+                    f"CPU {result['cpu_percent']:>5.1f}%  "
+                    f"RSS {result['peak_rss_mb'] or 0:>6.1f} MB  "
+                    f"{result['elapsed']:.2f}s{failed}"
+                )
+    return results
+
+
+def _run_cancel_scenarios(server, names, repeat):
+    results = []
+    for name in names:
+        spec = CANCEL_SCENARIOS[name]
+        server.library.directory(spec["kind"], spec["size"])
+        try:
+            result = _measure_cancel(server, name, repeat)
+        except RuntimeError as e:
+            print(f"[ERRORE] annullamento {name}: {e}")
+            continue
+        results.append(result)
+        latency = result["latency"]
+        shown = f"{latency * 1000:>8.0f} ms" if latency is not None else f"{'-':>8} ms"
+        print(
+            f"{result['key']:<32} {shown}  processi {result['running_processes']}"
+            f"  file temporanei {result['temp_files']}"
+        )
+    return results
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.scenario:
+        scenario = json.loads(args.scenario)
+        run = run_cancel_scenario if "cancel_on" in scenario else run_scenario
+        print(json.dumps(run(scenario)))
+        return EXIT_OK
+
+    if args.cancel:
+        kinds = [k.strip() for k in args.cancel_scenarios.split(",") if k.strip()]
+        unknown = [k for k in kinds if k not in CANCEL_SCENARIOS]
+        if unknown:
+            print(f"[ERRORE] Scenari di annullamento non validi: {', '.join(unknown)}")
+            return EXIT_SETUP
+    else:
+        kinds = [k.strip() for k in args.kinds.split(",") if k.strip()]
+        unknown = [k for k in kinds if k not in KINDS]
+        if unknown:
+            print(f"[ERRORE] Tipi di contenuto non validi: {', '.join(unknown)}")
+            return EXIT_SETUP
+    ffmpeg = _ffmpeg_binary()
+    if not ffmpeg:
+        print("[ERRORE] ffmpeg non trovato: serve per generare i contenuti di prova")
+        return EXIT_SETUP
+
+    import yt_dlp.version
+
+    workdir = tempfile.mkdtemp(prefix="yt-dlp-gui-media-")
+    server = MediaServer(MediaLibrary(workdir, ffmpeg), args.server_rate * MB)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        if args.cancel:
+            results = _run_cancel_scenarios(server, kinds, max(1, args.repeat))
+        else:
+            results = _run_throughput_scenarios(server, kinds, args)
+    finally:
+        server.shutdown()
+        server.server_close()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "yt_dlp": yt_dlp.version.__version__,
+            "server_rate_mb_s": args.server_rate,
+        },
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as handle:
+        json.dump(report, handle, indent=2)
+    print(f"[OK] Risultati salvati in {args.output}")
+
+    if args.cancel:
+        problems = cancel_problems(results, args.max_cancel_latency)
+        for key, problem in problems:
+            print(f"[ATTENZIONE] Annullamento {key}: {problem}")
+        return EXIT_REGRESSION if problems else EXIT_OK
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as handle:
+            regressions = compare(results, json.load(handle), args.tolerance)
+        for key, old, new, change in regressions:
+            print(f"[ATTENZIONE] Regressione {key}: {old:.2f} -> {new:.2f} MB/s ({change:+.0%})")
+        if regressions:
+            return EXIT_REGRESSION
+    return EXIT_OK
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+import socket
+import threading
+import weakref
+from yt_dlp.downloader import external as external_fd
+from yt_dlp.postprocessor import ffmpeg as ffmpeg_pp
+from yt_dlp.utils import Popen
+
+# Attributi che collegano le risposte HTTP di yt-dlp al socket
+# (adattatori requests/urllib -> urllib3 -> http.client -> BufferedReader -> SocketIO)
+_SOCKET_CHAIN = ("fp", "_fp", "raw")
+_SOCKET_DEPTH = 8
+
+_processes = weakref.WeakSet()
+_processes_lock = threading.Lock()
+
+
+class TrackedPopen(Popen):
+    """Popen di yt-dlp che registra i processi figli (ffmpeg, ffprobe...) per poterli terminare."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        with _processes_lock:
+            _processes.add(self)
+
+
+def install():
+    """Fa avviare i processi di post-processor e downloader esterni tramite TrackedPopen."""
+    ffmpeg_pp.Popen = TrackedPopen
+    external_fd.Popen = TrackedPopen
+
+
+def _running():
+    with _processes_lock:
+        return [proc for proc in _processes if proc.poll() is None]
+
+
+def running_processes():
+    """Processi avviati da yt-dlp ancora in esecuzione."""
+    return len(_running())
+
+
+def kill_processes():
+    """Termina i processi avviati da yt-dlp ancora in esecuzione; restituisce quanti."""
+    killed = 0
+    for proc in _running():
+        try:
+            proc.kill()
+            killed += 1
+        except OSError:
+            pass
+    return killed
+
+
+def response_socket(response):
+    """Socket sottostante a una risposta HTTP di yt-dlp, se ancora aperto."""
+    obj = response
+    for _ in range(_SOCKET_DEPTH):
+        sock = getattr(obj, "_sock", None)
+        if isinstance(sock, socket.socket):
+            return sock
+        obj = next(
+            (getattr(obj, name) for name in _SOCKET_CHAIN if getattr(obj, name, None) is not None),
+            None,
+        )
+        if obj is None:
+            return None
+    return None
+
+
+def interrupt_response(response):
+    """Chiude la connessione di una risposta: una read() bloccata in un altro
+    thread termina subito con errore invece di attendere il timeout."""
+    sock = response_socket(response)
+    if sock is None:
+        return False
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        return False
+    return True
@@ -0,0 +1,429 @@
+import argparse
+import json
+import os
+import signal
+import stat
+import sys
+import threading
+import time
+from dataclasses import asdict
+
+# Codici di uscita della modalità headless
+EXIT_OK = 0
+EXIT_FAILED = 1  # almeno un URL non scaricato
+EXIT_USAGE = 2  # argomenti o file di input non validi
+EXIT_CANCELLED = 130  # interrotto (Ctrl+C / SIGTERM)
+
+
+def build_parser():
+    from defaults import POLICY_FIFO, SCHEDULING_POLICIES
+
+    parser = argparse.ArgumentParser(
+        prog="yt-dlp-gui",
+        description="yt-dlp GUI - senza argomenti avvia l'interfaccia grafica.",
+    )
+    parser.add_argument(
+        "--headless",
+        action="store_true",
+        help="esegue i download senza interfaccia, con progresso JSON-lines su stdout",
+    )
+    parser.add_argument("urls", nargs="*", help="URL da scaricare")
+    parser.add_argument(
+        "-i",
+        "--input",
+        help="file con gli URL (testo, uno per riga, o CSV; '-' per stdin)",
+    )
+    parser.add_argument(
+        "-o", "--output", default=os.getcwd(), help="cartella di destinazione"
+    )
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--audio-only", action="store_true", help="solo audio")
+    mode.add_argument("--video-only", action="store_true", help="solo video")
+    parser.add_argument(
+        "--audio-format",
+        choices=("mp3", "original"),
+        default="mp3",
+        help="con --audio-only: mp3 (ricodifica) o original (copia del flusso audio)",
+    )
+    parser.add_argument(
+        "-q", "--quality", default="best", help="best, worst, 1080p, 720p, 480p..."
+    )
+    parser.add_argument("--subs", action="store_true", help="scarica i sottotitoli")
+    parser.add_argument(
+        "--simulate",
+        action="store_true",
+        help="non scarica nulla: stima byte, durata e spazio necessario e segnala gli URL non risolvibili",
+    )
+    parser.add_argument(
+        "-j", "--concurrency", type=int, default=None, help="download paralleli"
+    )
+    parser.add_argument(
+        "--extract-concurrency", type=int, default=None, help="estrazioni parallele"
+    )
+    parser.add_argument(
+        "--fragments",
+        type=int,
+        default=0,
+        help="frammenti HLS/DASH in parallelo per download (0 = automatico)",
+    )
+    parser.add_argument(
+        "--ffmpeg-cores",
+        type=int,
+        default=None,
+        help="core dedicati a merge/conversioni ffmpeg (predefinito: tutti meno uno)",
+    )
+    parser.add_argument(
+        "--limit-rate",
+        type=float,
+        default=0,
+        metavar="MB/S",
+        help="banda totale per tutti i download (0 = nessun limite)",
+    )
+    parser.add_argument(
+        "--bandwidth-profile",
+        default="",
+        metavar="FASCE",
+        help="limiti per fascia oraria in MB/s, es. \"08:00-18:00=2; 18:00-08:00=0\"",
+    )
+    parser.add_argument(
+        "--per-host",
+        type=int,
+        default=None,
+        help="download contemporanei massimi per host (0 = nessun limite)",
+    )
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=None,
+        help="nuovi tentativi per URL dopo errori temporanei come 429, 5xx e timeout (0 = nessuno)",
+    )
+    parser.add_argument(
+        "--schedule",
+        choices=SCHEDULING_POLICIES,
+        default=POLICY_FIFO,
+        help="ordine della coda: fifo (come indicati), sjf (prima i più brevi), priority, fair",
+    )
+    parser.add_argument(
+        "--commands",
+        metavar="FILE",
+        help=(
+            "comandi JSON-lines durante il download (file, FIFO o '-' per stdin), es. "
+            '{"command": "priority", "index": 3, "priority": 5} o '
+            '{"command": "schedule", "policy": "sjf"}'
+        ),
+    )
+    parser.add_argument(
+        "--scratch-dir",
+        default="",
+        metavar="CARTELLA",
+        help="scarica ed elabora in questa cartella locale, poi sposta i file nella destinazione",
+    )
+    parser.add_argument(
+        "--buffer-size",
+        type=int,
+        default=0,
+        metavar="KB",
+        help="buffer di lettura iniziale dei download HTTP (0 = predefinito di yt-dlp)",
+    )
+    parser.add_argument(
+        "--http-chunk-size",
+        type=float,
+        default=0,
+        metavar="MB",
+        help="scarica i file HTTP a blocchi di questa dimensione (0 = richiesta unica)",
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true", help="non usa la cache delle estrazioni"
+    )
+    parser.add_argument(
+        "--no-archive", action="store_true", help="non salta gli URL già scaricati"
+    )
+    parser.add_argument(
+        "--no-log-file", action="store_true", help="non scrive il log di sessione"
+    )
+    parser.add_argument(
+        "--metrics-out",
+        action="append",
+        default=[],
+        metavar="FILE",
+        help="a fine sessione salva le metriche per URL (.json o .csv, ripetibile)",
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        default=None,
+        help="espone le metriche in formato Prometheus su http://127.0.0.1:PORTA/metrics",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="riprende l'ultima sessione interrotta (chiusura o crash)",
+    )
+    return parser
+
+
+def _read_urls(args):
+    """URL dagli argomenti e dal file di input (letto in streaming), senza duplicati."""
+    from url_ingest import UrlIngest, iter_file_urls, iter_text_urls
+
+    ingest = UrlIngest()
+    ingest.extend(iter_text_urls(args.urls, strict=False))
+    if args.input == "-":
+        ingest.extend(iter_text_urls(sys.stdin))
+    elif args.input:
+        ingest.extend(iter_file_urls(args.input))
+    return ingest
+
+
+class JsonLinesReporter:
+    """Scrive gli eventi del downloader come JSON, uno per riga (thread-safe)."""
+
+    def __init__(self, stream, urls):
+        self._stream = stream
+        self._urls = urls
+        self._lock = threading.Lock()
+
+    def emit(self, event, **fields):
+        line = json.dumps({"event": event, **fields}, ensure_ascii=False)
+        with self._lock:
+            self._stream.write(line + "\n")
+            self._stream.flush()
+
+    def on_log(self, text):
+        for line in text.split("\n"):
+            if line.strip():
+                self.emit("log", message=line)
+
+    def on_status(self, index, status):
+        self.emit("status", index=index, url=self._urls[index - 1], status=status)
+
+    def on_progress(self, event):
+        self.emit("progress", **asdict(event))
+
+
+def _resume_options():
+    from jobqueue import JobQueue
+
+    jobs = JobQueue()
+    try:
+        batches = jobs.interrupted_batches()
+        return jobs.resume_batch(batches[0]["id"]) if batches else None
+    finally:
+        jobs.close()
+
+
+def _build_options(args, reporter):
+    from bandwidth import (
+        DEFAULT_PER_HOST_CONNECTIONS,
+        MB,
+        parse_bandwidth_profiles,
+    )
+    from defaults import (
+        DEFAULT_CONCURRENCY,
+        DEFAULT_EXTRACT_CONCURRENCY,
+        DEFAULT_RETRIES,
+        MAX_RETRIES,
+    )
+
+    try:
+        ingest = _read_urls(args)
+    except OSError as e:
+        reporter.emit("error", message=f"Impossibile leggere {args.input}: {e}")
+        return None
+    urls = ingest.urls
+    if ingest.duplicates or ingest.skipped:
+        reporter.emit("log", message=f"[INFO] URL in coda: {ingest.describe()}")
+    if not urls:
+        reporter.emit("error", message="Nessun URL indicato")
+        return None
+    try:
+        profiles = parse_bandwidth_profiles(args.bandwidth_profile)
+    except ValueError as e:
+        reporter.emit("error", message=str(e))
+        return None
+
+    output_path = os.path.abspath(args.output)
+    if not args.simulate and (
+        not os.path.isdir(output_path) or not os.access(output_path, os.W_OK)
+    ):
+        reporter.emit(
+            "error",
+            message=(
+                "Cartella di destinazione inesistente o non scrivibile: "
+                f"{output_path}"
+            ),
+        )
+        return None
+
+    return {
+        "urls": urls,
+        "audio_only": args.audio_only,
+        "audio_format": args.audio_format,
+        "video_only": args.video_only,
+        "quality": args.quality,
+        "output_path": output_path,
+        "subs": args.subs,
+        "simulate": args.simulate,
+        "concurrency": args.concurrency or DEFAULT_CONCURRENCY,
+        "extract_concurrency": args.extract_concurrency or DEFAULT_EXTRACT_CONCURRENCY,
+        "fragment_concurrency": max(args.fragments, 0),
+        "ffmpeg_cores": args.ffmpeg_cores,
+        "rate_limit": max(args.limit_rate, 0) * MB,
+        "bandwidth_profiles": profiles,
+        "per_host_connections": (
+            DEFAULT_PER_HOST_CONNECTIONS if args.per_host is None else args.per_host
+        ),
+        "retries": (
+            DEFAULT_RETRIES if args.retries is None else min(max(args.retries, 0), MAX_RETRIES)
+        ),
+        "schedule": args.schedule,
+        "scratch_dir": os.path.abspath(args.scratch_dir) if args.scratch_dir else "",
+        "buffersize": max(args.buffer_size, 0) * 1024,
+        "http_chunk_size": int(max(args.http_chunk_size, 0) * MB),
+        "extract_cache": not args.no_cache,
+        "archive": not args.no_archive,
+        "log_file": not args.no_log_file,
+    }
+
+
+def _apply_command(worker, command):
+    """Esegue un comando di --commands; restituisce il messaggio di errore o None."""
+    name = command.get("command") if isinstance(command, dict) else None
+    if name == "priority":
+        index, priority = command.get("index"), command.get("priority", 0)
+        if not isinstance(index, int) or not isinstance(priority, int):
+            return "priority: index e priority devono essere interi"
+        if not worker.set_priority(index, priority):
+            return "priority: nessuna sessione in corso"
+        return None
+    if name == "schedule":
+        if not worker.set_policy(command.get("policy")):
+            return f"schedule: ordine non valido: {command.get('policy')}"
+        return None
+    return f"comando sconosciuto: {name}"
+
+
+def _read_commands(path, worker, reporter, started, done):
+    """Applica i comandi JSON-lines di path fino alla fine della sessione.
+
+    Una FIFO viene riaperta dopo ogni scrittore, così i comandi possono
+    arrivare da più processi uno dopo l'altro.
+    """
+    started.wait()
+    while not done.is_set():
+        try:
+            stream = sys.stdin if path == "-" else open(path, encoding="utf-8")
+        except OSError as e:
+            reporter.emit("error", message=f"Impossibile leggere {path}: {e}")
+            return
+        for line in stream:
+            line = line.strip()
+            if done.is_set():
+                break
+            if not line or line.startswith("#"):
+                continue
+            try:
+                error = _apply_command(worker, json.loads(line))
+            except ValueError:
+                error = f"comando non valido: {line}"
+            if error:
+                reporter.emit("error", message=error)
+        if stream is not sys.stdin:
+            stream.close()
+        try:
+            is_fifo = path != "-" and stat.S_ISFIFO(os.stat(path).st_mode)
+        except OSError:
+            is_fifo = False
+        if not is_fifo:
+            return
+
+
+def _raise_interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+def run_headless(args):
+    """Esegue il download senza widget Qt; restituisce il codice di uscita."""
+    from PySide6.QtCore import Qt
+    from downloader import YtDlpDownloader
+    from metrics import MetricsServer
+
+    reporter = JsonLinesReporter(sys.stdout, [])
+    if args.commands == "-" and args.input == "-":
+        reporter.emit("error", message="--input e --commands non possono usare entrambi stdin")
+        return EXIT_USAGE
+    if args.resume:
+        options = _resume_options()
+        if options is None:
+            reporter.emit("error", message="Nessuna sessione interrotta da riprendere")
+            return EXIT_USAGE
+    else:
+        options = _build_options(args, reporter)
+        if options is None:
+            return EXIT_USAGE
+
+    worker = YtDlpDownloader(options)
+    # worker.urls cresce con le voci delle playlist espanse durante la sessione
+    reporter = JsonLinesReporter(sys.stdout, worker.urls)
+    # Nessun event loop Qt: i segnali vanno consegnati nel thread che li emette
+    worker.log_signal.connect(reporter.on_log, Qt.DirectConnection)
+    worker.item_status_signal.connect(reporter.on_status, Qt.DirectConnection)
+    worker.item_progress_signal.connect(reporter.on_progress, Qt.DirectConnection)
+
+    metrics_server = None
+    if args.metrics_port is not None:
+        try:
+            metrics_server = MetricsServer(args.metrics_port, lambda: worker.metrics)
+        except OSError as e:
+            reporter.emit("error", message=f"Porta metriche non disponibile: {e}")
+            return EXIT_USAGE
+        metrics_server.start()
+        host, port = metrics_server.server_address[:2]
+        reporter.emit("metrics", url=f"http://{host}:{port}/metrics")
+
+    done = threading.Event()
+    started = threading.Event()
+    worker.session_started.connect(started.set, Qt.DirectConnection)
+    if args.commands:
+        threading.Thread(
+            target=_read_commands,
+            args=(args.commands, worker, reporter, started, done),
+            name="headless-commands",
+            daemon=True,
+        ).start()
+
+    def run_worker():
+        try:
+            worker.run()
+        finally:
+            done.set()
+
+    signal.signal(signal.SIGTERM, _raise_interrupt)
+    thread = threading.Thread(target=run_worker, name="yt-dlp-headless")
+    thread.start()
+    # Attesa con sleep: un Thread.join interrotto da Ctrl+C può tornare in anticipo
+    try:
+        while not done.is_set():
+            time.sleep(0.2)
+    except KeyboardInterrupt:
+        # Gli URL non completati restano in coda per "--resume"
+        worker.request_stop(resumable=True)
+        while not done.is_set():
+            time.sleep(0.2)
+    thread.join()
+    if metrics_server is not None:
+        metrics_server.stop()
+
+    for path in args.metrics_out:
+        try:
+            worker.metrics.export(path)
+        except OSError as e:
+            reporter.emit("error", message=f"Impossibile salvare le metriche in {path}: {e}")
+
+    summary = worker.summary()
+    reporter.emit("summary", **summary)
+    if summary["cancelled"]:
+        return EXIT_CANCELLED
+    if summary["failed"]:
+        return EXIT_FAILED
+    return EXIT_OK
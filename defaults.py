@@ -0,0 +1,24 @@
+import os
+
+# Valori predefiniti condivisi da GUI, CLI e downloader. Il modulo non importa
+# yt-dlp: la finestra li usa prima che i moduli pesanti siano caricati.
+
+DEFAULT_CONCURRENCY = 3
+MAX_CONCURRENCY = 16
+DEFAULT_EXTRACT_CONCURRENCY = 4
+# Nuovi tentativi per URL dopo un errore temporaneo (429, 5xx, timeout)
+DEFAULT_RETRIES = 3
+MAX_RETRIES = 10
+# Core dedicati a ffmpeg (merge/conversioni): uno resta libero per UI e download
+DEFAULT_FFMPEG_CORES = max(1, (os.cpu_count() or 2) - 1)
+
+AUDIO_FORMAT_MP3 = "mp3"
+AUDIO_FORMAT_ORIGINAL = "original"  # copia del flusso audio, senza ricodifica
+AUDIO_FORMATS = (AUDIO_FORMAT_MP3, AUDIO_FORMAT_ORIGINAL)
+
+# Ordine in cui gli URL in coda vengono estratti e scaricati
+POLICY_FIFO = "fifo"  # ordine di inserimento
+POLICY_SJF = "sjf"  # prima i più brevi
+POLICY_PRIORITY = "priority"  # priorità manuale
+POLICY_FAIR = "fair"  # a turno tra i proprietari dei batch
+SCHEDULING_POLICIES = (POLICY_FIFO, POLICY_SJF, POLICY_PRIORITY, POLICY_FAIR)
@@ -1,7 +1,88 @@
 from PySide6.QtCore import QObject, Signal
 from yt_dlp import YoutubeDL
+from yt_dlp.postprocessor import PostProcessor
+from yt_dlp.utils import PagedList, PostProcessingError
+from concurrent.futures import ThreadPoolExecutor
+import math
 import os
+import threading
 import time
+import weakref
+import cancellation
+from archive import KIND_AUDIO, KIND_AUDIO_VIDEO, KIND_VIDEO, DownloadArchive
+from bandwidth import (
+    DEFAULT_PER_HOST_CONNECTIONS,
+    MB,
+    BandwidthLimiter,
+    HostLimiter,
+    host_key,
+)
+from defaults import (
+    AUDIO_FORMAT_MP3,
+    DEFAULT_CONCURRENCY,
+    DEFAULT_EXTRACT_CONCURRENCY,
+    DEFAULT_FFMPEG_CORES,
+    DEFAULT_RETRIES,
+    MAX_CONCURRENCY,
+    POLICY_FIFO,
+    POLICY_SJF,
+)
+from extract_cache import ExtractionCache, cache_key, normalize_url
+from fragments import FRAGMENTS_AUTO, MAX_FRAGMENT_CONCURRENCY, FragmentTuner
+from jobqueue import (
+    JOB_CANCELLED,
+    JOB_DONE,
+    JOB_DOWNLOADING,
+    JOB_EXTRACTING,
+    JOB_FAILED,
+    JOB_PENDING,
+    JOB_POSTPROCESSING,
+    JobQueue,
+)
+from log_sink import LogSink, new_session_log_path
+from media_plan import MediaPlanPP, claim_merge
+from metrics import SessionMetrics
+from planner import (
+    MAX_LOGGED_FAILURES,
+    RATE_HISTORY,
+    RATE_LIMIT,
+    BatchPlan,
+    ThroughputHistory,
+    describe_plan,
+    output_size,
+    planned_size,
+    probe_size,
+)
+from progress import (
+    PROGRESS_EVENT_INTERVAL,
+    PROGRESS_LOG_INTERVAL,
+    STATUS_CANCELLED,
+    STATUS_DONE,
+    STATUS_DOWNLOADING,
+    STATUS_EXTRACTING,
+    STATUS_FAILED,
+    STATUS_MOVING,
+    STATUS_PLAYLIST,
+    STATUS_POSTPROCESSING,
+    STATUS_QUEUED,
+    STATUS_RETRYING,
+    STATUS_SKIPPED,
+    ProgressEvent,
+    format_bytes,
+    format_eta,
+    format_speed,
+)
+from retry import CircuitBreaker, RetryScheduler, backoff_delay, classify_error
+from scheduling import Job, PolicyQueue, job_cost
+from staging import (
+    SCRATCH_SIZE_FACTOR,
+    StagingArea,
+    estimated_size,
+    free_space,
+    move_file,
+    planned_moves,
+    staging_dir,
+)
 from utils import (
     get_ffmpeg_location_for_ytdlp,
     get_ffmpeg_snapshot,
@@ -9,24 +90,661 @@ from utils import (
     sanitize_log_text,
 )
 
+# URL estratti in anticipo per ogni worker di download (limita memoria e
+# scadenza degli URL firmati restituiti dagli extractor)
+EXTRACT_LOOKAHEAD = 2
+# Con l'ordine sjf serve una finestra più ampia di URL già estratti tra cui scegliere
+SJF_LOOKAHEAD = 6
+# Attesa massima di uno slot per host prima di rimettere l'URL in coda
+HOST_WAIT_SLICE = 0.2
+# Voci di playlist accodate e non ancora estratte (per tutte le playlist): le
+# pagine successive vengono richieste solo quando la coda si svuota
+PLAYLIST_PREFETCH = 32
+PLAYLIST_LOG_INTERVAL = 100  # voci
+# Rimandi "url" seguiti durante l'estrazione (es. canale -> scheda dei video)
+MAX_URL_REDIRECTS = 3
+
+CANCEL_MESSAGE = "Download annullato dall'utente"
+
+# Stato persistito nella coda per ciascuno stato del downloader
+_JOB_STATES = {
+    STATUS_RETRYING: JOB_PENDING,
+    STATUS_EXTRACTING: JOB_EXTRACTING,
+    STATUS_DOWNLOADING: JOB_DOWNLOADING,
+    STATUS_POSTPROCESSING: JOB_POSTPROCESSING,
+    STATUS_MOVING: JOB_POSTPROCESSING,
+    STATUS_DONE: JOB_DONE,
+    STATUS_SKIPPED: JOB_DONE,
+    STATUS_FAILED: JOB_FAILED,
+    STATUS_CANCELLED: JOB_CANCELLED,
+}
+
+
+class _ArchiveRecorderPP(PostProcessor):
+    """Registra nell'archivio i download conclusi, dopo lo spostamento finale."""
+
+    def __init__(self, archive, downloader=None):
+        super().__init__(downloader)
+        self._archive = archive
+
+    def run(self, info):
+        self._archive.record(info)
+        return [], info
+
+
+class _StagingPP(PostProcessor):
+    """Prima dei nomi file: sceglie se scaricare nella cartella temporanea (formati già scelti)."""
+
+    def __init__(self, downloader, stage):
+        super().__init__(downloader)
+        self._stage = stage
+
+    def run(self, info):
+        self._stage(self._downloader, info)
+        return [], info
+
+
+class _PipelineYoutubeDL(YoutubeDL):
+    """YoutubeDL che accoda il post-processing invece di eseguirlo subito.
+
+    Merge, conversioni, spostamento finale e registrazione nell'archivio
+    vengono eseguiti dal pool ffmpeg con run_deferred, così il worker passa
+    subito al download successivo. Le risposte HTTP aperte sono tracciate:
+    interrupt() le chiude per annullare subito estrazioni e download.
+    """
+
+    def __init__(self, params):
+        super().__init__(params)
+        self.deferred = []
+        self.cancelled = lambda: False
+        self._responses = weakref.WeakSet()
+        self._responses_lock = threading.Lock()
+
+    def urlopen(self, req):
+        if self.cancelled():
+            raise ValueError(CANCEL_MESSAGE)
+        response = super().urlopen(req)
+        with self._responses_lock:
+            self._responses.add(response)
+        return response
+
+    def interrupt(self):
+        """Chiude le connessioni aperte: le letture in corso terminano con errore."""
+        with self._responses_lock:
+            responses = list(self._responses)
+        return sum(cancellation.interrupt_response(r) for r in responses)
+
+    def post_process(self, filename, info, files_to_move=None):
+        info["filepath"] = filename
+        # Copia: al ritorno yt-dlp rimuove dall'info dict i campi del video
+        self.deferred.append((filename, dict(info), files_to_move))
+        return info
+
+    def record_download_archive(self, info_dict):
+        # L'archivio viene aggiornato da _ArchiveRecorderPP a post-processing concluso
+        pass
+
+    def run_deferred(self, filename, info, files_to_move, staged=False):
+        """Esegue il post-processing; con staged=True si ferma prima dello spostamento.
+
+        I file restano nella cartella temporanea: li sposta il mover, poi
+        finish_deferred completa i passaggi successivi (archivio).
+        """
+        claim_merge(info)
+        if not staged:
+            return super().post_process(filename, info, files_to_move)
+        info["filepath"] = filename
+        info["__files_to_move"] = files_to_move or {}
+        return self.run_all_pps(
+            "post_process", info, additional_pps=info.get("__postprocessors")
+        )
+
+    def finish_deferred(self, info, final_path):
+        info["filepath"] = final_path
+        info.pop("__files_to_move", None)
+        return self.run_all_pps("after_move", info)
+
+
+def _iter_entries(entries):
+    """Itera le voci di una playlist senza risolverle tutte in anticipo.
+
+    Le PagedList di yt-dlp scaricano una pagina alla volta; la cache delle
+    pagine è disattivata perché ogni voce viene letta una sola volta.
+    """
+    if entries is None:
+        return iter(())
+    if isinstance(entries, PagedList):
+        entries._use_cache = False
+        return entries._getslice(0, None)
+    return iter(entries)
+
+
+def _entry_url(entry):
+    if entry.get("_type") in ("url", "url_transparent"):
+        return entry.get("url")
+    return entry.get("webpage_url") or entry.get("original_url") or entry.get("url")
+
+
+class _ItemState:
+    """Stato di progresso dell'URL in download su un worker.
+
+    Gli hook lo ricevono esplicitamente: con i frammenti paralleli yt-dlp li
+    invoca dai thread dei frammenti, non dal worker.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset(0, "", 1)
+
+    def reset(self, index, host, fragments):
+        self.index = index
+        self.host = host
+        self.fragments = fragments
+        self.fragment_count = None
+        self.throttle_file = None
+        self.throttle_bytes = 0
+        self.base_bytes = 0
+        self.item_total = None
+        self.peak_speed = None
+        self.speed_time = None
+        self.speed_bytes = 0
+        self.last_event = 0.0
+        self.last_progress_log = time.monotonic()
+
+
+class _Batch:
+    """URL aggiunti insieme con le stesse opzioni (un avvio, un'aggiunta o una ripresa)."""
+
+    def __init__(self, options):
+        self.options = options
+        # Indice di sessione del primo URL meno uno: idx nella coda persistente
+        # = indice di sessione - offset
+        self.offset = 0
+        self.batch_id = options.get("batch_id")
+        # Proprietario per la politica "fair": indicato nelle opzioni o uno per batch
+        self.owner = options.get("owner") or ""
+        self.archive = None
+        self.staging = None
+        # Sottocartella della cartella temporanea per questa destinazione
+        self.temp_dir = ""
+        self.ydl_opts = None
+
+    @property
+    def kind(self):
+        if self.options["audio_only"]:
+            return KIND_AUDIO
+        if self.options["video_only"]:
+            return KIND_VIDEO
+        return KIND_AUDIO_VIDEO
+
+    @property
+    def profile(self):
+        """Chiave delle istanze YoutubeDL riutilizzabili da batch con le stesse opzioni."""
+        o = self.options
+        return (
+            o["output_path"],
+            o["quality"],
+            o["audio_only"],
+            o["video_only"],
+            o.get("audio_format", AUDIO_FORMAT_MP3),
+            o["subs"],
+            o["simulate"],
+            self.archive is not None,
+            self.temp_dir,
+            o.get("buffersize"),
+            o.get("http_chunk_size"),
+        )
+
+
 class YtDlpDownloader(QObject):
+    """Servizio di download che resta attivo tra una sessione e l'altra.
+
+    Pool di thread, istanze YoutubeDL (connessioni HTTP, cookie, extractor
+    già caricati), cache e archivi vengono riutilizzati. Una sessione inizia
+    quando arriva un batch a servizio inattivo e termina quando la coda si
+    svuota; add_batch() aggiunge URL anche a sessione in corso. Con
+    persistent=False (headless, benchmark) run() termina con la prima sessione,
+    altrimenti con shutdown().
+    """
+
     log_signal = Signal(str)
     progress_signal = Signal(int, int)  # (current, total)
+    item_status_signal = Signal(int, str)  # (indice URL 1-based, stato)
+    item_progress_signal = Signal(object)  # ProgressEvent
+    session_started = Signal()
+    session_finished = Signal()
     finished = Signal()
 
-    def __init__(self, options):
+    def __init__(self, options, persistent=False):
         super().__init__()
+        # ffmpeg e ffprobe avviati da yt-dlp devono poter essere terminati da request_stop
+        cancellation.install()
+        self.persistent = persistent
+        # Opzioni dell'ultimo batch: concorrenza, banda e simili valgono per il servizio
         self.options = options
-        self.current_url_index = 0
-        self.total_urls = len(options["urls"])
+        # URL della sessione per indice (1-based): cresce con i batch aggiunti e
+        # con le voci delle playlist
+        self.urls = []
+        # Download reali: le playlist espanse sono sostituite dalle loro voci
+        self.total_urls = 0
         self.stop_requested = False
-        self._last_progress_log = 0.0
-        self._last_progress_pct = ""
+        # Se True, gli URL non completati restano in coda per il prossimo avvio
+        self.resume_on_restart = False
+        self._lock = threading.Lock()
+        self._lookahead = None
+        self._lookahead_size = 0
+        self._playlist_slots = threading.Semaphore(PLAYLIST_PREFETCH)
+        # URL (normalizzati) e id delle voci già in sessione, per non accodarli due volte
+        self._seen = set()
+        self._local = threading.local()
+        self._item_batches = []
+        self._batches = []
+        self._incoming = [_Batch(options)]
+        self._session_active = False
+        self._shutdown = False
+        # Istanze YoutubeDL libere per profilo di opzioni, tutte chiuse allo shutdown
+        self._free_ydls = {}
+        self._ydl_instances = []
+        self._archives = {}
+        self._staging_areas = {}
+        # URL scaricati nella cartella temporanea: indice -> (area, byte riservati)
+        self._staged = {}
+        # Nuovi tentativi: attese su un thread dedicato, interruttori per host,
+        # tentativi per URL e URL in attesa (stato già segnalato)
+        self._scheduler = None
+        self._breakers = CircuitBreaker()
+        self._attempts = {}
+        self._waiting = set()
+        self._retry_total = 0
+        # URL in attesa dei pool di estrazione e download, nell'ordine della
+        # politica scelta; priorità impostate a sessione in corso
+        self._extract_queue = PolicyQueue()
+        self._download_queue = PolicyQueue()
+        self._priorities = {}
+        # Istante di ingresso in coda di ogni URL (latenza di completamento)
+        self._enqueued = {}
+        # Simulazione: dimensioni dei formati scelti e velocità delle ultime sessioni
+        self._plan = BatchPlan()
+        self._plan_report = None
+        self._throughput = ThroughputHistory()
+        self._completed = 0
+        self._success_count = 0
+        self._errore_rilevato = False
+        self._annullato = False
+        self._skipped_count = 0
+        self._failed_count = 0
+        self._elapsed = 0.0
+        self._session_started = 0.0
+        self._phase_totals = {}
+        # Tempi, byte e velocità per URL (esportabili in JSON/CSV/Prometheus)
+        self.metrics = SessionMetrics()
+        self._cache = None
+        self._sink = None
+        self._jobs = None
+        self._download_pool = None
+        self._extract_pool = None
+        self._pp_pool = None
+        self._pool_config = None
+        # URL accodati (estrazione, download o post-processing) e non ancora conclusi
+        self._outstanding = 0
+        self._idle = threading.Condition(self._lock)
+        self._bandwidth = BandwidthLimiter()
+        self._hosts = HostLimiter()
+        self._fragment_tuner = FragmentTuner()
+        self._apply_settings(options)
+
+    def _apply_settings(self, options):
+        """Impostazioni di servizio dal batch più recente.
+
+        Banda e fasce orarie valgono subito; concorrenza, connessioni per host
+        e core ffmpeg dalla prossima sessione, a pool inattivi.
+        """
+        self.options = options
+        self.concurrency = max(
+            1, min(int(options.get("concurrency", DEFAULT_CONCURRENCY)), MAX_CONCURRENCY)
+        )
+        self.extract_concurrency = max(
+            1,
+            min(
+                int(options.get("extract_concurrency", DEFAULT_EXTRACT_CONCURRENCY)),
+                MAX_CONCURRENCY,
+            ),
+        )
+        # Frammenti paralleli per HLS/DASH: valore fisso o FRAGMENTS_AUTO
+        self.fragment_concurrency = max(
+            0,
+            min(
+                int(options.get("fragment_concurrency", FRAGMENTS_AUTO)),
+                MAX_FRAGMENT_CONCURRENCY,
+            ),
+        )
+        # Budget di core per ffmpeg: limita i post-processing paralleli e i
+        # thread di ciascuno, per non saturare la CPU
+        self.ffmpeg_cores = max(
+            1, int(options.get("ffmpeg_cores") or DEFAULT_FFMPEG_CORES)
+        )
+        self.postprocess_workers = min(self.concurrency, self.ffmpeg_cores)
+        self.per_host_connections = options.get(
+            "per_host_connections", DEFAULT_PER_HOST_CONNECTIONS
+        )
+        self._bandwidth.set_rate(options.get("rate_limit", 0))
+        self._bandwidth.set_profiles(options.get("bandwidth_profiles"))
+        self.set_policy(options.get("schedule", POLICY_FIFO))
 
     def _log(self, msg):
-        self.log_signal.emit(sanitize_log_text(msg))
+        if self._sink is not None:
+            self._sink.write(sanitize_log_text(msg))
+        else:
+            self.log_signal.emit(sanitize_log_text(msg))
+
+    def _prefix(self, index=None):
+        """Prefisso [i/N] del URL indicato o del worker corrente (vuoto se URL singolo).
+
+        N conta anche le playlist espanse: è la posizione nella sessione.
+        """
+        count = len(self.urls)
+        if count > 1:
+            if index is None:
+                index = getattr(self._local, "index", 0)
+            return f"[{index}/{count}] "
+        return ""
+
+    def _batch(self, index):
+        return self._item_batches[index - 1]
+
+    def _set_job_state(self, index, state, error=None):
+        batch = self._batch(index)
+        if self._jobs is not None and batch.batch_id is not None:
+            try:
+                self._jobs.set_state(batch.batch_id, index - batch.offset, state, error)
+            except Exception as e:
+                self._log(f"[WARN] Coda persistente non aggiornata: {e}")
+
+    def _set_status(self, index, status, error=None):
+        if status in _JOB_STATES:
+            self._set_job_state(index, _JOB_STATES[status], error)
+        self.item_status_signal.emit(index, status)
+
+    def add_batch(self, options):
+        """Accoda nuovi URL (thread-safe): si uniscono alla sessione in corso o ne aprono una.
+
+        Dopo un annullamento il batch attende la fine della sessione annullata.
+        """
+        with self._idle:
+            if self._shutdown:
+                return False
+            self._incoming.append(_Batch(options))
+            self._idle.notify_all()
+        return True
+
+    def request_stop(self, resumable=False):
+        """Annulla la sessione; con resumable=True gli URL restano da riprendere.
+
+        Non attende i worker: chiude le connessioni HTTP aperte e termina i
+        processi ffmpeg, così estrazioni, download e conversioni in corso
+        falliscono subito invece di arrivare al prossimo controllo.
+        """
+        self.resume_on_restart = resumable
+        self.stop_requested = True
+        with self._idle:
+            self._idle.notify_all()
+        with self._lock:
+            instances = list(self._ydl_instances)
+        for ydl in instances:
+            ydl.interrupt()
+        cancellation.kill_processes()
+        # Gli URL in attesa di un nuovo tentativo si chiudono come annullati
+        scheduler = self._scheduler
+        if scheduler is not None:
+            scheduler.flush()
+
+    def shutdown(self, resumable=True):
+        """Annulla la sessione in corso e termina run()."""
+        with self._idle:
+            self._shutdown = True
+            self._incoming = []
+        self.request_stop(resumable)
+
+    @property
+    def busy(self):
+        return self._session_active
+
+    def set_rate_limit(self, rate):
+        """Cambia il limite di banda complessivo (byte/s, 0 = nessuno) in corsa."""
+        self._bandwidth.set_rate(rate)
+
+    def set_bandwidth_profiles(self, profiles):
+        self._bandwidth.set_profiles(profiles)
+
+    @property
+    def policy(self):
+        return self._download_queue.policy
+
+    def set_policy(self, policy):
+        """Cambia l'ordine della coda in corsa (fifo, sjf, priority, fair).
+
+        Vale anche per gli URL già in attesa di estrazione o di download.
+        """
+        changed = policy != self._download_queue.policy
+        if not self._extract_queue.set_policy(policy):
+            return False
+        self._download_queue.set_policy(policy)
+        if changed and self._session_active:
+            self._widen_lookahead()
+            self._log(f"[CODA] Ordine della coda: {policy}")
+        return True
+
+    def _lookahead_target(self):
+        per_worker = SJF_LOOKAHEAD if self.policy == POLICY_SJF else EXTRACT_LOOKAHEAD
+        return self.concurrency * per_worker
+
+    def _widen_lookahead(self):
+        """Allarga la finestra di pre-estrazione se la politica ne richiede una più ampia.
+
+        Un Semaphore non si può restringere: tornando a un'altra politica la
+        finestra resta ampia fino alla fine della sessione.
+        """
+        with self._lock:
+            extra = self._lookahead_target() - self._lookahead_size
+            if extra <= 0 or self._lookahead is None:
+                return
+            self._lookahead_size += extra
+        self._lookahead.release(extra)
+
+    def set_priority(self, index, priority):
+        """Priorità di un URL della sessione (più alta = prima, con la politica priority).
+
+        Vale subito se l'URL è in coda e per le fasi successive; un indice non
+        ancora assegnato (es. voci di playlist) la riceve quando entra in coda.
+        False se non c'è una sessione in corso.
+        """
+        if not self._session_active or index < 1:
+            return False
+        with self._lock:
+            self._priorities[index] = priority
+            known = index <= len(self.urls)
+        queued = self._extract_queue.set_priority(index, priority)
+        queued = self._download_queue.set_priority(index, priority) or queued
+        if queued:
+            state = ""
+        elif known:
+            state = " (non più in coda)"
+        else:
+            state = " (quando l'URL entrerà in coda)"
+        prefix = self._prefix(index) if known else f"[{index}] "
+        self._log(f"[CODA] {prefix}Priorità {priority}{state}")
+        return True
+
+    def _new_job(self, index, args, info=None, cost=None):
+        batch = self._batch(index)
+        with self._lock:
+            priority = self._priorities.get(index, batch.options.get("priority", 0))
+        if cost is None:
+            cost = job_cost(info)
+        return Job(index, batch.owner, args, cost, priority)
+
+    def _log_bandwidth(self):
+        rate = self._bandwidth.effective_rate()
+        limit = f"{rate / MB:.1f} MB/s" if rate else "nessuno"
+        profiles = " (con fasce orarie)" if self.options.get("bandwidth_profiles") else ""
+        per_host = self._hosts.per_host or "illimitate"
+        fragments = self.fragment_concurrency or "automatici"
+        self._log(
+            f"[INFO] Limite banda: {limit}{profiles} - connessioni per host: {per_host}"
+            f" - frammenti paralleli: {fragments}"
+        )
+
+    def _has_work(self):
+        if self._session_active and self._outstanding == 0:
+            return True
+        if self._incoming and not (self._session_active and self.stop_requested):
+            return True
+        return self._shutdown and not self._session_active
 
     def run(self):
+        self._open_service()
+        try:
+            while True:
+                with self._idle:
+                    self._idle.wait_for(self._has_work)
+                    batches = []
+                    if self._incoming and not (
+                        self._session_active and self.stop_requested
+                    ):
+                        batches, self._incoming = self._incoming, []
+                    drained = (
+                        self._session_active and self._outstanding == 0 and not batches
+                    )
+                    stop = self._shutdown
+                if batches:
+                    if not self._session_active:
+                        self._begin_session(batches[0].options)
+                    for batch in batches:
+                        self._start_batch(batch)
+                elif drained:
+                    self._end_session()
+                    if not self.persistent:
+                        break
+                elif stop:
+                    break
+        finally:
+            self._close_service()
+            self.finished.emit()
+
+    def _open_service(self):
+        self._scheduler = RetryScheduler()
+        if self.options.get("job_queue", True):
+            try:
+                self._jobs = JobQueue()
+            except Exception as e:
+                self._log(f"[WARN] Coda persistente non disponibile: {e}")
+        if self.options.get("extract_cache", True):
+            try:
+                self._cache = ExtractionCache()
+            except Exception as e:
+                self._log(f"[WARN] Cache estrazione non disponibile: {e}")
+
+    def _close_service(self):
+        for pool in (self._extract_pool, self._download_pool, self._pp_pool):
+            if pool is not None:
+                pool.shutdown(wait=True)
+        self._extract_pool = self._download_pool = self._pp_pool = None
+        for ydl in self._ydl_instances:
+            try:
+                ydl.close()
+            except Exception:
+                pass
+        self._ydl_instances.clear()
+        self._free_ydls.clear()
+        if self._scheduler is not None:
+            self._scheduler.close()
+            self._scheduler = None
+        for archive in self._archives.values():
+            archive.close()
+        self._archives.clear()
+        for area in self._staging_areas.values():
+            area.close()
+        self._staging_areas.clear()
+        if self._cache is not None:
+            self._cache.close()
+            self._cache = None
+        if self._jobs is not None:
+            self._jobs.close()
+            self._jobs = None
+
+    def _ensure_pools(self):
+        """(Ri)crea i pool se la concorrenza è cambiata; solo a servizio inattivo."""
+        config = (self.concurrency, self.extract_concurrency, self.postprocess_workers)
+        if config == self._pool_config:
+            return
+        for pool in (self._extract_pool, self._download_pool, self._pp_pool):
+            if pool is not None:
+                pool.shutdown(wait=True)
+        # I thread dei pool vengono creati solo quando servono: una playlist può
+        # trasformare un singolo URL in migliaia di voci
+        self._download_pool = ThreadPoolExecutor(
+            max_workers=self.concurrency, thread_name_prefix="yt-dlp-worker"
+        )
+        self._pp_pool = ThreadPoolExecutor(
+            max_workers=self.postprocess_workers, thread_name_prefix="yt-dlp-ffmpeg"
+        )
+        self._extract_pool = ThreadPoolExecutor(
+            max_workers=self.extract_concurrency, thread_name_prefix="yt-dlp-extract"
+        )
+        self._pool_config = config
+
+    def _begin_session(self, options):
+        self._apply_settings(options)
+        del self.urls[:]
+        self._item_batches = []
+        self._batches = []
+        self._seen = set()
+        self.total_urls = 0
+        self._completed = 0
+        self._success_count = 0
+        self._errore_rilevato = False
+        self._annullato = False
+        self._skipped_count = 0
+        self._failed_count = 0
+        self._breakers = CircuitBreaker()
+        self._attempts = {}
+        self._waiting = set()
+        self._retry_total = 0
+        self._extract_queue.clear()
+        self._download_queue.clear()
+        self._priorities = {}
+        self._enqueued = {}
+        self._plan = BatchPlan()
+        self._plan_report = None
+        self._elapsed = 0.0
+        self._phase_totals = {
+            "extract": 0.0,
+            "wait": 0.0,
+            "download": 0.0,
+            "postprocess": 0.0,
+            "move": 0.0,
+        }
+        self.metrics = SessionMetrics()
+        self._hosts.per_host = max(0, int(self.per_host_connections or 0))
+        self._lookahead_size = self._lookahead_target()
+        self._lookahead = threading.Semaphore(self._lookahead_size)
+        self._ensure_pools()
+        with self._idle:
+            self._session_active = True
+        self._session_started = time.perf_counter()
+        # Prima di qualsiasi log: la GUI prepara qui la nuova sessione
+        self.session_started.emit()
+
+        log_path = None
+        if options.get("log_file", True):
+            try:
+                log_path = new_session_log_path()
+            except OSError:
+                pass
+        self._sink = LogSink(self.log_signal.emit, log_path)
+        if self._sink.log_path:
+            self._log(f"[INFO] Log completo: {self._sink.log_path}")
+
         snap = get_ffmpeg_snapshot()
         if snap["local_valid"]:
             self._log(
@@ -39,102 +757,964 @@ class YtDlpDownloader(QObject):
                 "[WARNING] ffmpeg non trovato - merge/conversione potrebbero fallire!"
             )
 
+        self._log_bandwidth()
+        if not options["simulate"]:
+            self._log(
+                f"[INFO] Post-processing: fino a {self.postprocess_workers} ffmpeg in "
+                f"parallelo, {self._ffmpeg_threads()} thread ciascuno "
+                f"(budget {self.ffmpeg_cores} core)"
+            )
+        if self._ydl_instances:
+            self._log(
+                f"[INFO] Sessioni yt-dlp già attive riutilizzate: {len(self._ydl_instances)}"
+            )
+
+    def _start_batch(self, batch):
+        """Registra il batch nella sessione e ne affida gli URL all'estrazione."""
+        options = batch.options
+        if self._batches:
+            self._apply_live_settings(options)
+        if options.get("archive", True):
+            batch.archive = self._get_archive(options["output_path"], batch.kind)
+        if options.get("scratch_dir") and not options["simulate"]:
+            batch.staging = self._get_staging_area(options["scratch_dir"])
+            if batch.staging is not None:
+                batch.temp_dir = staging_dir(batch.staging.path, options["output_path"])
+        if not batch.owner:
+            batch.owner = f"batch {len(self._batches) + 1}"
+        if self._jobs is not None and batch.batch_id is None:
+            try:
+                batch.batch_id = self._jobs.create_batch(options)
+            except Exception as e:
+                self._log(f"[WARN] Coda persistente non disponibile: {e}")
+        batch.ydl_opts = self._build_ydl_opts(batch)
+
+        urls = list(options["urls"])
+        with self._lock:
+            batch.offset = len(self.urls)
+            first = batch.offset + 1
+            self.urls.extend(urls)
+            self._item_batches.extend([batch] * len(urls))
+            self._seen.update(normalize_url(url) for url in urls)
+            self.total_urls += len(urls)
+            completed, total = self._completed, self.total_urls
+        self._batches.append(batch)
+
+        if len(self._batches) == 1:
+            if total > 1:
+                workers = min(self.concurrency, total)
+                self._log(f"Inizio download di {total} URL ({workers} in parallelo)...")
+            else:
+                self._log("Inizio download...")
+        else:
+            self._log(
+                f"\n[INFO] Aggiunti {len(urls)} URL alla coda in corso (totale {total})"
+            )
+        self.progress_signal.emit(completed, total)
+        for index, url in enumerate(urls, first):
+            self._submit(index, url)
+
+    def _apply_live_settings(self, options):
+        """Opzioni di un batch aggiunto a sessione in corso: solo quelle applicabili subito."""
+        self.options = options
+        self._bandwidth.set_rate(options.get("rate_limit", 0))
+        self._bandwidth.set_profiles(options.get("bandwidth_profiles"))
+        self.set_policy(options.get("schedule", POLICY_FIFO))
+
+    def _get_archive(self, folder, kind):
+        key = (os.path.normcase(os.path.abspath(folder)), kind)
+        archive = self._archives.get(key)
+        if archive is None:
+            try:
+                archive = DownloadArchive(folder, kind)
+            except Exception as e:
+                self._log(f"[WARN] Archivio download non disponibile: {e}")
+                return None
+            self._archives[key] = archive
+        return archive
+
+    def _get_staging_area(self, scratch):
+        key = os.path.normcase(os.path.abspath(scratch))
+        area = self._staging_areas.get(key)
+        if area is None:
+            try:
+                area = StagingArea(scratch)
+            except OSError as e:
+                self._log(f"[WARN] Cartella temporanea non disponibile ({scratch}): {e}")
+                return None
+            self._staging_areas[key] = area
+            free = free_space(scratch)
+            self._log(
+                f"[INFO] Cartella temporanea: {scratch}"
+                + (f" ({format_bytes(free)} liberi)" if free is not None else "")
+            )
+        return area
+
+    def _end_session(self):
+        self._elapsed = time.perf_counter() - self._session_started
+        self._log_summary(self._elapsed)
+        if any(batch.options["simulate"] for batch in self._batches):
+            self._log_plan()
+        else:
+            self._record_throughput()
+        if self._jobs is not None:
+            if self._annullato and self.resume_on_restart:
+                self._log(
+                    "[INFO] Gli URL non completati verranno ripresi al prossimo avvio."
+                )
+            else:
+                for batch in self._batches:
+                    if batch.batch_id is not None:
+                        self._jobs.finish_batch(batch.batch_id)
+        with self._idle:
+            self._session_active = False
+            # Un annullamento vale per la sessione appena conclusa, non per le successive
+            self.stop_requested = False
+            self.resume_on_restart = False
+        self._sink.close()
+        self._sink = None
+        self.session_finished.emit()
+
+    def _build_ydl_opts(self, batch):
+        options = batch.options
         ydl_opts = {
-            "format": self._build_format(),
-            "outtmpl": os.path.join(self.options["output_path"], "%(title)s.%(ext)s"),
+            "format": self._build_format(options),
+            "outtmpl": os.path.join(options["output_path"], "%(title)s.%(ext)s"),
             "quiet": True,
             "noprogress": True,
             "no_color": True,
-            "simulate": self.options["simulate"],
-            "writesubtitles": self.options["subs"],
-            "writeautomaticsub": self.options["subs"],
-            "progress_hooks": [self._hook],
+            "simulate": options["simulate"],
+            "writesubtitles": options["subs"],
+            "writeautomaticsub": options["subs"],
+            "postprocessor_args": {"ffmpeg": ["-threads", str(self._ffmpeg_threads())]},
+            "concurrent_fragment_downloads": (
+                self.fragment_concurrency or self._fragment_tuner.start
+            ),
             "keepvideo": False,
             "logger": self,
         }
 
+        if batch.archive is not None:
+            ydl_opts["download_archive"] = batch.archive
+
+        if batch.staging is not None:
+            # .part, frammenti e file intermedi nella cartella temporanea; il
+            # percorso "temp" è deciso per URL da _stage_item
+            ydl_opts["outtmpl"] = "%(title)s.%(ext)s"
+            ydl_opts["paths"] = {"home": options["output_path"], "temp": batch.temp_dir}
+        if options.get("buffersize"):
+            ydl_opts["buffersize"] = int(options["buffersize"])
+        if options.get("http_chunk_size"):
+            ydl_opts["http_chunk_size"] = int(options["http_chunk_size"])
+
         ffmpeg_location = get_ffmpeg_location_for_ytdlp()
         if ffmpeg_location:
             ydl_opts["ffmpeg_location"] = ffmpeg_location
 
-        if self.options["audio_only"]:
-            ydl_opts["postprocessors"] = [
-                {
-                    "key": "FFmpegExtractAudio",
-                    "preferredcodec": "mp3",
-                    "preferredquality": "192",
-                }
-            ]
-        elif self.options["video_only"]:
-            ydl_opts["postprocessors"] = []
-        else:
+        # Merge, contenitore e conversione audio li decide MediaPlanPP (_new_ydl)
+        if not options["audio_only"] and not options["video_only"]:
             ydl_opts["merge_output_format"] = "mp4"
-            ydl_opts["postprocessors"] = [
-                {"key": "FFmpegMerger"},
-                {"key": "FFmpegVideoConvertor", "preferedformat": "mp4"},
-            ]
+        return ydl_opts
 
-        errore_rilevato = False
-        annullato = False
-        success_count = 0
+    def _ffmpeg_threads(self):
+        return max(1, self.ffmpeg_cores // self.postprocess_workers)
 
-        if self.total_urls > 1:
-            self._log(f"Inizio download di {self.total_urls} URL...")
+    def _checkout_ydl(self, batch):
+        """Istanza YoutubeDL libera per le opzioni del batch (nuova se non ce ne sono).
+
+        Resta al chiamante fino a _checkin_ydl. YoutubeDL non è thread-safe:
+        se il post-processing passa al pool ffmpeg l'istanza lo segue e torna
+        libera solo a fine post-processing (o spostamento dalla cartella temporanea).
+        """
+        profile = batch.profile
+        with self._lock:
+            free = self._free_ydls.get(profile)
+            if free:
+                ydl = free.pop()
+                ydl.params["postprocessor_args"] = batch.ydl_opts["postprocessor_args"]
+                return ydl
+        ydl = self._new_ydl(batch)
+        with self._lock:
+            self._ydl_instances.append(ydl)
+        return ydl
+
+    def _checkin_ydl(self, batch, ydl):
+        with self._lock:
+            self._free_ydls.setdefault(batch.profile, []).append(ydl)
+
+    def _new_ydl(self, batch):
+        # Copia: frammenti paralleli e cartella temporanea vengono regolati per
+        # singola istanza
+        params = dict(batch.ydl_opts)
+        if "paths" in params:
+            params["paths"] = dict(params["paths"])
+        ydl = _PipelineYoutubeDL(params)
+        ydl.cancelled = lambda: self.stop_requested
+        item = _ItemState()
+        ydl.add_progress_hook(lambda d: self._hook(d, item))
+        ydl.item_state = item
+        ydl.add_post_processor(
+            MediaPlanPP(
+                ydl,
+                batch.kind,
+                batch.options.get("audio_format", AUDIO_FORMAT_MP3),
+                log=lambda msg: self._log(f"[PIANO] {self._prefix()}{msg}"),
+            ),
+            when="post_process",
+        )
+        if batch.archive is not None:
+            ydl.add_post_processor(
+                _ArchiveRecorderPP(batch.archive, ydl), when="after_move"
+            )
+        if batch.staging is not None:
+            ydl.add_post_processor(_StagingPP(ydl, self._stage_item), when="video")
+        return ydl
+
+    def _stage_item(self, ydl, info):
+        """Controlla lo spazio e sceglie dove scaricare l'URL (formati già scelti).
+
+        Nella cartella temporanea si riserva lo spazio stimato; se manca anche
+        a cartella libera, il download avviene direttamente nella destinazione.
+        """
+        index = ydl.item_state.index
+        batch = self._batch(index)
+        size = estimated_size(info)
+        dest = batch.options["output_path"]
+        free = free_space(dest)
+        if size and free is not None and free < size:
+            raise PostProcessingError(
+                f"Spazio insufficiente in {dest}: servono {format_bytes(size)}, "
+                f"liberi {format_bytes(free)}"
+            )
+        needed = int((size or 0) * SCRATCH_SIZE_FACTOR)
+        with self._lock:
+            # Nuovo tentativo dopo una voce in cache scaduta: vale l'ultima stima
+            previous = self._staged.pop(index, None)
+        if previous is not None:
+            previous[0].release(previous[1])
+        if batch.staging.reserve(needed, lambda: self.stop_requested):
+            with self._lock:
+                self._staged[index] = (batch.staging, needed)
+            ydl.params["paths"]["temp"] = batch.temp_dir
+        elif self.stop_requested:
+            raise ValueError(CANCEL_MESSAGE)
         else:
-            self._log("Inizio download...")
+            self._log(
+                f"[WARN] {self._prefix(index)}Spazio insufficiente nella cartella "
+                "temporanea: download diretto nella destinazione"
+            )
+            ydl.params["paths"]["temp"] = ""
+
+    def _acquire_slot(self, semaphore):
+        """Attende uno slot del semaforo; False se il download è stato annullato."""
+        while not semaphore.acquire(timeout=0.2):
+            if self.stop_requested:
+                return False
+        return True
+
+    def _acquire_lookahead(self):
+        """Attende uno slot di pre-estrazione; False se il download è stato annullato."""
+        return self._acquire_slot(self._lookahead)
+
+    def _submit(self, index, url, info=None, playlist_slot=False, cost=None):
+        """Affida l'URL al pool di estrazione (info: voce di playlist già risolta;
+        cost: byte previsti se la voce indica durata o dimensione)."""
+        with self._lock:
+            self._outstanding += 1
+            self._enqueued.setdefault(index, time.perf_counter())
+        self._set_status(index, STATUS_QUEUED)
+        self._queue_extract(index, url, info, playlist_slot, cost)
+
+    def _queue_extract(self, index, url, info=None, playlist_slot=False, cost=None):
+        self._extract_queue.push(
+            self._new_job(index, (url, info, playlist_slot), info, cost)
+        )
+        self._extract_pool.submit(self._extract_next)
+
+    def _extract_next(self):
+        """Estrae l'URL che la politica sceglie tra quelli in attesa.
+
+        Lo slot di pre-estrazione si ottiene prima di scegliere: quando se ne
+        libera uno passa l'URL migliore in quel momento, non il primo arrivato.
+        """
+        has_slot = self._acquire_lookahead()
+        job = self._extract_queue.pop()
+        if job is None:
+            if has_slot:
+                self._lookahead.release()
+            return
+        self._extract_one(job.index, *job.args, has_slot=has_slot)
+
+    def _queue_download(self, index, url, info, cached_key, extract_time, queued_at):
+        self._download_queue.push(
+            self._new_job(index, (url, info, cached_key, extract_time, queued_at), info)
+        )
+        self._download_pool.submit(self._download_next)
+
+    def _download_next(self):
+        """Scarica l'URL che la politica sceglie tra quelli già estratti."""
+        job = self._download_queue.pop()
+        if job is not None:
+            self._download_one(job.index, *job.args)
+
+    def _extract_one(self, index, url, info=None, playlist_slot=False, has_slot=False):
+        handed_off = False
+        try:
+            handed_off = self._extract_item(index, url, info, has_slot)
+        finally:
+            if playlist_slot:
+                self._playlist_slots.release()
+            if not handed_off:
+                self._release_outstanding()
+
+    def _extract_item(self, index, url, info, has_slot):
+        """Estrae l'URL; True se è passato al download o all'espansione della playlist.
+
+        has_slot: slot di pre-estrazione già ottenuto (False solo se annullato).
+        """
+        self._local.index = index
+        self.metrics.start(index, url)
+
+        if not self.stop_requested:
+            # Host in pausa: l'URL attende fuori dai pool, gli altri host proseguono
+            wait = self._breakers.wait_time(host_key(url), index)
+            if wait > 0:
+                if has_slot:
+                    self._lookahead.release()
+                self._defer_item(index, url, info, wait)
+                return True
+
+        if not has_slot or self.stop_requested:
+            if has_slot:
+                self._lookahead.release()
+            self._finish_item(index, STATUS_CANCELLED)
+            return False
 
-        self.progress_signal.emit(0, self.total_urls)
+        self._log(
+            f"\n{self._prefix()}"
+            f"Elaborazione: {url[:50]}{'...' if len(url) > 50 else ''}"
+        )
 
-        with YoutubeDL(ydl_opts) as ydl:
-            for i, url in enumerate(self.options["urls"]):
+        batch = self._batch(index)
+        if batch.archive is not None:
+            existing = batch.archive.find_url(url)
+            if existing is not None:
+                self._lookahead.release()
+                self._log(
+                    f"[ARCHIVIO] {self._prefix()}Già scaricato"
+                    f"{': ' + existing if existing else ''} - saltato"
+                )
+                self._finish_item(index, STATUS_SKIPPED)
+                return False
+
+        self._set_status(index, STATUS_EXTRACTING)
+
+        started = time.perf_counter()
+        key, cached = None, False
+        if info is None:
+            try:
+                info, key, cached = self._extract_info(url, batch)
+            except Exception as e:
+                self._lookahead.release()
+                return self._handle_item_error(index, e)
+        extract_time = time.perf_counter() - started
+        self.metrics.update(index, extract=extract_time)
+
+        if info is None:
+            # yt-dlp ha già trovato l'id nell'archivio durante l'estrazione
+            self._lookahead.release()
+            self._log(f"[ARCHIVIO] {self._prefix()}Già scaricato - saltato")
+            self._finish_item(index, STATUS_SKIPPED)
+            return False
+
+        if self.policy == POLICY_SJF:
+            self._probe_direct_size(batch, info)
+
+        if info.get("_type") == "playlist":
+            self._lookahead.release()
+            self._breakers.release_probe(index)
+            threading.Thread(
+                target=self._expand_playlist,
+                args=(index, url, info),
+                name="yt-dlp-playlist",
+                daemon=True,
+            ).start()
+            return True
+
+        self._queue_download(
+            index, url, info, key if cached else None, extract_time, time.perf_counter()
+        )
+        return True
+
+    def _probe_direct_size(self, batch, info):
+        """Ordine sjf: dimensione dei file diretti (senza metadati) da una richiesta HEAD."""
+        if not info.get("direct") or job_cost(info) is not None:
+            return
+        ydl = self._checkout_ydl(batch)
+        try:
+            for fmt in info.get("formats") or []:
+                size = probe_size(ydl, fmt)
+                if size is not None:
+                    fmt["filesize"] = size
+        finally:
+            self._checkin_ydl(batch, ydl)
+
+    def _expand_playlist(self, index, url, info):
+        """Accoda le voci di una playlist/canale man mano che le pagine arrivano.
+
+        Le voci sono estratte in modo "flat" (solo URL e id) e passano dal pool
+        di estrazione come qualsiasi URL; al massimo PLAYLIST_PREFETCH restano
+        in attesa, così memoria e richieste anticipate restano limitate anche
+        per canali con migliaia di video.
+        """
+        self._local.index = index
+        try:
+            self._expand_entries(index, url, info)
+        finally:
+            self._release_outstanding()
+
+    def _expand_entries(self, index, url, info):
+        title = info.get("title") or info.get("id") or url
+        self.metrics.discard(index)
+        with self._lock:
+            self.total_urls -= 1
+            completed, total = self._completed, self.total_urls
+        self.item_status_signal.emit(index, STATUS_PLAYLIST)
+        self.progress_signal.emit(completed, total)
+        self._log(f"[PLAYLIST] {self._prefix()}{title}: lettura delle voci...")
+
+        started = time.perf_counter()
+        added = duplicates = 0
+        try:
+            for entry in _iter_entries(info.get("entries")):
                 if self.stop_requested:
-                    annullato = True
                     break
+                entry_url = _entry_url(entry) if isinstance(entry, dict) else None
+                if not entry_url:
+                    continue
+                keys = {normalize_url(entry_url)}
+                if entry.get("ie_key") and entry.get("id"):
+                    keys.add(f"{entry['ie_key']}:{entry['id']}")
+                with self._lock:
+                    if keys & self._seen:
+                        duplicates += 1
+                        continue
+                    self._seen.update(keys)
+                if not self._acquire_slot(self._playlist_slots):
+                    break
+                resolved = None if entry.get("_type") in ("url", "url_transparent") else entry
+                # Le voci "flat" indicano spesso la durata: basta per ordinare la coda
+                self._add_entry(self._batch(index), entry_url, resolved, job_cost(entry))
+                added += 1
+                if added % PLAYLIST_LOG_INTERVAL == 0:
+                    self._log(f"[PLAYLIST] {self._prefix()}{title}: {added} voci in coda...")
+        except Exception as e:
+            # La playlist torna a contare come URL (fallito); le voci accodate restano
+            with self._lock:
+                self.total_urls += 1
+            if added:
+                self._log(f"[PLAYLIST] {self._prefix()}{title}: {added} voci accodate")
+            # Niente nuovo tentativo: le voci già accodate verrebbero lette di nuovo
+            self._handle_item_error(index, e, retry=False)
+            return
 
-                self.current_url_index = i + 1
-                self._last_progress_pct = ""
-                self._last_progress_log = 0.0
+        if self.stop_requested:
+            # Resta da riprendere: alla ripresa le voci già accodate non si ripetono
+            self._finish_item(index, STATUS_CANCELLED)
+            return
+        self._set_job_state(index, JOB_DONE)
+        self._log(
+            f"[PLAYLIST] {self._prefix()}{title}: {added} voci in "
+            f"{time.perf_counter() - started:.1f}s"
+            + (f", {duplicates} già in coda" if duplicates else "")
+        )
 
-                if self.total_urls > 1:
-                    self._log(
-                        f"\n[{self.current_url_index}/{self.total_urls}] "
-                        f"Elaborazione: {url[:50]}{'...' if len(url) > 50 else ''}"
-                    )
+    def _add_entry(self, batch, url, info=None, cost=None):
+        """Aggiunge alla sessione una voce di playlist e la affida all'estrazione."""
+        with self._lock:
+            self.urls.append(url)
+            self._item_batches.append(batch)
+            index = len(self.urls)
+            self.total_urls += 1
+            completed, total = self._completed, self.total_urls
+        if self._jobs is not None and batch.batch_id is not None:
+            try:
+                self._jobs.add_job(batch.batch_id, index - batch.offset, url)
+            except Exception as e:
+                self._log(f"[WARN] Coda persistente non aggiornata: {e}")
+        self._submit(index, url, info, playlist_slot=True, cost=cost)
+        self.progress_signal.emit(completed, total)
+
+    def _extract_info(self, url, batch, use_cache=True):
+        """Restituisce (info, chiave cache, da_cache) per l'URL indicato."""
+        key = None
+        if self._cache is not None:
+            key = cache_key(url)
+            if use_cache:
+                info = self._cache.get(key)
+                if info is not None:
+                    self._log(f"[CACHE] {self._prefix()}Metadati riutilizzati dalla cache")
+                    return info, key, True
+
+        ydl = self._checkout_ydl(batch)
+        try:
+            info = ydl.extract_info(url, download=False, process=False)
+            # Un rimando (es. pagina del canale -> scheda video) va risolto qui per
+            # riconoscere le playlist prima del download
+            for _ in range(MAX_URL_REDIRECTS):
+                if info is None or info.get("_type") != "url":
+                    break
+                info = ydl.extract_info(
+                    info["url"], download=False, ie_key=info.get("ie_key"), process=False
+                )
+        finally:
+            self._checkin_ydl(batch, ydl)
+        if key is not None:
+            self._cache.put(key, info)
+        return info, key, False
+
+    def _download_one(self, index, url, info, cached_key, extract_time, queued_at):
+        host = host_key(url)
+        acquired = False
+        if not self.stop_requested:
+            wait = self._breakers.wait_time(host, index)
+            if wait > 0:
+                # Host messo in pausa dopo l'estrazione: l'URL libera lo slot di
+                # pre-estrazione e riparte dall'estrazione (di solito dalla cache)
+                self._lookahead.release()
+                self._defer_item(index, url, None, wait)
+                return
+        # La simulazione non apre connessioni di download: niente limite per host
+        if not self.stop_requested and not self._batch(index).options["simulate"]:
+            acquired = self._hosts.acquire(host, HOST_WAIT_SLICE)
+            if not acquired:
+                # Host saturo: l'URL torna in coda senza bloccare gli altri host
+                self._queue_download(index, url, info, cached_key, extract_time, queued_at)
+                return
+        handed_off = False
+        try:
+            handed_off = self._download_item(
+                index, url, info, cached_key, extract_time, queued_at
+            )
+        finally:
+            if acquired:
+                self._hosts.release(host)
+            if not handed_off:
+                self._release_outstanding()
+
+    def _release_outstanding(self):
+        with self._idle:
+            self._outstanding -= 1
+            self._idle.notify_all()
+
+    def _download_item(self, index, url, info, cached_key, extract_time, queued_at):
+        """Scarica l'URL; True se il post-processing è stato affidato al pool ffmpeg."""
+        self._lookahead.release()
+        self._local.index = index
+        batch = self._batch(index)
+        ydl = self._checkout_ydl(batch)
+        self._local.handed_off = None
+        try:
+            return self._download_with(
+                ydl, batch, index, url, info, cached_key, extract_time, queued_at
+            )
+        finally:
+            # Con il post-processing differito l'istanza passa al pool ffmpeg,
+            # che la restituisce a fine elaborazione (_postprocess_item/_move_item)
+            if self._local.handed_off is not ydl:
+                self._checkin_ydl(batch, ydl)
+
+    def _download_with(
+        self, ydl, batch, index, url, info, cached_key, extract_time, queued_at
+    ):
+        host = host_key(url)
+        fragments = self.fragment_concurrency or self._fragment_tuner.level_for(host)
+        ydl.params["concurrent_fragment_downloads"] = fragments
+        item = ydl.item_state
+        item.reset(index, host, fragments)
+        wait_time = time.perf_counter() - queued_at
+        self.metrics.update(index, wait=wait_time)
+
+        if self.stop_requested:
+            self._finish_item(index, STATUS_CANCELLED)
+            return False
+
+        self._set_status(index, STATUS_DOWNLOADING)
+        started = time.perf_counter()
+        try:
+            try:
+                result = ydl.process_ie_result(info, download=True)
+            except Exception:
+                ydl.deferred.clear()
+                if cached_key is None or self.stop_requested:
+                    raise
+                # Metadati in cache non più validi (es. URL scaduti): nuova estrazione
+                self._log(
+                    f"[CACHE] {self._prefix()}Voce in cache non valida, nuova estrazione..."
+                )
+                self._cache.invalidate(cached_key)
+                info, _, _ = self._extract_info(url, batch, use_cache=False)
+                result = ydl.process_ie_result(info, download=True)
+        except Exception as e:
+            ydl.deferred.clear()
+            return self._handle_item_error(index, e)
+        download_time = time.perf_counter() - started
+        if self._breakers.record_success(host):
+            self._log(f"[RIPROVA] {host}: di nuovo raggiungibile, pausa terminata")
+        avg_speed = (
+            item.base_bytes / download_time if download_time > 0 and item.base_bytes else None
+        )
+        self.metrics.update(
+            index,
+            download=download_time,
+            bytes=item.base_bytes,
+            avg_speed=avg_speed,
+            # Download più brevi di una finestra di campionamento: vale la media
+            peak_speed=max(item.peak_speed or 0, avg_speed or 0) or None,
+        )
+        deferred = list(ydl.deferred)
+        ydl.deferred.clear()
+
+        with self._lock:
+            self._phase_totals["extract"] += extract_time
+            self._phase_totals["wait"] += wait_time
+            self._phase_totals["download"] += download_time
+
+        if batch.options["simulate"]:
+            self._plan_item(index, batch, ydl, result or info)
+            self._finish_item(index, STATUS_DONE)
+            return False
+        if deferred:
+            # Il worker passa subito al prossimo URL mentre ffmpeg elabora questo
+            self._set_status(index, STATUS_POSTPROCESSING)
+            self._pp_pool.submit(
+                self._postprocess_item, index, ydl, deferred, extract_time, download_time
+            )
+            self._local.handed_off = ydl
+            return True
+        self._log_item_done(index, extract_time, download_time)
+        self._finish_item(index, STATUS_DONE)
+        return False
+
+    def _plan_item(self, index, batch, ydl, info):
+        """Simulazione: registra nel piano la dimensione dei formati scelti da yt-dlp."""
+        options = batch.options
+        size = planned_size(info, lambda fmt: probe_size(ydl, fmt))
+        final = output_size(
+            info, size, options["audio_only"], options.get("audio_format", AUDIO_FORMAT_MP3)
+        )
+        self._plan.add(index, options["output_path"], size, final)
+        title = info.get("title") or info.get("id") or self.urls[index - 1]
+        self._log(
+            f"[SIMULAZIONE] {self._prefix(index)}{title} - formato "
+            f"{info.get('format_id') or 'N/A'}: "
+            + (format_bytes(size) if size is not None else "dimensione non indicata")
+        )
+
+    def _postprocess_item(self, index, ydl, deferred, extract_time, download_time):
+        """Merge/conversioni di un URL già scaricato, nel pool ffmpeg."""
+        self._local.index = index
+        handed_off = False
+        try:
+            if self.stop_requested:
+                self._finish_item(index, STATUS_CANCELLED)
+                return
+            self._log(f"{self._prefix()}Post-processing in corso...")
+            staged = self._staged.get(index)
+            started = time.perf_counter()
+            try:
+                infos = [
+                    ydl.run_deferred(filename, info, files_to_move, staged is not None)
+                    for filename, info, files_to_move in deferred
+                ]
+            except Exception as e:
+                self._handle_item_error(index, e, retry=False)
+                return
+            pp_time = time.perf_counter() - started
+            self.metrics.update(index, postprocess=pp_time)
+            with self._lock:
+                self._phase_totals["postprocess"] += pp_time
+            if staged is not None:
+                # Lo slot ffmpeg si libera subito: la copia verso la destinazione
+                # (spesso un disco di rete) prosegue nel pool del mover
+                self._set_status(index, STATUS_MOVING)
+                staged[0].submit(
+                    self._move_item, index, ydl, infos, extract_time, download_time, pp_time
+                )
+                handed_off = True
+                return
+            self._log_item_done(index, extract_time, download_time, pp_time)
+            self._finish_item(index, STATUS_DONE)
+        finally:
+            if not handed_off:
+                self._checkin_ydl(self._batch(index), ydl)
+                self._release_outstanding()
+
+    def _move_item(self, index, ydl, infos, extract_time, download_time, pp_time):
+        """Sposta i file finiti dalla cartella temporanea alla destinazione."""
+        self._local.index = index
+        try:
+            started = time.perf_counter()
+            renamed = True
+            try:
+                for info in infos:
+                    final_path, moves = planned_moves(info)
+                    for src, dst in moves:
+                        if os.path.exists(src):
+                            renamed = (
+                                move_file(src, dst, lambda: self.stop_requested)
+                                and renamed
+                            )
+                    ydl.finish_deferred(info, final_path)
+            except Exception as e:
+                self._handle_item_error(index, e, retry=False)
+                return
+            move_time = time.perf_counter() - started
+            self.metrics.update(index, move=move_time)
+            with self._lock:
+                self._phase_totals["move"] += move_time
+            self._log_item_done(
+                index,
+                extract_time,
+                download_time,
+                pp_time,
+                (move_time, "rinomina" if renamed else "copia"),
+            )
+            self._finish_item(index, STATUS_DONE)
+        finally:
+            self._checkin_ydl(self._batch(index), ydl)
+            self._release_outstanding()
+
+    def _log_item_done(self, index, extract_time, download_time, pp_time=None, move=None):
+        timing = f"estrazione {extract_time:.1f}s, download {download_time:.1f}s"
+        if pp_time is not None:
+            timing += f", post-processing {pp_time:.1f}s"
+        if move is not None:
+            timing += f", spostamento {move[0]:.1f}s ({move[1]})"
+        stats = self.metrics.get(index)
+        if stats is not None and stats.bytes:
+            timing += (
+                f" - {format_bytes(stats.bytes)} a {format_speed(stats.avg_speed)}"
+                f", picco {format_speed(stats.peak_speed)}"
+            )
+        if self.total_urls > 1:
+            self._log(f"[OK] {self._prefix(index)}Completato! ({timing})")
+        else:
+            self._log(f"[OK] Download completato! ({timing})")
+
+    def _handle_item_error(self, index, e, retry=True):
+        """Registra l'errore dell'URL; True se è stato rimesso in coda per un nuovo tentativo.
+
+        retry=False per gli errori locali (post-processing, spostamento).
+        """
+        msg = str(e)
+        if CANCEL_MESSAGE in msg or self.stop_requested:
+            self._finish_item(index, STATUS_CANCELLED)
+            return False
+        if retry and self._schedule_retry(index, e):
+            return True
+        attempts = self._attempts.get(index)
+        if "[WinError 2]" in msg:
+            self._log(
+                f"[ERRORE] {self._prefix()}"
+                "FFmpeg non trovato o non configurato correttamente."
+            )
+        else:
+            self._log(
+                f"[ERRORE] {self._prefix()}{msg}"
+                + (f" (dopo {attempts + 1} tentativi)" if attempts else "")
+            )
+        self._finish_item(index, STATUS_FAILED, msg)
+        return False
+
+    def _schedule_retry(self, index, e):
+        """Rimette in coda l'URL dopo un errore temporaneo; False se l'errore è definitivo
+        o i tentativi sono esauriti."""
+        failure = classify_error(e)
+        if not failure.transient:
+            return False
+        url = self.urls[index - 1]
+        host = host_key(url)
+        cooldown = self._breakers.record_failure(host)
+        if cooldown == math.inf:
+            self._log(
+                f"[RIPROVA] {host}: ancora errori dopo le pause, host considerato "
+                "irraggiungibile (gli URL rimasti vengono provati una sola volta)"
+            )
+        elif cooldown:
+            self._log(
+                f"[RIPROVA] {host}: troppi errori temporanei, host in pausa per "
+                f"{cooldown:.0f}s (gli altri host proseguono)"
+            )
+        if self._breakers.is_down(host):
+            return False
+        limit = max(0, int(self._batch(index).options.get("retries", DEFAULT_RETRIES)))
+        with self._lock:
+            attempt = self._attempts.get(index, 0) + 1
+            if attempt > limit:
+                return False
+            self._attempts[index] = attempt
+            self._retry_total += 1
+        delay = max(backoff_delay(attempt), failure.retry_after)
+        self.metrics.update(index, retries=attempt)
+        self._release_staged(index)
+        self._log(
+            f"[RIPROVA] {self._prefix(index)}Errore temporaneo ({failure.reason}): "
+            f"tentativo {attempt + 1}/{limit + 1} tra {delay:.1f}s"
+        )
+        self._defer_item(index, url, None, delay)
+        return True
+
+    def _defer_item(self, index, url, info, delay):
+        """Riaffida l'URL all'estrazione dopo delay secondi, senza occupare slot nell'attesa."""
+        with self._lock:
+            announce = index not in self._waiting
+            self._waiting.add(index)
+        if announce:
+            self._set_status(index, STATUS_RETRYING)
+        self._scheduler.schedule(delay, self._resume_item, index, url, info)
+
+    def _resume_item(self, index, url, info):
+        if not self.stop_requested:
+            wait = self._breakers.wait_time(host_key(url), index)
+            if wait > 0:
+                self._scheduler.schedule(wait, self._resume_item, index, url, info)
+                return
+        with self._lock:
+            self._waiting.discard(index)
+        self._queue_extract(index, url, info)
+
+    def _release_staged(self, index):
+        with self._lock:
+            staged = self._staged.pop(index, None)
+        if staged is not None:
+            # I file hanno lasciato la cartella temporanea, o non ci arriveranno
+            staged[0].release(staged[1])
+
+    def _finish_item(self, index, status, error=None):
+        with self._lock:
+            enqueued = self._enqueued.pop(index, None)
+        if enqueued is not None and status != STATUS_CANCELLED:
+            self.metrics.update(index, latency=time.perf_counter() - enqueued)
+        self.metrics.finish(index, status, error)
+        self._release_staged(index)
+        self._breakers.release_probe(index)
+        with self._lock:
+            self._waiting.discard(index)
+            if status == STATUS_CANCELLED:
+                self._annullato = True
+            else:
+                self._completed += 1
+                if status in (STATUS_DONE, STATUS_SKIPPED):
+                    self._success_count += 1
+                    if status == STATUS_SKIPPED:
+                        self._skipped_count += 1
                 else:
-                    self._log(
-                        f"Elaborazione: {url[:50]}{'...' if len(url) > 50 else ''}"
-                    )
+                    self._errore_rilevato = True
+                    self._failed_count += 1
+            completed = self._completed
+        self._set_status(index, status, error)
+        if status != STATUS_CANCELLED:
+            self.progress_signal.emit(completed, self.total_urls)
 
-                try:
-                    ydl.download([url])
-                    success_count += 1
-                    if self.total_urls > 1:
-                        self._log(
-                            f"[OK] [{self.current_url_index}/{self.total_urls}] Completato!"
-                        )
-                    else:
-                        self._log("[OK] Download completato!")
-
-                except Exception as e:
-                    msg = str(e)
-                    if "Download annullato dall'utente" in msg:
-                        annullato = True
-                        break
-                    errore_rilevato = True
-                    if "[WinError 2]" in msg:
-                        self._log(
-                            f"[ERRORE] [{self.current_url_index}/{self.total_urls}] "
-                            "FFmpeg non trovato o non configurato correttamente."
-                        )
-                    else:
-                        self._log(
-                            f"[ERRORE] [{self.current_url_index}/{self.total_urls}] {msg}"
-                        )
-
-                self.progress_signal.emit(self.current_url_index, self.total_urls)
+    def _log_plan(self):
+        """Riepilogo della simulazione: byte, durata stimata, spazio e URL non risolti."""
+        failures, skipped = [], 0
+        for item in self.metrics.items():
+            if not self._batch(item.index).options["simulate"]:
+                continue
+            if item.status == STATUS_FAILED:
+                failures.append((item.index, item.url, item.error))
+            elif item.status == STATUS_SKIPPED:
+                skipped += 1
+        rate, source = self._throughput.rate(), RATE_HISTORY
+        limit = self._bandwidth.effective_rate()
+        if limit and (rate is None or limit < rate):
+            rate, source = limit, RATE_LIMIT
+        scratch = next(
+            (b.options["scratch_dir"] for b in self._batches if b.options.get("scratch_dir")),
+            "",
+        )
+        plan = self._plan.report(failures, skipped, rate, source, self.concurrency, scratch)
+        self._plan_report = plan
+        for line in describe_plan(plan):
+            self._log(f"[SIMULAZIONE] {line}")
+        for index, url, error in failures[:MAX_LOGGED_FAILURES]:
+            self._log(f"[SIMULAZIONE] Non risolto [{index}] {url}: {error}")
+        if len(failures) > MAX_LOGGED_FAILURES:
+            self._log(
+                f"[SIMULAZIONE] ... e altri {len(failures) - MAX_LOGGED_FAILURES} URL non risolti"
+            )
+
+    def _record_throughput(self):
+        """Salva la velocità della sessione per le stime delle prossime simulazioni.
+
+        Le sessioni annullate o con limite di banda non rappresentano la
+        velocità della connessione e non vengono registrate.
+        """
+        if self._annullato or self._bandwidth.active:
+            return
+        if not self.options.get("throughput_history", True):
+            return
+        nbytes = sum(item.bytes for item in self.metrics.items())
+        self._throughput.record(nbytes, self._elapsed)
+
+    def summary(self):
+        """Conteggi finali della sessione (usati dalla modalità headless)."""
+        with self._lock:
+            return {
+                "total": self.total_urls,
+                "completed": self._completed,
+                "succeeded": self._success_count,
+                "skipped": self._skipped_count,
+                "failed": self._failed_count,
+                "retries": self._retry_total,
+                "cancelled": self._annullato,
+                "plan": self._plan_report,
+                "scheduling": {
+                    "policy": self.policy,
+                    "mean_latency": self.metrics.mean_latency(),
+                },
+                "elapsed": round(self._elapsed, 3),
+                "phases": {k: round(v, 3) for k, v in self._phase_totals.items()},
+                "percentiles": self.metrics.percentiles(),
+            }
 
+    def _log_summary(self, elapsed):
+        success_count = self._success_count
         self._log("\n" + "=" * 50)
-        if annullato:
+        totals = self._phase_totals
+        self._log(
+            f"[INFO] Tempi: sessione {elapsed:.1f}s - estrazione {totals['extract']:.1f}s, "
+            f"attesa in coda {totals['wait']:.1f}s, download {totals['download']:.1f}s, "
+            f"post-processing {totals['postprocess']:.1f}s"
+            + (f", spostamento {totals['move']:.1f}s" if totals["move"] else "")
+            + " (somma sui singoli URL)"
+        )
+        self._log_percentiles()
+        if self._skipped_count:
+            self._log(
+                f"[INFO] {self._skipped_count} URL già presenti nell'archivio (saltati)"
+            )
+        if self._retry_total:
+            recovered = sum(
+                1 for item in self.metrics.items()
+                if item.retries and item.status == STATUS_DONE
+            )
+            self._log(
+                f"[RIPROVA] {self._retry_total} nuovi tentativi, "
+                f"{recovered} URL scaricati dopo un errore temporaneo"
+            )
+        down = self._breakers.down_hosts()
+        if down:
+            self._log(f"[RIPROVA] Host irraggiungibili: {', '.join(down)}")
+        if self._cache is not None:
+            stats = self._cache.stats()
+            self._log(
+                f"[INFO] Cache estrazione: {stats['hits']} hit, {stats['misses']} miss "
+                f"({stats['entries']} voci, {stats['bytes'] / (1024 * 1024):.1f} MB)"
+            )
+        if self._annullato:
             if self.total_urls > 1:
                 self._log(
                     f"[ANNULLATO] {success_count}/{self.total_urls} download completati "
@@ -142,7 +1722,7 @@ class YtDlpDownloader(QObject):
                 )
             else:
                 self._log("[ANNULLATO] Download annullato dall'utente.")
-        elif not errore_rilevato:
+        elif not self._errore_rilevato:
             if self.total_urls > 1:
                 self._log(
                     f"[OK] COMPLETATO - tutti i {self.total_urls} download eseguiti con successo!"
@@ -158,15 +1738,45 @@ class YtDlpDownloader(QObject):
             else:
                 self._log("[ERRORE] Download fallito.")
 
-        self.finished.emit()
+    def _log_percentiles(self):
+        pct = self.metrics.percentiles()
+        if pct["total"]["p50"] is None:
+            return
+        labels = [
+            ("extract", "estrazione"),
+            ("wait", "attesa"),
+            ("download", "download"),
+            ("postprocess", "post-processing"),
+        ]
+        if pct["move"]["p99"]:
+            labels.append(("move", "spostamento"))
+        labels.append(("total", "totale"))
+        parts = [
+            f"{label} {pct[phase]['p50']:.1f}/{pct[phase]['p90']:.1f}/{pct[phase]['p99']:.1f}s"
+            for phase, label in labels
+        ]
+        self._log(f"[INFO] Tempi per URL (p50/p90/p99): {', '.join(parts)}")
+        latency = pct["latency"]
+        if latency["p50"] is not None:
+            self._log(
+                f"[CODA] Ordine {self.policy}: latenza di completamento media "
+                f"{self.metrics.mean_latency():.1f}s, p50/p90/p99 {latency['p50']:.1f}"
+                f"/{latency['p90']:.1f}/{latency['p99']:.1f}s"
+            )
+        speed = pct["avg_speed"]
+        if speed["p50"] is not None:
+            self._log(
+                f"[INFO] Velocità media per URL (p50/p90/p99): {format_speed(speed['p50'])}"
+                f" / {format_speed(speed['p90'])} / {format_speed(speed['p99'])}"
+            )
 
-    def _build_format(self):
-        q = self.options["quality"].lower()
+    def _build_format(self, options):
+        q = options["quality"].lower()
 
-        if self.options["audio_only"]:
+        if options["audio_only"]:
             return "bestaudio/best"
 
-        if self.options["video_only"]:
+        if options["video_only"]:
             if q == "best":
                 return "bestvideo[ext=mp4]/bestvideo"
             if q == "worst":
@@ -192,36 +1802,107 @@ class YtDlpDownloader(QObject):
 
         return "bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best"
 
-    def _hook(self, d):
+    def _hook(self, d, item):
         if self.stop_requested:
-            raise ValueError("Download annullato dall'utente")
+            raise ValueError(CANCEL_MESSAGE)
 
-        if d["status"] == "downloading":
-            percent = sanitize_log_text(d.get("_percent_str", "N/A").strip())
-            now = time.time()
-            if percent == self._last_progress_pct and now - self._last_progress_log < 1.0:
+        status = d["status"]
+        if status == "downloading":
+            if self._bandwidth.active:
+                self._throttle(d, item)
+            if d.get("fragment_count"):
+                item.fragment_count = d["fragment_count"]
+            # Percorso caldo: nessuna formattazione né segnale sotto l'intervallo minimo
+            now = time.monotonic()
+            if now - item.last_event < PROGRESS_EVENT_INTERVAL:
                 return
-            self._last_progress_pct = percent
-            self._last_progress_log = now
+            item.last_event = now
+            self._sample_speed(d, item, now)
+            self._emit_progress(d, item, now)
 
-            speed = sanitize_log_text(d.get("_speed_str", "N/A").strip())
-            eta = sanitize_log_text(d.get("_eta_str", "N/A"))
-            if self.total_urls > 1:
-                self._log(
-                    f"[{self.current_url_index}/{self.total_urls}] "
-                    f"{percent} @ {speed} ETA {eta}"
-                )
-            else:
-                self._log(f"{percent} @ {speed} ETA {eta}")
+        elif status == "finished":
+            if item.fragment_count:
+                self._log_fragment_stats(d, item)
+            item.base_bytes += d.get("total_bytes") or d.get("downloaded_bytes") or 0
+            item.last_event = 0.0
 
-        elif d["status"] == "finished":
-            if self.total_urls > 1:
-                self._log(
-                    f"[{self.current_url_index}/{self.total_urls}] "
-                    "Post-processing in corso..."
-                )
-            else:
-                self._log("Post-processing in corso...")
+    def _log_fragment_stats(self, d, item):
+        """Riepilogo di un download a frammenti; il campione alimenta FragmentTuner."""
+        count, item.fragment_count = item.fragment_count, None
+        nbytes = d.get("total_bytes") or d.get("downloaded_bytes") or 0
+        elapsed = d.get("elapsed") or 0
+        speed = nbytes / elapsed if elapsed else None
+        line = (
+            f"[FRAMMENTI] {self._prefix(item.index)}{count} frammenti, "
+            f"{item.fragments} in parallelo: {format_bytes(nbytes)} in {elapsed:.1f}s "
+            f"({format_speed(speed)})"
+        )
+        # Con il limite di banda attivo il throughput misurato non è significativo
+        if not self.fragment_concurrency and not self._bandwidth.active:
+            level = self._fragment_tuner.report(
+                item.host, item.fragments, nbytes, elapsed
+            )
+            if level is not None and level != item.fragments:
+                line += f" - prossimi download da {item.host}: {level} in parallelo"
+        self._log(line)
+
+    def _sample_speed(self, d, item, now):
+        """Velocità di picco su finestre di PROGRESS_EVENT_INTERVAL (byte/s).
+
+        Quella riportata da yt-dlp è istantanea per blocco e ignora le attese
+        del limite di banda.
+        """
+        downloaded = item.base_bytes + (d.get("downloaded_bytes") or 0)
+        if item.speed_time is not None and now > item.speed_time:
+            speed = (downloaded - item.speed_bytes) / (now - item.speed_time)
+            if item.peak_speed is None or speed > item.peak_speed:
+                item.peak_speed = speed
+        item.speed_time = now
+        item.speed_bytes = downloaded
+
+    def _throttle(self, d, item):
+        """Preleva dal bucket globale i byte ricevuti dall'ultimo aggiornamento."""
+        filename = d.get("tmpfilename") or d.get("filename")
+        downloaded = d.get("downloaded_bytes") or 0
+        # Con i frammenti paralleli l'hook arriva da più thread
+        with item.lock:
+            if filename != item.throttle_file:
+                item.throttle_file = filename
+                item.throttle_bytes = 0
+            delta = downloaded - item.throttle_bytes
+            item.throttle_bytes = max(downloaded, item.throttle_bytes)
+        self._bandwidth.consume(delta, lambda: self.stop_requested)
+
+    def _item_total(self, d, item):
+        """Dimensione attesa dell'URL: somma dei formati richiesti se note."""
+        if item.item_total is None:
+            info = d.get("info_dict") or {}
+            formats = info.get("requested_formats") or []
+            sizes = [f.get("filesize") or f.get("filesize_approx") for f in formats]
+            item.item_total = sum(sizes) if sizes and all(sizes) else 0
+        if item.item_total:
+            return item.item_total
+        part_total = d.get("total_bytes") or d.get("total_bytes_estimate")
+        return item.base_bytes + part_total if part_total else None
+
+    def _emit_progress(self, d, item, now):
+        event = ProgressEvent(
+            index=item.index,
+            downloaded_bytes=item.base_bytes + (d.get("downloaded_bytes") or 0),
+            total_bytes=self._item_total(d, item),
+            speed=d.get("speed"),
+            eta=d.get("eta"),
+        )
+        self.item_progress_signal.emit(event)
+
+        if now - item.last_progress_log >= PROGRESS_LOG_INTERVAL:
+            item.last_progress_log = now
+            fraction = event.fraction
+            percent = f"{fraction * 100:.1f}%" if fraction is not None else "N/A"
+            self._log(
+                f"{self._prefix(item.index)}{percent} di {format_bytes(event.total_bytes)} "
+                f"@ {format_speed(event.speed)} ETA {format_eta(event.eta)}"
+            )
 
     def debug(self, msg):
         if msg.startswith("[debug] "):
@@ -0,0 +1,187 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from urllib.parse import urlsplit, urlunsplit
+from utils import get_user_data_dir
+
+DEFAULT_TTL = 3600  # secondi, per risultati senza scadenza esplicita negli URL
+EXPIRY_MARGIN = 15 * 60  # anticipo rispetto alla scadenza degli URL firmati
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# Parametro "expire" degli URL firmati (es. googlevideo: ?expire=... o /expire/.../)
+_EXPIRE_RE = re.compile(r"[?&/]expire[=/](\d{9,11})")
+
+
+def get_cache_path():
+    return os.path.join(get_user_data_dir(), "extract_cache.sqlite3")
+
+
+def normalize_url(url):
+    """Schema e host in minuscolo, senza frammento né spazi."""
+    parts = urlsplit(url.strip())
+    return urlunsplit(
+        (parts.scheme.lower(), parts.netloc.lower(), parts.path or "/", parts.query, "")
+    )
+
+
+def extractor_id(url):
+    """(ie_key, id) dell'extractor yt-dlp che gestisce l'URL, senza rete.
+
+    Restituisce (None, None) per URL gestiti solo dall'extractor generico.
+    """
+    from yt_dlp.extractor import gen_extractor_classes
+
+    url = url.strip()
+    for ie in gen_extractor_classes():
+        if not ie.suitable(url):
+            continue
+        if ie.ie_key() == "Generic":
+            break
+        video_id = ie.get_temp_id(url)
+        if video_id:
+            return ie.ie_key(), video_id
+        break
+    return None, None
+
+
+def cache_key(url):
+    """Chiave extractor:id se l'URL è riconosciuto, altrimenti l'URL normalizzato."""
+    ie_key, video_id = extractor_id(url)
+    if video_id:
+        return f"{ie_key}:{video_id}"
+    return normalize_url(url)
+
+
+def _url_expiry(info):
+    """Prima scadenza (epoch) tra gli URL dei formati, None se non indicata."""
+    urls = [info.get("url"), info.get("manifest_url")]
+    for fmt in info.get("formats") or []:
+        urls.append(fmt.get("url"))
+        urls.append(fmt.get("manifest_url"))
+    expiries = []
+    for url in urls:
+        if isinstance(url, str):
+            match = _EXPIRE_RE.search(url)
+            if match:
+                expiries.append(int(match.group(1)))
+    return min(expiries) if expiries else None
+
+
+def _is_cacheable(info):
+    return (
+        isinstance(info, dict)
+        and info.get("_type", "video") == "video"
+        and not info.get("is_live")
+    )
+
+
+class ExtractionCache:
+    """Cache SQLite dei risultati di extract_info con TTL e rimozione LRU."""
+
+    def __init__(self, path=None, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path or get_cache_path()
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, info TEXT NOT NULL, size INTEGER NOT NULL, "
+            "expires REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS entries_last_used ON entries(last_used)"
+        )
+        self._conn.commit()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT info, expires FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[1] <= now:
+                if row is not None:
+                    self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                    self._conn.commit()
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE entries SET last_used = ? WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key, info):
+        if not _is_cacheable(info):
+            return False
+        # Le chiavi "__" contengono callable interni di yt-dlp, non serializzabili
+        data = {k: v for k, v in info.items() if not k.startswith("__")}
+        try:
+            payload = json.dumps(data, ensure_ascii=False)
+        except (TypeError, ValueError):
+            return False
+
+        now = time.time()
+        expires = now + self.ttl
+        url_expiry = _url_expiry(data)
+        if url_expiry is not None:
+            expires = min(expires, url_expiry - EXPIRY_MARGIN)
+        if expires <= now:
+            return False
+
+        size = len(payload.encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, info, size, expires, last_used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, payload, size, expires, now),
+            )
+            self._evict(now)
+            self._conn.commit()
+        return True
+
+    def invalidate(self, key):
+        with self._lock:
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def _evict(self, now):
+        self._conn.execute("DELETE FROM entries WHERE expires <= ?", (now,))
+        total = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM entries"
+        ).fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute(
+            "SELECT key, size FROM entries ORDER BY last_used ASC"
+        ).fetchall()
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+
+    def stats(self):
+        with self._lock:
+            count, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": count,
+            "bytes": total,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -1,79 +1,47 @@
 import os
-import zipfile
-import urllib.request
-from utils import get_persistent_ffmpeg_dir, get_ffmpeg_status, invalidate_ffmpeg_cache
+from ffmpeg_install import get_ffmpeg_zip_url, install_ffmpeg
+from utils import (
+    get_persistent_ffmpeg_dir,
+    get_ffmpeg_snapshot,
+    get_ffmpeg_status,
+    invalidate_ffmpeg_cache,
+)
 from PySide6.QtWidgets import (
     QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QProgressBar, QMessageBox
 )
 from PySide6.QtCore import QThread, Signal, Qt, QUrl
 from PySide6.QtGui import QDesktopServices
 
-DOWNLOAD_TIMEOUT = 120
+
+class FFmpegCheckWorker(QThread):
+    """Rileva ffmpeg in background (avvia i binari) e restituisce lo snapshot."""
+
+    finished_signal = Signal(object)
+
+    def run(self):
+        self.finished_signal.emit(get_ffmpeg_snapshot())
 
 
 class FFmpegDownloadWorker(QThread):
     progress_signal = Signal(int, str)
     finished_signal = Signal(bool, str)
 
-    def __init__(self, target_dir):
+    def __init__(self, target_dir, zip_url=None):
         super().__init__()
         self.target_dir = target_dir
-        self.zip_url = "https://www.gyan.dev/ffmpeg/builds/ffmpeg-release-essentials.zip"
+        self.zip_url = zip_url or get_ffmpeg_zip_url()
 
     def run(self):
         try:
-            os.makedirs(self.target_dir, exist_ok=True)
-            zip_path = os.path.join(self.target_dir, "ffmpeg.zip")
-
-            self.progress_signal.emit(0, "Connessione in corso per il download...")
-
-            req = urllib.request.Request(
-                self.zip_url,
-                headers={"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"},
+            complete, verified = install_ffmpeg(
+                self.target_dir, self.zip_url, self.progress_signal.emit
             )
-            with urllib.request.urlopen(req, timeout=DOWNLOAD_TIMEOUT) as response:
-                total_size = int(response.headers.get("content-length", 0))
-                downloaded = 0
-                block_size = 1024 * 64
-
-                with open(zip_path, "wb") as f:
-                    while True:
-                        buffer = response.read(block_size)
-                        if not buffer:
-                            break
-                        downloaded += len(buffer)
-                        f.write(buffer)
-                        if total_size > 0:
-                            percent = int((downloaded / total_size) * 100)
-                            mb_downloaded = downloaded / (1024 * 1024)
-                            mb_total = total_size / (1024 * 1024)
-                            self.progress_signal.emit(
-                                int(percent * 0.9),
-                                f"Scaricamento: {percent}% ({mb_downloaded:.1f}/{mb_total:.1f} MB)",
-                            )
-
-            self.progress_signal.emit(90, "Estrazione di ffmpeg.exe e ffprobe.exe...")
-
-            extracted_count = 0
-            with zipfile.ZipFile(zip_path, "r") as zip_ref:
-                for file_info in zip_ref.infolist():
-                    filename = os.path.basename(file_info.filename)
-                    if filename in ["ffmpeg.exe", "ffprobe.exe"]:
-                        source = zip_ref.open(file_info)
-                        target_path = os.path.join(self.target_dir, filename)
-                        with open(target_path, "wb") as target_file:
-                            target_file.write(source.read())
-                        source.close()
-                        extracted_count += 1
-
-            try:
-                os.remove(zip_path)
-            except OSError:
-                pass
-
-            if extracted_count >= 2:
+            if complete:
                 invalidate_ffmpeg_cache()
-                self.progress_signal.emit(100, "Installazione completata con successo!")
+                message = "Installazione completata con successo!"
+                if not verified:
+                    message += " (checksum non disponibile, file non verificato)"
+                self.progress_signal.emit(100, message)
                 self.finished_signal.emit(True, "")
             else:
                 self.finished_signal.emit(
@@ -180,7 +148,8 @@ class FFmpegDialog(QDialog):
                 self,
                 "Errore di Installazione",
                 f"Impossibile installare FFmpeg automaticamente:\n\n{error_msg}\n\n"
-                "Riprova o seleziona l'installazione manuale.",
+                "Riprova (il download riprende da dove si è interrotto) "
+                "o seleziona l'installazione manuale.",
             )
             self.btn_download.setEnabled(True)
             self.btn_manual.setEnabled(True)
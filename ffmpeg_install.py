@@ -0,0 +1,322 @@
+import hashlib
+import http.client
+import json
+import os
+import shutil
+import threading
+import time
+import urllib.error
+import urllib.request
+import zipfile
+from utils import FFMPEG_EXE, FFPROBE_EXE
+
+FFMPEG_ZIP_URL = "https://www.gyan.dev/ffmpeg/builds/ffmpeg-release-essentials.zip"
+# Permette di provare l'installazione contro un server locale al posto di gyan.dev
+FFMPEG_URL_ENV = "YTDLP_GUI_FFMPEG_URL"
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"
+
+DOWNLOAD_TIMEOUT = 120
+DOWNLOAD_SEGMENTS = 4
+MIN_SEGMENT_SIZE = 4 * 1024 * 1024
+CHUNK_SIZE = 256 * 1024
+SEGMENT_RETRIES = 5
+RETRY_DELAY = 2.0
+# Intervallo minimo tra due salvataggi dello stato di ripresa
+STATE_SAVE_INTERVAL = 1.0
+
+# Quota della barra dedicata a ciascuna fase (il resto è l'estrazione)
+DOWNLOAD_SHARE = 85
+VERIFY_SHARE = 5
+
+
+def get_ffmpeg_zip_url():
+    return os.environ.get(FFMPEG_URL_ENV) or FFMPEG_ZIP_URL
+
+
+def _request(url, start=None, end=None, method="GET"):
+    headers = {"User-Agent": USER_AGENT}
+    if start is not None:
+        headers["Range"] = f"bytes={start}-{'' if end is None else end}"
+    req = urllib.request.Request(url, headers=headers, method=method)
+    return urllib.request.urlopen(req, timeout=DOWNLOAD_TIMEOUT)
+
+
+def fetch_checksum(url):
+    """SHA-256 pubblicato accanto allo zip (url + ".sha256"); None se assente."""
+    try:
+        with _request(url + ".sha256") as response:
+            text = response.read(4096).decode("ascii", "replace")
+    except urllib.error.HTTPError as e:
+        if e.code == 404:
+            return None
+        raise
+    digest = text.split()[0].lower() if text.split() else ""
+    if len(digest) != 64 or any(c not in "0123456789abcdef" for c in digest):
+        raise ValueError(f"Checksum non valido in {url}.sha256")
+    return digest
+
+
+def sha256_file(path, progress=None):
+    digest = hashlib.sha256()
+    total = os.path.getsize(path) or 1
+    done = 0
+    with open(path, "rb") as handle:
+        while True:
+            chunk = handle.read(1024 * 1024)
+            if not chunk:
+                break
+            digest.update(chunk)
+            done += len(chunk)
+            if progress:
+                progress(done / total)
+    return digest.hexdigest()
+
+
+class SegmentedDownload:
+    """Download HTTP a segmenti paralleli (Range), ripristinabile.
+
+    Il file parziale (.part) viene preallocato e ogni segmento scrive alla
+    propria posizione; l'avanzamento è salvato in un .json accanto al file,
+    così una connessione caduta o un riavvio dell'app ripartono dai byte
+    già scritti. Se il server non accetta Range si scarica in un solo flusso.
+    """
+
+    def __init__(self, url, dest, segments=DOWNLOAD_SEGMENTS, progress=None):
+        self.url = url
+        self.dest = dest
+        self.part_path = dest + ".part"
+        self.state_path = dest + ".part.json"
+        self.segments = max(1, segments)
+        self._progress = progress
+        self._lock = threading.Lock()
+        self._state = None
+        self._last_save = 0.0
+        self._errors = []
+
+    def _probe(self):
+        """(dimensione, validatore, range supportati) del file remoto."""
+        with _request(self.url, 0, 0) as response:
+            validator = response.headers.get("ETag") or response.headers.get(
+                "Last-Modified"
+            )
+            content_range = response.headers.get("Content-Range") or ""
+            if response.status == 206 and "/" in content_range:
+                size = content_range.rsplit("/", 1)[1]
+                if size.isdigit():
+                    return int(size), validator, True
+            return int(response.headers.get("Content-Length") or 0), validator, False
+
+    def _load_state(self, size, validator):
+        try:
+            with open(self.state_path, encoding="utf-8") as handle:
+                state = json.load(handle)
+        except (OSError, ValueError):
+            return None
+        if (
+            state.get("url") != self.url
+            or state.get("size") != size
+            or state.get("validator") != validator
+            or not os.path.isfile(self.part_path)
+            or os.path.getsize(self.part_path) != size
+        ):
+            return None
+        return state
+
+    def _new_state(self, size, validator):
+        count = max(1, min(self.segments, size // MIN_SEGMENT_SIZE))
+        step = -(-size // count)
+        ranges = [[start, min(start + step, size) - 1, 0] for start in range(0, size, step)]
+        with open(self.part_path, "wb") as handle:
+            handle.truncate(size)
+        return {"url": self.url, "size": size, "validator": validator, "segments": ranges}
+
+    def _save_state(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._last_save < STATE_SAVE_INTERVAL:
+            return
+        self._last_save = now
+        temp_path = self.state_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as handle:
+            json.dump(self._state, handle)
+        os.replace(temp_path, self.state_path)
+
+    def _downloaded(self):
+        return sum(done for _, _, done in self._state["segments"])
+
+    def _report(self):
+        if self._progress:
+            self._progress(self._downloaded(), self._state["size"])
+
+    def _fetch_segment(self, segment):
+        start, end, _ = segment
+        for attempt in range(SEGMENT_RETRIES + 1):
+            offset = start + segment[2]
+            if offset > end:
+                return
+            try:
+                with _request(self.url, offset, end) as response:
+                    if response.status != 206:
+                        raise ValueError("Il server ha ignorato la richiesta Range")
+                    with open(self.part_path, "r+b") as handle:
+                        handle.seek(offset)
+                        while offset <= end:
+                            chunk = response.read(min(CHUNK_SIZE, end - offset + 1))
+                            if not chunk:
+                                break
+                            handle.write(chunk)
+                            offset += len(chunk)
+                            with self._lock:
+                                segment[2] = offset - start
+                                self._report()
+                                self._save_state()
+                if offset > end:
+                    return
+            except ValueError as e:
+                self._errors.append(e)
+                return
+            except (OSError, http.client.HTTPException) as e:
+                if attempt == SEGMENT_RETRIES or self._errors:
+                    self._errors.append(e)
+                    return
+            time.sleep(RETRY_DELAY * (attempt + 1))
+
+    def _download_single(self):
+        """Un solo flusso, senza ripresa (server senza supporto Range)."""
+        with _request(self.url) as response:
+            total = int(response.headers.get("Content-Length") or 0)
+            done = 0
+            with open(self.part_path, "wb") as handle:
+                while True:
+                    chunk = response.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    handle.write(chunk)
+                    done += len(chunk)
+                    if self._progress:
+                        self._progress(done, total)
+
+    def run(self):
+        """Scarica in self.part_path; restituisce True se ha ripreso un download."""
+        size, validator, ranges = self._probe()
+        if not ranges or size <= 0:
+            self._remove_state()
+            self._download_single()
+            return False
+
+        self._state = self._load_state(size, validator)
+        resumed = self._state is not None
+        if not resumed:
+            self._state = self._new_state(size, validator)
+        self._save_state(force=True)
+        self._report()
+
+        threads = [
+            threading.Thread(target=self._fetch_segment, args=(segment,), daemon=True)
+            for segment in self._state["segments"]
+            if segment[2] <= segment[1] - segment[0]
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        with self._lock:
+            self._save_state(force=True)
+        if self._errors:
+            raise self._errors[0]
+        if self._downloaded() != size:
+            raise OSError("Download incompleto, riprova per continuare")
+        return resumed
+
+    def _remove_state(self):
+        try:
+            os.remove(self.state_path)
+        except OSError:
+            pass
+
+    def discard(self):
+        """Elimina file parziale e stato (es. checksum errato)."""
+        self._remove_state()
+        try:
+            os.remove(self.part_path)
+        except OSError:
+            pass
+
+
+def extract_members(zip_path, target_dir, names):
+    """Estrae i file indicati (per nome, ovunque nello zip) a blocchi.
+
+    Ogni file è scritto in un temporaneo e rinominato solo a scrittura
+    completata: un'estrazione interrotta non lascia eseguibili troncati.
+    """
+    extracted = []
+    with zipfile.ZipFile(zip_path, "r") as archive:
+        for info in archive.infolist():
+            filename = os.path.basename(info.filename)
+            if filename not in names or filename in extracted:
+                continue
+            target_path = os.path.join(target_dir, filename)
+            temp_path = target_path + ".tmp"
+            with archive.open(info) as source, open(temp_path, "wb") as target:
+                shutil.copyfileobj(source, target, CHUNK_SIZE)
+            mode = (info.external_attr >> 16) & 0o777
+            if mode:
+                os.chmod(temp_path, mode)
+            os.replace(temp_path, target_path)
+            extracted.append(filename)
+    return extracted
+
+
+def install_ffmpeg(target_dir, url=None, progress=None):
+    """Scarica lo zip di FFmpeg, ne verifica lo SHA-256 ed estrae ffmpeg/ffprobe.
+
+    progress(percentuale, messaggio) viene chiamato dal thread del download
+    e dai thread dei segmenti. Solleva un'eccezione se qualcosa non va; il
+    download parziale resta su disco per la ripresa al tentativo successivo.
+    """
+    url = url or get_ffmpeg_zip_url()
+    report = progress or (lambda percent, message: None)
+    os.makedirs(target_dir, exist_ok=True)
+    zip_path = os.path.join(target_dir, "ffmpeg.zip")
+
+    report(0, "Connessione in corso per il download...")
+    expected = fetch_checksum(url)
+
+    def on_bytes(done, total):
+        if total > 0:
+            percent = int(done / total * 100)
+            report(
+                int(percent * DOWNLOAD_SHARE / 100),
+                f"Scaricamento: {percent}% ({done / (1024 * 1024):.1f}/"
+                f"{total / (1024 * 1024):.1f} MB)",
+            )
+
+    download = SegmentedDownload(url, zip_path, progress=on_bytes)
+    if download.run():
+        report(DOWNLOAD_SHARE, "Download ripreso e completato.")
+
+    if expected:
+        report(DOWNLOAD_SHARE, "Verifica del checksum SHA-256...")
+        actual = sha256_file(
+            download.part_path,
+            lambda fraction: report(
+                DOWNLOAD_SHARE + int(fraction * VERIFY_SHARE), "Verifica del checksum SHA-256..."
+            ),
+        )
+        if actual != expected:
+            download.discard()
+            raise ValueError(
+                "Il checksum SHA-256 del file scaricato non corrisponde: "
+                "il download è stato eliminato, riprova."
+            )
+    os.replace(download.part_path, zip_path)
+    download.discard()
+
+    report(DOWNLOAD_SHARE + VERIFY_SHARE, f"Estrazione di {FFMPEG_EXE} e {FFPROBE_EXE}...")
+    try:
+        extracted = extract_members(zip_path, target_dir, (FFMPEG_EXE, FFPROBE_EXE))
+    finally:
+        try:
+            os.remove(zip_path)
+        except OSError:
+            pass
+    return len(extracted) >= 2, expected is not None
@@ -0,0 +1,61 @@
+import threading
+
+# 0 = frammenti paralleli scelti automaticamente da FragmentTuner
+FRAGMENTS_AUTO = 0
+MAX_FRAGMENT_CONCURRENCY = 16
+AUTO_START_FRAGMENTS = 4
+# Guadagno minimo (relativo) che giustifica più connessioni per frammento
+MIN_GAIN = 0.10
+# Campioni troppo brevi non misurano la banda in modo affidabile
+MIN_SAMPLE_SECONDS = 1.0
+MIN_SAMPLE_BYTES = 1024 * 1024
+
+
+class FragmentTuner:
+    """Sceglie i frammenti paralleli (HLS/DASH) per host in base al throughput.
+
+    Ogni download a frammenti concluso fornisce un campione per il livello
+    usato; il livello successivo sale (raddoppiando) finché il guadagno resta
+    sopra MIN_GAIN, poi prova a scendere: vince il livello più basso entro
+    MIN_GAIN dal migliore misurato.
+    """
+
+    def __init__(self, start=AUTO_START_FRAGMENTS, maximum=MAX_FRAGMENT_CONCURRENCY):
+        self.start = max(1, min(start, maximum))
+        self.maximum = maximum
+        self._lock = threading.Lock()
+        self._samples = {}  # host -> {livello: throughput medio in byte/s}
+        self._next = {}  # host -> livello da usare per il prossimo download
+
+    def level_for(self, host):
+        with self._lock:
+            return self._next.get(host, self.start)
+
+    def report(self, host, level, nbytes, seconds):
+        """Registra un download concluso; restituisce il prossimo livello (o None)."""
+        if not host or seconds < MIN_SAMPLE_SECONDS or nbytes < MIN_SAMPLE_BYTES:
+            return None
+        throughput = nbytes / seconds
+        with self._lock:
+            samples = self._samples.setdefault(host, {})
+            previous = samples.get(level)
+            # Media mobile: un campione isolato non ribalta le misure precedenti
+            samples[level] = (
+                throughput if previous is None else (previous + throughput) / 2
+            )
+            top = max(samples.values())
+            best = min(
+                lvl for lvl, value in samples.items() if value >= top * (1 - MIN_GAIN)
+            )
+            up = min(level * 2, self.maximum)
+            down = max(level // 2, 1)
+            if level != best:
+                nxt = best
+            elif up != level and up not in samples:
+                nxt = up
+            elif down != level and down not in samples:
+                nxt = down
+            else:
+                nxt = level
+            self._next[host] = nxt
+            return nxt
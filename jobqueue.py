@@ -0,0 +1,165 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from utils import get_user_data_dir
+
+# Stati persistiti per singolo URL
+JOB_PENDING = "pending"
+JOB_EXTRACTING = "extracting"
+JOB_DOWNLOADING = "downloading"
+JOB_POSTPROCESSING = "postprocessing"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+
+# Stati da riprendere dopo un'interruzione (chiusura o crash)
+RESUMABLE_STATES = (
+    JOB_PENDING,
+    JOB_EXTRACTING,
+    JOB_DOWNLOADING,
+    JOB_POSTPROCESSING,
+    JOB_CANCELLED,
+)
+
+
+def get_jobqueue_path():
+    return os.path.join(get_user_data_dir(), "jobs.sqlite3")
+
+
+class JobQueue:
+    """Coda persistente (SQLite) delle sessioni di download e dello stato per URL.
+
+    Ogni cambio di stato viene salvato in una transazione: dopo un crash o una
+    chiusura a metà sessione le voci non concluse possono essere riprese.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or get_jobqueue_path()
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS batches ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, options TEXT NOT NULL, "
+                "created REAL NOT NULL, finished REAL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "batch_id INTEGER NOT NULL, idx INTEGER NOT NULL, url TEXT NOT NULL, "
+                "state TEXT NOT NULL, error TEXT, updated REAL NOT NULL, "
+                "PRIMARY KEY (batch_id, idx))"
+            )
+
+    def create_batch(self, options):
+        """Registra una nuova sessione con tutti i suoi URL in stato pending."""
+        stored = {k: v for k, v in options.items() if k not in ("urls", "batch_id")}
+        now = time.time()
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO batches (options, created) VALUES (?, ?)",
+                (json.dumps(stored), now),
+            )
+            batch_id = cursor.lastrowid
+            self._conn.executemany(
+                "INSERT INTO jobs (batch_id, idx, url, state, updated) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (
+                    (batch_id, i, url, JOB_PENDING, now)
+                    for i, url in enumerate(options["urls"], 1)
+                ),
+            )
+        return batch_id
+
+    def add_job(self, batch_id, index, url):
+        """Aggiunge un URL trovato durante la sessione (es. voce di una playlist)."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO jobs (batch_id, idx, url, state, updated) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (batch_id, index, url, JOB_PENDING, time.time()),
+            )
+
+    def set_state(self, batch_id, index, state, error=None):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET state = ?, error = ?, updated = ? "
+                "WHERE batch_id = ? AND idx = ?",
+                (state, error, time.time(), batch_id, index),
+            )
+
+    def finish_batch(self, batch_id):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE batches SET finished = ? WHERE id = ?", (time.time(), batch_id)
+            )
+
+    def interrupted_batches(self):
+        """Sessioni non concluse con URL ancora da completare (più recenti prima)."""
+        placeholders = ",".join("?" * len(RESUMABLE_STATES))
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT b.id, b.created, COUNT(j.idx), "
+                f"SUM(j.state IN ({placeholders})) "
+                "FROM batches b JOIN jobs j ON j.batch_id = b.id "
+                "WHERE b.finished IS NULL GROUP BY b.id ORDER BY b.created DESC",
+                RESUMABLE_STATES,
+            ).fetchall()
+        return [
+            {"id": batch_id, "created": created, "total": total, "remaining": remaining}
+            for batch_id, created, total, remaining in rows
+            if remaining
+        ]
+
+    def resume_batch(self, batch_id):
+        """Crea una nuova sessione con gli URL non conclusi e chiude la precedente.
+
+        Restituisce le opzioni per YtDlpDownloader (con "urls" e "batch_id"),
+        oppure None se non resta nulla da scaricare.
+        """
+        placeholders = ",".join("?" * len(RESUMABLE_STATES))
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT options FROM batches WHERE id = ?", (batch_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            urls = [
+                url
+                for (url,) in self._conn.execute(
+                    "SELECT url FROM jobs "
+                    f"WHERE batch_id = ? AND state IN ({placeholders}) ORDER BY idx",
+                    (batch_id, *RESUMABLE_STATES),
+                )
+            ]
+            self._conn.execute(
+                "UPDATE batches SET finished = ? WHERE id = ?", (now, batch_id)
+            )
+            if not urls:
+                return None
+            options = json.loads(row[0])
+            cursor = self._conn.execute(
+                "INSERT INTO batches (options, created) VALUES (?, ?)",
+                (row[0], now),
+            )
+            new_id = cursor.lastrowid
+            self._conn.executemany(
+                "INSERT INTO jobs (batch_id, idx, url, state, updated) "
+                "VALUES (?, ?, ?, ?, ?)",
+                ((new_id, i, url, JOB_PENDING, now) for i, url in enumerate(urls, 1)),
+            )
+        options["urls"] = urls
+        options["batch_id"] = new_id
+        return options
+
+    def discard_batch(self, batch_id):
+        self.finish_batch(batch_id)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,86 @@
+import os
+import threading
+import time
+from utils import get_user_data_dir
+
+FLUSH_INTERVAL = 0.1  # secondi tra un invio alla UI e il successivo
+MAX_LOG_FILES = 20
+
+
+def get_log_dir():
+    return os.path.join(get_user_data_dir(), "logs")
+
+
+def new_session_log_path():
+    """Percorso del file di log per una nuova sessione, eliminando i più vecchi."""
+    log_dir = get_log_dir()
+    os.makedirs(log_dir, exist_ok=True)
+    try:
+        old_logs = sorted(
+            name for name in os.listdir(log_dir)
+            if name.startswith("session-") and name.endswith(".log")
+        )
+        for name in old_logs[: max(0, len(old_logs) - MAX_LOG_FILES + 1)]:
+            os.remove(os.path.join(log_dir, name))
+    except OSError:
+        pass
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    return os.path.join(log_dir, f"session-{stamp}-{os.getpid()}.log")
+
+
+class LogSink:
+    """Raccoglie i messaggi dai thread worker e li inoltra a blocchi.
+
+    Un thread in background invia alla UI al massimo un blocco ogni
+    FLUSH_INTERVAL secondi (un solo segnale per blocco) e accoda il log
+    completo su file, così il costo per messaggio nel worker resta minimo.
+    """
+
+    def __init__(self, emit, log_path=None, interval=FLUSH_INTERVAL):
+        self._emit = emit
+        self._interval = interval
+        self._pending = []
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self.log_path = log_path
+        self._file = None
+        if log_path:
+            try:
+                self._file = open(log_path, "a", encoding="utf-8")
+            except OSError:
+                self.log_path = None
+        self._thread = threading.Thread(
+            target=self._run, name="log-sink", daemon=True
+        )
+        self._thread.start()
+
+    def write(self, msg):
+        with self._lock:
+            self._pending.append(msg)
+
+    def _flush(self):
+        with self._lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, []
+        text = "\n".join(batch)
+        self._emit(text)
+        if self._file is not None:
+            try:
+                self._file.write(text + "\n")
+                self._file.flush()
+            except OSError:
+                pass
+
+    def _run(self):
+        while not self._closed.wait(self._interval):
+            self._flush()
+
+    def close(self):
+        """Ferma il thread di flush e invia gli ultimi messaggi rimasti."""
+        self._closed.set()
+        self._thread.join()
+        self._flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
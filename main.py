@@ -1,22 +1,28 @@
-
-from PySide6.QtWidgets import QApplication
-from ui_main import MainWindow
-from utils import get_ffmpeg_status, invalidate_ffmpeg_cache
-from ffmpeg_dialog import FFmpegDialog
 import sys
 
-if __name__ == "__main__":
-    app = QApplication(sys.argv)
-    app.setQuitOnLastWindowClosed(True)
 
-    if not get_ffmpeg_status():
-        dialog = FFmpegDialog()
-        dialog.exec()
-        if not dialog.success:
-            sys.exit(0)
+def run_gui():
+    import startup
+    from PySide6.QtWidgets import QApplication
+    from ui_main import MainWindow
 
-    invalidate_ffmpeg_cache()
+    startup.report.mark(startup.PHASE_IMPORT)
+
+    app = QApplication(sys.argv)
+    app.setQuitOnLastWindowClosed(True)
 
     window = MainWindow()
     window.show()
+    # Da cache se i binari non sono cambiati, altrimenti in background
+    window.check_ffmpeg()
+    window.preload_modules()
+    window.offer_resume()
     sys.exit(app.exec())
+
+
+if __name__ == "__main__":
+    if any(arg in ("--headless", "-h", "--help") for arg in sys.argv[1:]):
+        from cli import build_parser, run_headless
+
+        sys.exit(run_headless(build_parser().parse_args()))
+    run_gui()
@@ -0,0 +1,299 @@
+import os
+from dataclasses import dataclass, field
+from yt_dlp.postprocessor.common import PostProcessor
+from yt_dlp.postprocessor.ffmpeg import FFmpegMergerPP, FFmpegPostProcessor
+from yt_dlp.utils import PostProcessingError, prepend_extension
+from archive import KIND_AUDIO, KIND_AUDIO_VIDEO, KIND_VIDEO
+from defaults import AUDIO_FORMAT_MP3
+
+# Le modalità coincidono con le tipologie dell'archivio
+MODE_AUDIO = KIND_AUDIO
+MODE_VIDEO = KIND_VIDEO
+MODE_AUDIO_VIDEO = KIND_AUDIO_VIDEO
+
+VIDEO_CONTAINER = "mp4"
+AUDIO_BITRATE = "192k"
+
+# Codec che il contenitore mp4 accetta senza ricodifica
+MP4_VIDEO_CODECS = {"h264", "hevc", "av1", "vp9", "mpeg4"}
+MP4_AUDIO_CODECS = {"aac", "mp3", "alac", "ac3", "eac3"}
+# Contenitore in cui copiare il solo flusso audio, per codec
+AUDIO_CONTAINERS = {
+    "aac": "m4a",
+    "alac": "m4a",
+    "mp3": "mp3",
+    "opus": "opus",
+    "vorbis": "ogg",
+    "flac": "flac",
+}
+
+ACTION_NONE = "none"
+ACTION_REMUX = "remux"
+ACTION_TRANSCODE = "transcode"
+
+# Prefissi dei codec come li riportano gli extractor (vcodec/acodec di yt-dlp)
+_CODEC_PREFIXES = (
+    ("avc", "h264"),
+    ("h264", "h264"),
+    ("hev", "hevc"),
+    ("hvc", "hevc"),
+    ("h265", "hevc"),
+    ("av01", "av1"),
+    ("av1", "av1"),
+    ("vp09", "vp9"),
+    ("vp9", "vp9"),
+    ("vp8", "vp8"),
+    ("mp4v", "mpeg4"),
+    ("mp4a", "aac"),
+    ("aac", "aac"),
+    ("mp3", "mp3"),
+    ("opus", "opus"),
+    ("vorbis", "vorbis"),
+    ("flac", "flac"),
+    ("alac", "alac"),
+    ("ac-3", "ac3"),
+    ("ac3", "ac3"),
+    ("ec-3", "eac3"),
+    ("eac3", "eac3"),
+)
+
+
+def normalize_codec(codec):
+    """Nome ffprobe del codec a partire dalla stringa dell'extractor (None se ignoto)."""
+    if not codec or codec == "none":
+        return None
+    codec = codec.lower()
+    for prefix, name in _CODEC_PREFIXES:
+        if codec.startswith(prefix):
+            return name
+    return codec
+
+
+def claim_merge(info):
+    """Toglie il merger di yt-dlp: il merge lo esegue MediaPlanPP nello stesso passaggio."""
+    pps = info.get("__postprocessors")
+    if pps:
+        info["__postprocessors"] = [
+            pp for pp in pps if not isinstance(pp, FFmpegMergerPP)
+        ]
+
+
+@dataclass
+class StreamPlan:
+    """Un flusso dell'output: da quale input, con che codec e se va ricodificato."""
+
+    kind: str  # "v" o "a"
+    input_index: int
+    codec: str | None
+    transcode: bool = False
+    aac_fixup: bool = False
+
+
+@dataclass
+class MediaPlan:
+    inputs: list
+    output: str
+    streams: list = field(default_factory=list)
+    audio_codec: str = "aac"  # codec di destinazione se l'audio va ricodificato
+
+    @property
+    def action(self):
+        if any(s.transcode for s in self.streams):
+            return ACTION_TRANSCODE
+        if len(self.inputs) > 1 or self.inputs[0] != self.output:
+            return ACTION_REMUX
+        return ACTION_NONE
+
+    def describe(self):
+        name = os.path.basename(self.output)
+        if self.action == ACTION_NONE:
+            return f"{name}: formato già adatto, solo metadati (copia dei flussi)"
+        parts = []
+        for s in self.streams:
+            label = "video" if s.kind == "v" else "audio"
+            codec = s.codec or "?"
+            if s.transcode:
+                target = "h264" if s.kind == "v" else self.audio_codec
+                parts.append(f"{label} {codec} -> {target} (ricodifica)")
+            else:
+                parts.append(f"{label} {codec} (copia)")
+        if len(self.inputs) > 1:
+            step = "merge"
+        elif self.action == ACTION_TRANSCODE:
+            step = "conversione"
+        else:
+            step = "remux"
+        return f"{name}: {step} in un passaggio - {', '.join(parts)}"
+
+    def ffmpeg_args(self, metadata):
+        if not self.streams:
+            # Flussi non pianificati (codec non gestito): si copiano così come sono
+            args = ["-map", "0:v?", "-map", "0:a?", "-c", "copy"]
+            for key, value in metadata.items():
+                args += ["-metadata", f"{key}={value}"]
+            return args
+        args = []
+        for s in self.streams:
+            # Codec ignoto (ffprobe non disponibile): flusso facoltativo
+            optional = "?" if s.codec is None else ""
+            args += ["-map", f"{s.input_index}:{s.kind}:0{optional}"]
+        for s in self.streams:
+            if not s.transcode:
+                args += [f"-c:{s.kind}", "copy"]
+                if s.aac_fixup:
+                    args += ["-bsf:a", "aac_adtstoasc"]
+            elif s.kind == "v":
+                args += ["-c:v", "libx264"]
+            elif self.audio_codec == "mp3":
+                args += ["-c:a", "libmp3lame", "-b:a", AUDIO_BITRATE]
+            else:
+                args += ["-c:a", "aac", "-b:a", AUDIO_BITRATE]
+        if not any(s.kind == "v" for s in self.streams):
+            args.append("-vn")
+        for key, value in metadata.items():
+            args += ["-metadata", f"{key}={value}"]
+        return args
+
+
+class MediaPlanPP(FFmpegPostProcessor):
+    """Sceglie tra copia, remux e ricodifica e li esegue in un solo passaggio ffmpeg.
+
+    Sostituisce FFmpegMerger + FFmpegVideoConvertor (audio+video) e
+    FFmpegExtractAudio (solo audio): merge, contenitore e metadati vengono
+    scritti con una sola invocazione di ffmpeg, ricodificando solo i flussi
+    che il contenitore di destinazione non accetta.
+
+    Anche i file già nel formato giusto (ACTION_NONE) passano da ffmpeg, con
+    la sola copia dei flussi: titolo e URL della pagina (tag purl/comment)
+    servono a ricostruire l'archivio dalla cartella di destinazione.
+    """
+
+    def __init__(self, downloader, mode, audio_format=AUDIO_FORMAT_MP3, log=None):
+        super().__init__(downloader)
+        self.mode = mode
+        self.audio_format = audio_format
+        self._log = log or self.to_screen
+
+    @classmethod
+    def pp_key(cls):
+        return "MediaPlan"
+
+    def _probe_codecs(self, path):
+        """{"v": codec, "a": codec} letti con ffprobe ({} se non disponibile)."""
+        try:
+            data = self.get_metadata_object(path)
+        except Exception:
+            return {}
+        codecs = {}
+        for stream in data.get("streams") or []:
+            kind = {"video": "v", "audio": "a"}.get(stream.get("codec_type"))
+            if kind is None or kind in codecs:
+                continue
+            if (stream.get("disposition") or {}).get("attached_pic"):
+                continue
+            codecs[kind] = stream.get("codec_name")
+        return codecs
+
+    def _inputs(self, info):
+        """[(percorso, formato)] dei file da elaborare."""
+        files = info.get("__files_to_merge")
+        if files:
+            return list(zip(files, info.get("requested_formats") or [{}] * len(files)))
+        return [(info["filepath"], info)]
+
+    def plan(self, info):
+        inputs = self._inputs(info)
+        streams = {}
+        for index, (path, fmt) in enumerate(inputs):
+            probed = self._probe_codecs(path)
+            for kind, key in (("v", "vcodec"), ("a", "acodec")):
+                if kind in streams:
+                    continue
+                if probed:
+                    codec = probed.get(kind)
+                    if codec is None:
+                        continue
+                elif fmt.get(key) == "none":
+                    continue
+                else:
+                    # ffprobe non disponibile: codec dichiarato dall'extractor
+                    codec = normalize_codec(fmt.get(key))
+                streams[kind] = StreamPlan(
+                    kind,
+                    index,
+                    codec,
+                    aac_fixup=codec == "aac"
+                    and (fmt.get("protocol") or "").startswith("m3u8"),
+                )
+        paths = [path for path, _ in inputs]
+        if self.mode == MODE_AUDIO:
+            return self._plan_audio(info, paths, streams.get("a"))
+        return self._plan_video(info, paths, streams)
+
+    def _plan_video(self, info, paths, streams):
+        video = streams.get("v")
+        audio = streams.get("a") if self.mode == MODE_AUDIO_VIDEO else None
+        if video is None and audio is None:
+            return MediaPlan(paths[:1], paths[0])
+        base = os.path.splitext(info["filepath"])[0]
+        if self.mode == MODE_VIDEO and video and video.codec not in MP4_VIDEO_CODECS:
+            # Solo video: niente ricodifica, il file resta nel contenitore originale
+            return MediaPlan(paths[:1], paths[0])
+        plan = MediaPlan(paths, f"{base}.{VIDEO_CONTAINER}")
+        if video is not None:
+            video.transcode = video.codec is not None and video.codec not in MP4_VIDEO_CODECS
+            plan.streams.append(video)
+        if audio is not None:
+            audio.transcode = audio.codec is not None and audio.codec not in MP4_AUDIO_CODECS
+            plan.streams.append(audio)
+        return plan
+
+    def _plan_audio(self, info, paths, audio):
+        path = paths[0]
+        base = os.path.splitext(path)[0]
+        if audio is None:
+            raise PostProcessingError("Nessun flusso audio nel file scaricato")
+        if self.audio_format == AUDIO_FORMAT_MP3:
+            container = "mp3"
+            audio.transcode = audio.codec != "mp3"
+        else:
+            container = AUDIO_CONTAINERS.get(audio.codec)
+            if container is None:
+                return MediaPlan([path], path)
+        return MediaPlan([path], f"{base}.{container}", [audio], audio_codec="mp3")
+
+    def _metadata(self, info):
+        url = info.get("webpage_url") or info.get("original_url")
+        metadata = {
+            "title": info.get("title"),
+            "artist": info.get("artist") or info.get("uploader"),
+            "date": info.get("upload_date"),
+            "comment": url,
+            "purl": url,
+        }
+        return {k: v for k, v in metadata.items() if v}
+
+    @PostProcessor._restrict_to(images=False)
+    def run(self, info):
+        plan = self.plan(info)
+        metadata = self._metadata(info)
+        if plan.action == ACTION_NONE and not metadata:
+            # Formato già adatto e nessun metadato da scrivere: nessuna riscrittura
+            return [], info
+        self._log(plan.describe())
+
+        temp_path = prepend_extension(plan.output, "temp")
+        try:
+            self.run_ffmpeg_multiple_files(
+                plan.inputs, temp_path, plan.ffmpeg_args(metadata)
+            )
+        except BaseException:
+            # ffmpeg fallito o terminato dall'annullamento: niente file parziali
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        os.replace(temp_path, plan.output)
+
+        info["filepath"] = plan.output
+        info["ext"] = os.path.splitext(plan.output)[1].lstrip(".")
+        return [path for path in plan.inputs if path != plan.output], info
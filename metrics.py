@@ -0,0 +1,242 @@
+import csv
+import http.server
+import json
+import threading
+import time
+from dataclasses import asdict, astuple, dataclass, fields
+from progress import STATUS_DONE
+
+PHASES = ("extract", "wait", "download", "postprocess", "move", "total")
+PERCENTILES = (50, 90, 99)
+PROMETHEUS_PREFIX = "ytdlp_gui"
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@dataclass
+class ItemMetrics:
+    """Tempi (secondi), byte e velocità (byte/s) di un singolo URL."""
+
+    index: int
+    url: str
+    status: str = ""
+    extract: float = 0.0
+    wait: float = 0.0
+    download: float = 0.0
+    postprocess: float = 0.0
+    move: float = 0.0
+    total: float = 0.0
+    # Dall'ingresso in coda alla conclusione: misura l'effetto dell'ordine della coda
+    latency: float | None = None
+    bytes: int = 0
+    avg_speed: float | None = None
+    peak_speed: float | None = None
+    # Nuovi tentativi dopo errori temporanei (i tempi sono quelli dell'ultimo)
+    retries: int = 0
+    error: str = ""
+
+
+def percentile(values, pct):
+    """Percentile con interpolazione lineare (None se non ci sono valori)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * pct / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+class SessionMetrics:
+    """Metriche per URL di una sessione, aggiornate dai worker (thread-safe)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._items = {}
+        self._started = {}
+
+    def start(self, index, url):
+        """Registra l'URL; un nuovo tentativo non azzera il tempo totale."""
+        with self._lock:
+            if index in self._items:
+                return
+            self._items[index] = ItemMetrics(index, url)
+            self._started[index] = time.perf_counter()
+
+    def update(self, index, **values):
+        with self._lock:
+            item = self._items.get(index)
+            if item is not None:
+                for key, value in values.items():
+                    setattr(item, key, value)
+
+    def finish(self, index, status, error=None):
+        with self._lock:
+            item = self._items.get(index)
+            if item is None:
+                return
+            item.status = status
+            item.error = error or ""
+            started = self._started.pop(index, None)
+            if started is not None:
+                item.total = time.perf_counter() - started
+
+    def discard(self, index):
+        """Rimuove un URL che non è un download (es. playlist espansa)."""
+        with self._lock:
+            self._items.pop(index, None)
+            self._started.pop(index, None)
+
+    def get(self, index):
+        with self._lock:
+            item = self._items.get(index)
+            return ItemMetrics(**asdict(item)) if item is not None else None
+
+    def items(self):
+        with self._lock:
+            return [ItemMetrics(**asdict(item)) for _, item in sorted(self._items.items())]
+
+    def mean_latency(self, status=STATUS_DONE):
+        """Latenza media di completamento (secondi) degli URL con lo stato indicato."""
+        values = [
+            item.latency for item in self.items()
+            if item.latency is not None and item.status == status
+        ]
+        return sum(values) / len(values) if values else None
+
+    def percentiles(self, status=STATUS_DONE):
+        """{fase: {"p50": s, ...}} sugli URL con lo stato indicato (tutti i conclusi se None)."""
+        items = [
+            item for item in self.items()
+            if item.status and (status is None or item.status == status)
+        ]
+        result = {}
+        for phase in PHASES + ("latency", "avg_speed", "peak_speed"):
+            values = [getattr(item, phase) for item in items]
+            values = [v for v in values if v is not None]
+            result[phase] = {f"p{p}": percentile(values, p) for p in PERCENTILES}
+        return result
+
+    def export_json(self, path):
+        data = {
+            "items": [asdict(item) for item in self.items()],
+            "percentiles": self.percentiles(),
+        }
+        with open(path, "w", encoding="utf-8") as handle:
+            json.dump(data, handle, indent=2, ensure_ascii=False)
+
+    def export_csv(self, path):
+        with open(path, "w", encoding="utf-8", newline="") as handle:
+            writer = csv.writer(handle)
+            writer.writerow([f.name for f in fields(ItemMetrics)])
+            for item in self.items():
+                writer.writerow(["" if v is None else v for v in astuple(item)])
+
+    def export(self, path):
+        """Esporta in CSV se il file termina con .csv, altrimenti in JSON."""
+        if path.lower().endswith(".csv"):
+            self.export_csv(path)
+        else:
+            self.export_json(path)
+
+    def prometheus_text(self):
+        """Metriche in formato testo Prometheus (exposition format 0.0.4)."""
+        items = self.items()
+        finished = [item for item in items if item.status]
+        # Tempi e velocità solo degli URL scaricati: saltati e falliti falserebbero i percentili
+        done = [item for item in finished if item.status == STATUS_DONE]
+        p = PROMETHEUS_PREFIX
+        lines = [
+            f"# HELP {p}_items URL della sessione per stato (in_progress = non conclusi).",
+            f"# TYPE {p}_items gauge",
+        ]
+        counts = {}
+        for item in items:
+            status = item.status or "in_progress"
+            counts[status] = counts.get(status, 0) + 1
+        for status, count in sorted(counts.items()):
+            lines.append(f'{p}_items{{status="{status}"}} {count}')
+
+        lines += [
+            f"# HELP {p}_phase_seconds Durata per URL di ciascuna fase.",
+            f"# TYPE {p}_phase_seconds summary",
+        ]
+        for phase in PHASES:
+            values = [getattr(item, phase) for item in done]
+            for pct in PERCENTILES:
+                value = percentile(values, pct)
+                if value is not None:
+                    lines.append(
+                        f'{p}_phase_seconds{{phase="{phase}",quantile="{pct / 100:g}"}} '
+                        f"{value:.6f}"
+                    )
+            lines.append(f'{p}_phase_seconds_sum{{phase="{phase}"}} {sum(values):.6f}')
+            lines.append(f'{p}_phase_seconds_count{{phase="{phase}"}} {len(values)}')
+
+        latencies = [item.latency for item in done if item.latency is not None]
+        lines += [
+            f"# HELP {p}_completion_latency_seconds Tempo dall'ingresso in coda alla conclusione.",
+            f"# TYPE {p}_completion_latency_seconds summary",
+        ]
+        for pct in PERCENTILES:
+            value = percentile(latencies, pct)
+            if value is not None:
+                lines.append(
+                    f'{p}_completion_latency_seconds{{quantile="{pct / 100:g}"}} {value:.6f}'
+                )
+        lines.append(f"{p}_completion_latency_seconds_sum {sum(latencies):.6f}")
+        lines.append(f"{p}_completion_latency_seconds_count {len(latencies)}")
+
+        lines += [
+            f"# HELP {p}_downloaded_bytes_total Byte scaricati dagli URL conclusi.",
+            f"# TYPE {p}_downloaded_bytes_total counter",
+            f"{p}_downloaded_bytes_total {sum(item.bytes for item in finished)}",
+            f"# HELP {p}_retries_total Nuovi tentativi dopo errori temporanei.",
+            f"# TYPE {p}_retries_total counter",
+            f"{p}_retries_total {sum(item.retries for item in items)}",
+            f"# HELP {p}_peak_speed_bytes Velocità di picco per URL (byte/s).",
+            f"# TYPE {p}_peak_speed_bytes summary",
+        ]
+        speeds = [item.peak_speed for item in done if item.peak_speed]
+        for pct in PERCENTILES:
+            value = percentile(speeds, pct)
+            if value is not None:
+                lines.append(f'{p}_peak_speed_bytes{{quantile="{pct / 100:g}"}} {value:.1f}')
+        lines.append(f"{p}_peak_speed_bytes_sum {sum(speeds):.1f}")
+        lines.append(f"{p}_peak_speed_bytes_count {len(speeds)}")
+        return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(http.server.BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        source = self.server.source()
+        body = (source.prometheus_text() if source else "").encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", PROMETHEUS_CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class MetricsServer(http.server.ThreadingHTTPServer):
+    """Espone /metrics in formato Prometheus; source() restituisce le SessionMetrics."""
+
+    daemon_threads = True
+
+    def __init__(self, port, source, host="127.0.0.1"):
+        super().__init__((host, port), _MetricsHandler)
+        self.source = source
+
+    def start(self):
+        threading.Thread(
+            target=self.serve_forever, name="metrics-http", daemon=True
+        ).start()
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
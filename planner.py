@@ -0,0 +1,222 @@
+import json
+import os
+import threading
+import time
+from bandwidth import MB
+from defaults import AUDIO_FORMAT_MP3
+from progress import format_bytes, format_eta, format_speed
+from staging import SCRATCH_SIZE_FACTOR, free_space
+from utils import get_user_data_dir
+from yt_dlp.networking import HEADRequest
+from yt_dlp.utils import determine_protocol
+
+THROUGHPUT_FILE = "throughput.json"
+# Sessioni recenti usate per stimare la velocità complessiva
+THROUGHPUT_SAMPLES = 10
+# Sessioni più piccole sono dominate da estrazione e avvio: non fanno media
+MIN_SAMPLE_BYTES = 16 * MB
+# Bitrate dell'MP3 prodotto da MediaPlanPP (192 kbit/s)
+MP3_BYTES_PER_SECOND = 192000 / 8
+# Origine della velocità usata per la durata stimata
+RATE_HISTORY = "history"  # ultime sessioni di download
+RATE_LIMIT = "limit"  # limite di banda, se più basso
+_RATE_LABELS = {
+    RATE_HISTORY: "velocità delle ultime sessioni",
+    RATE_LIMIT: "limite di banda",
+}
+# URL non risolti elencati nel log (tutti nel riepilogo headless)
+MAX_LOGGED_FAILURES = 20
+
+
+def format_size(fmt, duration=None):
+    """Byte previsti di un formato: dimensione indicata dal sito o bitrate x durata."""
+    size = fmt.get("filesize") or fmt.get("filesize_approx")
+    if size:
+        return int(size)
+    duration = fmt.get("duration") or duration
+    if fmt.get("tbr") and duration:
+        return int(fmt["tbr"] * 1000 / 8 * duration)
+    return None
+
+
+def probe_size(ydl, fmt):
+    """Content-Length di un formato HTTP diretto (richiesta HEAD); None se non indicato."""
+    if not fmt.get("url"):
+        return None
+    if (fmt.get("protocol") or determine_protocol(fmt)) not in ("http", "https"):
+        return None
+    try:
+        with ydl.urlopen(HEADRequest(fmt["url"], headers=fmt.get("http_headers") or {})) as response:
+            length = response.headers.get("Content-Length")
+    except Exception:
+        return None
+    return int(length) if length and length.isdigit() else None
+
+
+def planned_size(info, probe=None):
+    """Byte da scaricare per i formati scelti da yt-dlp; None se non stimabili.
+
+    probe(fmt) è usata per i formati di cui il sito non indica la dimensione.
+    """
+    formats = info.get("requested_formats") or [info]
+    total = 0
+    for fmt in formats:
+        size = format_size(fmt, info.get("duration"))
+        if size is None and probe is not None:
+            size = probe(fmt)
+        if size is None:
+            return None
+        total += size
+    return total
+
+
+def output_size(info, download_size, audio_only, audio_format):
+    """Byte del file finale: la conversione in MP3 cambia la dimensione."""
+    if audio_only and audio_format == AUDIO_FORMAT_MP3 and info.get("duration"):
+        return int(info["duration"] * MP3_BYTES_PER_SECOND)
+    return download_size
+
+
+class ThroughputHistory:
+    """Velocità complessiva (byte/s) delle ultime sessioni di download reali.
+
+    Ogni campione è il totale scaricato diviso la durata della sessione, quindi
+    include estrazione, attese e download in parallelo: è la velocità con cui
+    una coda si svuota davvero.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(get_user_data_dir(), THROUGHPUT_FILE)
+
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as handle:
+                samples = json.load(handle)
+        except (OSError, ValueError):
+            return []
+        return [s for s in samples if isinstance(s, dict) and s.get("seconds", 0) > 0]
+
+    def record(self, nbytes, seconds):
+        """Aggiunge una sessione; False se troppo piccola o file non scrivibile."""
+        if nbytes < MIN_SAMPLE_BYTES or seconds <= 0:
+            return False
+        samples = self._load()
+        samples.append(
+            {
+                "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "bytes": int(nbytes),
+                "seconds": round(seconds, 3),
+            }
+        )
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "w", encoding="utf-8") as handle:
+                json.dump(samples[-THROUGHPUT_SAMPLES:], handle, indent=2)
+            return True
+        except OSError:
+            return False
+
+    def rate(self):
+        """Byte/s pesati sulla durata delle ultime sessioni; None senza storico."""
+        samples = self._load()[-THROUGHPUT_SAMPLES:]
+        seconds = sum(s["seconds"] for s in samples)
+        if not seconds:
+            return None
+        return sum(s["bytes"] for s in samples) / seconds
+
+
+class BatchPlan:
+    """Piano di una simulazione: dimensioni dei formati scelti per ogni URL (thread-safe)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._items = {}
+
+    def add(self, index, output_path, download_size, final_size):
+        with self._lock:
+            self._items[index] = (output_path, download_size, final_size)
+
+    def report(self, failures, skipped, rate, rate_source, concurrency, scratch_dir=""):
+        """Totali del piano.
+
+        failures: [(indice, url, errore)] degli URL non risolti. Le voci senza
+        dimensione nota sono stimate con la media delle altre; la durata usa
+        rate (byte/s, None = non stimabile), ricavata da rate_source.
+        """
+        with self._lock:
+            items = list(self._items.values())
+        sizes = [download for _, download, _ in items if download is not None]
+        unknown = len(items) - len(sizes)
+        average = sum(sizes) / len(sizes) if sizes else 0
+        download_bytes = int(sum(sizes) + average * unknown)
+
+        disk = {}
+        for output_path, download, final in items:
+            if final is None:
+                final = average
+            disk[output_path] = disk.get(output_path, 0) + final
+        destinations = [
+            {"path": path, "bytes": int(size), "free": free_space(path)}
+            for path, size in sorted(disk.items())
+        ]
+        plan = {
+            "items": len(items),
+            "unknown_size": unknown,
+            "skipped": skipped,
+            "unresolved": [
+                {"index": index, "url": url, "error": error}
+                for index, url, error in failures
+            ],
+            "download_bytes": download_bytes,
+            "destinations": destinations,
+            "throughput": rate,
+            "throughput_source": rate_source if rate else None,
+            "duration": download_bytes / rate if rate and download_bytes else None,
+        }
+        if scratch_dir:
+            # Nella cartella temporanea coesistono al massimo i download in corso
+            largest = sorted(
+                (average if download is None else download for _, download, _ in items),
+                reverse=True,
+            )
+            plan["scratch"] = {
+                "path": scratch_dir,
+                "bytes": int(sum(largest[:concurrency]) * SCRATCH_SIZE_FACTOR),
+                "free": free_space(scratch_dir),
+            }
+        return plan
+
+
+def describe_plan(plan):
+    """Righe di log del piano (senza prefisso)."""
+    lines = [
+        f"{plan['items']} URL risolti, {len(plan['unresolved'])} non risolvibili"
+        + (f", {plan['skipped']} già scaricati" if plan["skipped"] else "")
+    ]
+    total = f"Da scaricare: {format_bytes(plan['download_bytes'])}"
+    if plan["unknown_size"] == plan["items"] and plan["items"]:
+        total += " (nessun sito indica la dimensione)"
+    elif plan["unknown_size"]:
+        total += (
+            f" (di cui {plan['unknown_size']} URL senza dimensione nota, "
+            "stimati con la media degli altri)"
+        )
+    lines.append(total)
+    if plan["duration"] is not None:
+        lines.append(
+            f"Durata stimata: {format_eta(plan['duration'])} a "
+            f"{format_speed(plan['throughput'])} ({_RATE_LABELS[plan['throughput_source']]})"
+        )
+    else:
+        lines.append("Durata non stimabile: nessuna sessione di download recente")
+    places = [("Spazio necessario in", d) for d in plan["destinations"]]
+    if "scratch" in plan:
+        places.append(("Spazio temporaneo necessario in", plan["scratch"]))
+    for label, place in places:
+        line = f"{label} {place['path']}: {format_bytes(place['bytes'])}"
+        if place["free"] is not None:
+            line += f" ({format_bytes(place['free'])} liberi)"
+            if place["free"] < place["bytes"]:
+                line += " - SPAZIO INSUFFICIENTE"
+        lines.append(line)
+    return lines
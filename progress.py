@@ -0,0 +1,66 @@
+from dataclasses import dataclass
+
+# Intervallo minimo tra due eventi di progresso per lo stesso URL
+PROGRESS_EVENT_INTERVAL = 0.25
+# Intervallo minimo tra due righe di progresso testuali nel log
+PROGRESS_LOG_INTERVAL = 5.0
+
+# Stati per singolo URL emessi tramite item_status_signal
+STATUS_QUEUED = "queued"
+# In attesa di un nuovo tentativo (errore temporaneo o host in pausa)
+STATUS_RETRYING = "retrying"
+STATUS_EXTRACTING = "extracting"
+STATUS_DOWNLOADING = "downloading"
+STATUS_POSTPROCESSING = "postprocessing"
+# File pronti che il mover copia dalla cartella temporanea alla destinazione
+STATUS_MOVING = "moving"
+STATUS_DONE = "done"
+STATUS_SKIPPED = "skipped"
+STATUS_FAILED = "failed"
+STATUS_CANCELLED = "cancelled"
+# URL di una playlist/canale sostituito dalle sue voci (non conta come download)
+STATUS_PLAYLIST = "playlist"
+
+
+@dataclass
+class ProgressEvent:
+    """Progresso numerico di un singolo URL (byte, byte/s, secondi)."""
+
+    index: int
+    downloaded_bytes: int
+    total_bytes: int | None = None
+    speed: float | None = None
+    eta: float | None = None
+
+    @property
+    def fraction(self):
+        if not self.total_bytes:
+            return None
+        return min(self.downloaded_bytes / self.total_bytes, 1.0)
+
+
+def format_bytes(num):
+    if num is None:
+        return "N/A"
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if abs(num) < 1024:
+            return f"{num:.1f}{unit}" if unit != "B" else f"{num:.0f}{unit}"
+        num /= 1024
+    return f"{num:.1f}TiB"
+
+
+def format_speed(speed):
+    if speed is None:
+        return "N/A"
+    return f"{format_bytes(speed)}/s"
+
+
+def format_eta(eta):
+    if eta is None:
+        return "N/A"
+    eta = int(eta)
+    hours, rest = divmod(eta, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f"{hours:d}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes:02d}:{seconds:02d}"
@@ -0,0 +1,316 @@
+import email.utils
+import heapq
+import itertools
+import math
+import random
+import re
+import ssl
+import threading
+import time
+from dataclasses import dataclass
+from http.client import IncompleteRead
+from yt_dlp.networking.exceptions import HTTPError, ProxyError, SSLError, TransportError
+from yt_dlp.utils import ContentTooShortError, PostProcessingError
+
+# Attesa prima del primo nuovo tentativo; raddoppia a ogni tentativo
+BACKOFF_BASE = 2.0
+BACKOFF_MAX = 60.0
+# Retry-After del server rispettato fino a questo limite (secondi)
+MAX_RETRY_AFTER = 300.0
+# Errori temporanei consecutivi di un host che aprono l'interruttore
+BREAKER_THRESHOLD = 3
+# Pausa dell'host con interruttore aperto; raddoppia se la prova fallisce
+BREAKER_COOLDOWN = 30.0
+BREAKER_MAX_COOLDOWN = 300.0
+# Prove fallite di fila dopo cui l'host è considerato irraggiungibile per la sessione
+BREAKER_MAX_TRIPS = 3
+# Ricontrollo degli URL in attesa mentre un URL di prova verifica l'host
+PROBE_WAIT = 1.0
+
+# Stati HTTP che indicano un problema passeggero del server (oltre ai 5xx)
+TRANSIENT_HTTP_STATUSES = (408, 425, 429)
+# Frammenti di messaggio di errori temporanei già ridotti a testo da yt-dlp
+TRANSIENT_MESSAGES = (
+    "timed out",
+    "timeout",
+    "connection reset",
+    "connection aborted",
+    "connection refused",
+    "remote end closed",
+    "temporary failure",
+    "temporarily unavailable",
+    "too many requests",
+    "incompleteread",
+    "content too short",
+    "did not get any data blocks",
+)
+# Errori di configurazione riportati solo come testo: ritentare non serve
+PERMANENT_MESSAGES = (
+    "[ssl:",
+    "certificate verify failed",
+    "unable to connect to proxy",
+)
+_HTTP_STATUS_RE = re.compile(r"HTTP Error (\d{3})")
+
+# Sottoclassi di TransportError che non si risolvono da sole: certificato o
+# protocollo TLS non validi, proxy mal configurato
+_PERMANENT_EXCEPTIONS = (SSLError, ProxyError, ssl.SSLError)
+
+_TRANSIENT_EXCEPTIONS = (
+    TransportError,
+    ContentTooShortError,
+    IncompleteRead,
+    ConnectionError,
+    TimeoutError,
+)
+
+
+@dataclass
+class Failure:
+    """Classificazione di un errore: transitorio (da ritentare) o definitivo."""
+
+    transient: bool
+    reason: str
+    # Attesa minima richiesta dal server (Retry-After), in secondi
+    retry_after: float = 0.0
+
+
+def _error_chain(exc):
+    """L'errore e le sue cause: yt-dlp avvolge l'originale in DownloadError/ExtractorError."""
+    seen = set()
+    while isinstance(exc, BaseException) and id(exc) not in seen:
+        seen.add(id(exc))
+        yield exc
+        exc_info = getattr(exc, "exc_info", None)
+        inner = exc_info[1] if exc_info and exc_info[1] is not exc else None
+        exc = inner or getattr(exc, "cause", None) or exc.__cause__ or exc.__context__
+
+
+def _retry_after(error):
+    """Secondi indicati dall'intestazione Retry-After (numero o data HTTP)."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    value = headers.get("Retry-After") if hasattr(headers, "get") else None
+    if not value:
+        return 0.0
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = email.utils.parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return 0.0
+    return min(max(seconds, 0.0), MAX_RETRY_AFTER)
+
+
+def _http_failure(status, error=None):
+    if status >= 500 or status in TRANSIENT_HTTP_STATUSES:
+        return Failure(True, f"HTTP {status}", _retry_after(error))
+    return Failure(False, f"HTTP {status}")
+
+
+def classify_error(exc):
+    """Failure per l'errore di un URL.
+
+    Limitazioni (429), errori del server (5xx), timeout e connessioni
+    interrotte sono transitori; gli altri (404, video privato, URL non
+    supportato, errori TLS o del proxy, errori ffmpeg...) sono definitivi e
+    non vengono ritentati.
+    """
+    for error in _error_chain(exc):
+        if isinstance(error, HTTPError):
+            return _http_failure(error.status, error)
+        if isinstance(error, PostProcessingError):
+            return Failure(False, "post-processing")
+        if isinstance(error, _PERMANENT_EXCEPTIONS):
+            return Failure(False, type(error).__name__)
+        if isinstance(error, _TRANSIENT_EXCEPTIONS):
+            return Failure(True, type(error).__name__)
+    message = str(exc)
+    match = _HTTP_STATUS_RE.search(message)
+    if match:
+        return _http_failure(int(match.group(1)))
+    lowered = message.lower()
+    for fragment in PERMANENT_MESSAGES:
+        if fragment in lowered:
+            return Failure(False, fragment)
+    for fragment in TRANSIENT_MESSAGES:
+        if fragment in lowered:
+            return Failure(True, fragment)
+    return Failure(False, "errore")
+
+
+def backoff_delay(attempt, base=BACKOFF_BASE, cap=BACKOFF_MAX):
+    """Attesa prima del tentativo attempt (1 = primo nuovo tentativo).
+
+    Esponenziale con jitter: metà fissa e metà casuale, così gli URL falliti
+    insieme non tornano tutti sullo stesso server nello stesso istante.
+    """
+    ceiling = min(cap, base * 2 ** (attempt - 1))
+    return ceiling / 2 + random.uniform(0, ceiling / 2)
+
+
+class _HostState:
+    def __init__(self, cooldown):
+        self.failures = 0
+        self.cooldown = cooldown
+        # Istante fino al quale l'host è in pausa (None = interruttore chiuso)
+        self.open_until = None
+        # URL di prova ammesso dopo la pausa (interruttore semiaperto)
+        self.probe = None
+        self.trips = 0
+        self.down = False
+
+
+class CircuitBreaker:
+    """Interruttori per host (thread-safe).
+
+    Dopo BREAKER_THRESHOLD errori temporanei consecutivi l'host va in pausa:
+    i suoi URL attendono senza occupare worker. Finita la pausa passa un solo
+    URL di prova; se scarica l'host torna normale, se fallisce la pausa
+    raddoppia. Dopo max_trips prove fallite l'host è irraggiungibile: niente
+    più pause né nuovi tentativi, ogni URL rimasto viene provato una volta.
+    Un download riuscito azzera tutto.
+    """
+
+    def __init__(
+        self,
+        threshold=BREAKER_THRESHOLD,
+        cooldown=BREAKER_COOLDOWN,
+        max_cooldown=BREAKER_MAX_COOLDOWN,
+        max_trips=BREAKER_MAX_TRIPS,
+    ):
+        self.threshold = max(1, threshold)
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.max_trips = max(1, max_trips)
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def wait_time(self, host, index):
+        """Secondi che l'URL index deve attendere prima di contattare host (0 = subito)."""
+        if not host:
+            return 0.0
+        with self._lock:
+            state = self._hosts.get(host)
+            if state is None or state.open_until is None or state.down:
+                return 0.0
+            remaining = state.open_until - time.monotonic()
+            if remaining > 0:
+                return remaining
+            if state.probe is None or state.probe == index:
+                state.probe = index
+                return 0.0
+            return PROBE_WAIT
+
+    def record_failure(self, host):
+        """Errore temporaneo su host.
+
+        Restituisce la pausa in secondi se l'interruttore si è appena aperto,
+        math.inf se l'host è appena stato dichiarato irraggiungibile, altrimenti None.
+        """
+        if not host:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            state = self._hosts.setdefault(host, _HostState(self.cooldown))
+            if state.down:
+                return None
+            if state.open_until is not None:
+                if now < state.open_until or state.probe is None:
+                    # Errori di download già avviati prima della pausa
+                    return None
+                state.trips += 1
+                if state.trips >= self.max_trips:
+                    state.down = True
+                    state.probe = None
+                    return math.inf
+                state.cooldown = min(state.cooldown * 2, self.max_cooldown)
+            else:
+                state.failures += 1
+                if state.failures < self.threshold:
+                    return None
+            state.failures = 0
+            state.probe = None
+            state.open_until = now + state.cooldown
+            return state.cooldown
+
+    def record_success(self, host):
+        """Download riuscito da host; True se l'interruttore era aperto."""
+        with self._lock:
+            state = self._hosts.pop(host, None)
+        return state is not None and state.open_until is not None
+
+    def is_down(self, host):
+        with self._lock:
+            state = self._hosts.get(host)
+            return state is not None and state.down
+
+    def release_probe(self, index):
+        """L'URL index è concluso senza esito sull'host: la prova passa a un altro URL."""
+        with self._lock:
+            for state in self._hosts.values():
+                if state.probe == index:
+                    state.probe = None
+
+    def down_hosts(self):
+        with self._lock:
+            return sorted(host for host, state in self._hosts.items() if state.down)
+
+
+class RetryScheduler:
+    """Esegue funzioni dopo un ritardo, su un unico thread (coda ordinata per scadenza)."""
+
+    def __init__(self):
+        self._heap = []
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="yt-dlp-retry", daemon=True)
+        self._thread.start()
+
+    def schedule(self, delay, fn, *args):
+        with self._cond:
+            heapq.heappush(
+                self._heap, (time.monotonic() + delay, next(self._counter), fn, args)
+            )
+            self._cond.notify()
+
+    def flush(self):
+        """Anticipa a subito tutte le funzioni in attesa (es. annullamento)."""
+        with self._cond:
+            self._heap = [(0.0, seq, fn, args) for _, seq, fn, args in self._heap]
+            heapq.heapify(self._heap)
+            self._cond.notify()
+
+    def pending(self):
+        with self._cond:
+            return len(self._heap)
+
+    def close(self):
+        """Esegue subito le funzioni rimaste e termina il thread."""
+        self.flush()
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._heap:
+                        wait = self._heap[0][0] - time.monotonic()
+                        if wait <= 0:
+                            break
+                    elif self._closed:
+                        return
+                    else:
+                        wait = None
+                    self._cond.wait(wait)
+                _, _, fn, args = heapq.heappop(self._heap)
+            try:
+                fn(*args)
+            except Exception:
+                # Un errore non deve fermare il thread: gli altri URL resterebbero in attesa
+                pass
@@ -0,0 +1,163 @@
+import heapq
+import itertools
+import threading
+from dataclasses import dataclass
+from defaults import (
+    POLICY_FAIR,
+    POLICY_FIFO,
+    POLICY_PRIORITY,
+    POLICY_SJF,
+    SCHEDULING_POLICIES,
+)
+from planner import format_size
+
+# Byte al secondo ipotizzati per gli URL di cui si conosce solo la durata
+# (circa 2.5 Mbit/s, un video 720p): rende confrontabili durate e dimensioni
+NOMINAL_BYTES_PER_SECOND = 312500
+
+
+def job_cost(info):
+    """Byte previsti per un URL già estratto; None se né dimensione né durata sono note.
+
+    Prima della scelta del formato si usa il formato più grande di cui il sito
+    indica la dimensione (yt-dlp li ordina dal peggiore al migliore).
+    """
+    if not info:
+        return None
+    if info.get("is_live"):
+        return float("inf")
+    duration = info.get("duration")
+    sizes = [format_size(fmt, duration) for fmt in info.get("formats") or [info]]
+    sizes = [size for size in sizes if size]
+    if sizes:
+        return max(sizes)
+    if duration:
+        return int(duration * NOMINAL_BYTES_PER_SECOND)
+    return None
+
+
+@dataclass
+class Job:
+    """URL in attesa di un worker; args sono gli argomenti della fase successiva."""
+
+    index: int
+    owner: str
+    args: tuple = ()
+    cost: float | None = None
+    priority: int = 0
+    # Cambia a ogni riordino: le voci dell'heap con versione diversa sono obsolete
+    version: int = 0
+
+
+class PolicyQueue:
+    """Coda degli URL in attesa di un pool, ordinata secondo la politica scelta (thread-safe).
+
+    - fifo: ordine di inserimento degli URL (indice nella sessione)
+    - sjf: prima gli URL più brevi (dimensione o durata note), poi gli altri in ordine
+    - priority: priorità più alta prima, a parità in ordine di inserimento
+    - fair: a turno tra i proprietari dei batch, ciascuno in ordine di inserimento
+
+    Il pool esegue un segnaposto per ogni URL accodato e pop() sceglie al
+    momento quale URL servire: politica e priorità valgono anche per gli URL
+    già in coda. Gli URL sono raggruppati per proprietario in heap separati,
+    così pop() costa O(proprietari + log n) anche con centinaia di migliaia di URL.
+    """
+
+    def __init__(self, policy=POLICY_FIFO):
+        self._lock = threading.Lock()
+        self._policy = policy if policy in SCHEDULING_POLICIES else POLICY_FIFO
+        self._jobs = {}
+        self._heaps = {}
+        # Turno del proprietario servito per ultimo (politica fair)
+        self._turns = {}
+        self._turn = itertools.count()
+
+    @property
+    def policy(self):
+        return self._policy
+
+    def __len__(self):
+        with self._lock:
+            return len(self._jobs)
+
+    def _key(self, job):
+        if self._policy == POLICY_SJF:
+            return (job.cost is None, job.cost or 0, job.index)
+        if self._policy == POLICY_PRIORITY:
+            return (-job.priority, job.index)
+        return (job.index,)
+
+    def _push(self, job):
+        heapq.heappush(
+            self._heaps.setdefault(job.owner, []),
+            (self._key(job), job.version, job.index),
+        )
+
+    def push(self, job):
+        with self._lock:
+            previous = self._jobs.get(job.index)
+            if previous is not None:
+                job.version = previous.version + 1
+            self._jobs[job.index] = job
+            self._push(job)
+
+    def _top(self, owner):
+        """Voce valida in cima all'heap del proprietario (rimuove quelle obsolete)."""
+        heap = self._heaps[owner]
+        while heap:
+            _, version, index = heap[0]
+            job = self._jobs.get(index)
+            if job is not None and job.owner == owner and job.version == version:
+                return heap[0]
+            heapq.heappop(heap)
+        del self._heaps[owner]
+        return None
+
+    def pop(self):
+        """URL da servire ora secondo la politica; None se la coda è vuota."""
+        with self._lock:
+            best_owner, best = None, None
+            for owner in list(self._heaps):
+                top = self._top(owner)
+                if top is None:
+                    continue
+                if self._policy == POLICY_FAIR:
+                    rank = (self._turns.get(owner, -1), top[0])
+                else:
+                    rank = top[0]
+                if best is None or rank < best:
+                    best_owner, best = owner, rank
+            if best_owner is None:
+                return None
+            _, _, index = heapq.heappop(self._heaps[best_owner])
+            self._turns[best_owner] = next(self._turn)
+            return self._jobs.pop(index)
+
+    def set_policy(self, policy):
+        """Cambia politica; gli URL già in coda vengono riordinati. False se non valida."""
+        if policy not in SCHEDULING_POLICIES:
+            return False
+        with self._lock:
+            if policy != self._policy:
+                self._policy = policy
+                self._heaps = {}
+                for job in self._jobs.values():
+                    self._push(job)
+        return True
+
+    def set_priority(self, index, priority):
+        """Nuova priorità di un URL in coda; False se l'URL non è in questa coda."""
+        with self._lock:
+            job = self._jobs.get(index)
+            if job is None:
+                return False
+            job.priority = priority
+            job.version += 1
+            self._push(job)
+            return True
+
+    def clear(self):
+        with self._lock:
+            self._jobs.clear()
+            self._heaps.clear()
+            self._turns.clear()
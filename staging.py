@@ -0,0 +1,152 @@
+import errno
+import hashlib
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Spostamenti contemporanei verso le destinazioni (copie su NAS/altro disco)
+MOVE_WORKERS = 2
+# Spazio lasciato sempre libero nella cartella temporanea
+SCRATCH_MIN_FREE = 512 * 1024 * 1024
+# Spazio riservato per download rispetto alla dimensione stimata: i flussi
+# separati e il file unito coesistono finché ffmpeg non ha finito
+SCRATCH_SIZE_FACTOR = 2.2
+# Intervallo di ricontrollo mentre si attende che il mover liberi spazio
+SPACE_WAIT_SLICE = 0.5
+# Blocco di copia tra dischi diversi: tra un blocco e l'altro si controlla l'annullamento
+COPY_CHUNK = 4 * 1024 * 1024
+
+
+def estimated_size(info):
+    """Dimensione prevista (byte) dei formati scelti; None se il sito non la indica."""
+    formats = info.get("requested_formats") or [info]
+    total = 0
+    for fmt in formats:
+        size = fmt.get("filesize") or fmt.get("filesize_approx")
+        if not size:
+            return None
+        total += size
+    return int(total)
+
+
+def free_space(path):
+    try:
+        return shutil.disk_usage(path).free
+    except OSError:
+        return None
+
+
+def staging_dir(scratch, output_path):
+    """Sottocartella della cartella temporanea dedicata a una destinazione.
+
+    Stessa destinazione, stessa sottocartella: i .part di un download
+    interrotto vengono ripresi e titoli uguali diretti a cartelle diverse
+    non si sovrascrivono.
+    """
+    folder = os.path.normcase(os.path.abspath(output_path))
+    digest = hashlib.sha1(folder.encode("utf-8")).hexdigest()[:12]
+    return os.path.join(scratch, f"yt-dlp-gui-{digest}")
+
+
+def planned_moves(info):
+    """(percorso finale, [(origine, destinazione), ...]) come MoveFilesAfterDownloadPP."""
+    dl_path, dl_name = os.path.split(info["filepath"])
+    finaldir = info.get("__finaldir", dl_path)
+    final_path = os.path.join(finaldir, dl_name)
+    files = dict(info.get("__files_to_move") or {})
+    files[info["filepath"]] = final_path
+    moves = []
+    for old, new in files.items():
+        new = new or os.path.join(finaldir, os.path.basename(old))
+        if os.path.abspath(old) != os.path.abspath(new):
+            moves.append((old, new))
+    return final_path, moves
+
+
+def _copy_file(src, dst, should_stop=None):
+    with open(src, "rb") as source, open(dst, "wb") as target:
+        while True:
+            if should_stop is not None and should_stop():
+                raise InterruptedError("Spostamento annullato")
+            chunk = source.read(COPY_CHUNK)
+            if not chunk:
+                return
+            target.write(chunk)
+
+
+def move_file(src, dst, should_stop=None):
+    """Sposta src in dst; True se è bastato rinominare (stesso filesystem).
+
+    Tra dischi diversi il file è copiato accanto alla destinazione e
+    rinominato solo a copia completa: nella cartella finale non compaiono
+    mai file troncati. Se should_stop() diventa vero la copia si interrompe
+    e src resta nella cartella temporanea.
+    """
+    os.makedirs(os.path.dirname(dst) or ".", exist_ok=True)
+    try:
+        os.replace(src, dst)
+        return True
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+    temp_path = dst + ".tmp"
+    try:
+        _copy_file(src, temp_path, should_stop)
+        shutil.copystat(src, temp_path)
+        os.replace(temp_path, dst)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+    os.remove(src)
+    return False
+
+
+class StagingArea:
+    """Cartella temporanea locale per download e post-processing.
+
+    reserve() tiene il conto dello spazio promesso ai download in corso, che
+    torna disponibile con release() quando i file hanno lasciato la cartella;
+    submit() affida gli spostamenti verso la destinazione a un pool limitato.
+    """
+
+    def __init__(self, path, workers=MOVE_WORKERS):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._reserved = 0
+        self._cond = threading.Condition()
+        self._pool = ThreadPoolExecutor(
+            max_workers=max(1, workers), thread_name_prefix="yt-dlp-mover"
+        )
+
+    def reserve(self, size, stop=None):
+        """Riserva size byte; attende se altri download occupano lo spazio.
+
+        False se lo spazio non basta nemmeno con la cartella libera, o se
+        stop() diventa vero durante l'attesa.
+        """
+        with self._cond:
+            while True:
+                free = free_space(self.path)
+                if free is None:
+                    return False
+                if free - self._reserved - SCRATCH_MIN_FREE >= size:
+                    self._reserved += size
+                    return True
+                if self._reserved == 0 or (stop is not None and stop()):
+                    return False
+                self._cond.wait(SPACE_WAIT_SLICE)
+
+    def release(self, size):
+        with self._cond:
+            self._reserved = max(0, self._reserved - size)
+            self._cond.notify_all()
+
+    def submit(self, fn, *args):
+        return self._pool.submit(fn, *args)
+
+    def close(self):
+        self._pool.shutdown(wait=True)
@@ -0,0 +1,85 @@
+import json
+import os
+import sys
+import threading
+import time
+from utils import get_user_data_dir
+
+# Riferimento dei tempi di avvio: main importa questo modulo per primo, prima di Qt
+_START = time.perf_counter()
+
+PHASE_IMPORT = "import"  # moduli della GUI importati
+PHASE_FIRST_PAINT = "first_paint"  # finestra disegnata per la prima volta
+PHASE_FFMPEG = "ffmpeg_check"  # durata della verifica di ffmpeg
+PHASE_PRELOAD = "preload"  # durata del precaricamento di yt-dlp in background
+STARTUP_PHASES = (PHASE_IMPORT, PHASE_FIRST_PAINT, PHASE_FFMPEG, PHASE_PRELOAD)
+
+# Moduli pesanti (yt-dlp e i suoi extractor) caricati dopo la comparsa della finestra
+PRELOAD_MODULES = ("downloader", "yt_dlp.extractor.extractors")
+STARTUP_LOG_FILE = "startup_times.jsonl"
+
+
+class StartupReport:
+    """Tempi delle fasi di avvio, in secondi.
+
+    import e first_paint sono misurati dall'avvio del processo Python,
+    ffmpeg_check e preload sono durate. Il resoconto completo viene
+    aggiunto a startup_times.jsonl per confrontare le release.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.timings = {}
+        self.notes = {}
+
+    def mark(self, phase):
+        """Registra il tempo trascorso dall'avvio (solo la prima volta)."""
+        return self.record(phase, time.perf_counter() - _START)
+
+    def record(self, phase, seconds, note=None):
+        with self._lock:
+            if phase in self.timings:
+                return False
+            self.timings[phase] = seconds
+            if note:
+                self.notes[phase] = note
+            return True
+
+    @property
+    def complete(self):
+        return all(phase in self.timings for phase in STARTUP_PHASES)
+
+    def describe(self):
+        parts = []
+        for phase in STARTUP_PHASES:
+            if phase in self.timings:
+                note = f" ({self.notes[phase]})" if phase in self.notes else ""
+                parts.append(f"{phase} {self.timings[phase]:.2f}s{note}")
+        return ", ".join(parts)
+
+    def save(self):
+        """Aggiunge il resoconto al file storico; False se non scrivibile."""
+        try:
+            from yt_dlp.version import __version__ as ytdlp_version
+        except ImportError:
+            ytdlp_version = None
+        entry = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "frozen": bool(getattr(sys, "frozen", False)),
+            "python": sys.version.split()[0],
+            "yt_dlp": ytdlp_version,
+            "timings": {k: round(v, 4) for k, v in self.timings.items()},
+            "notes": self.notes,
+        }
+        path = os.path.join(get_user_data_dir(), STARTUP_LOG_FILE)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "a", encoding="utf-8") as handle:
+                handle.write(json.dumps(entry) + "\n")
+            return True
+        except OSError:
+            return False
+
+
+# Resoconto del processo corrente, condiviso da main e MainWindow
+report = StartupReport()
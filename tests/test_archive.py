@@ -0,0 +1,101 @@
+"""Ricostruzione dell'archivio dai file scaricati nella cartella di destinazione.
+
+I file vengono scaricati dal server multimediale locale di benchmark.py e
+l'indice viene ricostruito da zero: ogni download deve essere riconosciuto
+dai metadati scritti da MediaPlanPP. Esecuzione: python -m pytest tests.
+"""
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import benchmark  # noqa: E402
+from archive import KIND_AUDIO_VIDEO, DownloadArchive  # noqa: E402
+from utils import get_ffprobe_path  # noqa: E402
+
+SIZE_MB = 1
+ITEMS = 2
+
+
+class ArchiveRebuildTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.ffmpeg = benchmark._ffmpeg_binary()
+        if not cls.ffmpeg or not get_ffprobe_path():
+            raise unittest.SkipTest("ffmpeg/ffprobe non trovati")
+        cls.workdir = tempfile.mkdtemp(prefix="yt-dlp-gui-archive-")
+        # Archivio e cache della sessione di prova fuori dalla cartella dati reale
+        cls._appdata = os.environ.get("LOCALAPPDATA")
+        os.environ["LOCALAPPDATA"] = os.path.join(cls.workdir, "appdata")
+        cls.server = benchmark.MediaServer(
+            benchmark.MediaLibrary(os.path.join(cls.workdir, "media"), cls.ffmpeg)
+        )
+        cls.server.library.directory(benchmark.KIND_PROGRESSIVE, SIZE_MB)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        if cls._appdata is None:
+            os.environ.pop("LOCALAPPDATA", None)
+        else:
+            os.environ["LOCALAPPDATA"] = cls._appdata
+        shutil.rmtree(cls.workdir, ignore_errors=True)
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp(dir=self.workdir)
+
+    def _fresh_archive(self):
+        """Indice vuoto per la cartella, come dopo la perdita del database."""
+        archive = DownloadArchive(
+            self.folder, KIND_AUDIO_VIDEO, path=self.folder + ".sqlite3"
+        )
+        self.addCleanup(archive.close)
+        return archive
+
+    def test_rebuild_recognises_downloaded_files(self):
+        from downloader import YtDlpDownloader
+
+        urls = [
+            self.server.url(benchmark.KIND_PROGRESSIVE, SIZE_MB, i)
+            for i in range(1, ITEMS + 1)
+        ]
+        options = benchmark._download_options({"urls": urls}, self.folder)
+        options["archive"] = True
+        worker = YtDlpDownloader(options)
+        worker.run()
+        self.assertEqual(worker.summary()["succeeded"], ITEMS)
+
+        archive = self._fresh_archive()
+        self.assertEqual(archive.rebuild(), (ITEMS, 0))
+        for i, url in enumerate(urls, 1):
+            self.assertIn(f"generic item{i}", archive)
+            self.assertEqual(
+                archive.find_url(url), os.path.join(self.folder, f"item{i}.mp4")
+            )
+
+    def test_rebuild_uses_extractor_id_from_tags(self):
+        path = os.path.join(self.folder, "clip.mp4")
+        subprocess.run(
+            [
+                self.ffmpeg, "-hide_banner", "-loglevel", "error", "-y",
+                "-i", self.server.library.base_clip(), "-c", "copy",
+                "-metadata", "comment=https://www.youtube.com/watch?v=dQw4w9WgXcQ",
+                path,
+            ],
+            check=True,
+        )
+        archive = self._fresh_archive()
+        self.assertEqual(archive.rebuild(), (1, 0))
+        self.assertIn("youtube dQw4w9WgXcQ", archive)
+        self.assertEqual(archive.find_url("https://youtu.be/dQw4w9WgXcQ"), path)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+"""Latenza di annullamento contro il server multimediale locale di benchmark.py.
+
+Ogni scenario scarica in un processo separato, annulla nello stato indicato
+e verifica che run() torni entro il limite senza lasciare processi ffmpeg
+né file temporanei. Esecuzione: python -m pytest tests (o python -m unittest).
+"""
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import benchmark  # noqa: E402
+
+# Scenari verificati: download in corso, server bloccato, conversione ffmpeg
+SCENARIOS = ("download", "stalled", "postprocess")
+
+
+class CancellationLatencyTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        ffmpeg = benchmark._ffmpeg_binary()
+        if not ffmpeg:
+            raise unittest.SkipTest("ffmpeg non trovato: serve per generare i contenuti di prova")
+        cls.workdir = tempfile.mkdtemp(prefix="yt-dlp-gui-media-")
+        cls.server = benchmark.MediaServer(benchmark.MediaLibrary(cls.workdir, ffmpeg))
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        shutil.rmtree(cls.workdir, ignore_errors=True)
+
+    def test_cancel_stops_promptly(self):
+        for name in SCENARIOS:
+            with self.subTest(scenario=name):
+                spec = benchmark.CANCEL_SCENARIOS[name]
+                self.server.library.directory(spec["kind"], spec["size"])
+                result = benchmark._measure_cancel(self.server, name, 1)
+                self.assertIsNotNone(
+                    result["latency_max"], "URL concluso prima dell'annullamento"
+                )
+                self.assertLessEqual(
+                    result["latency_max"], benchmark.DEFAULT_MAX_CANCEL_LATENCY
+                )
+                self.assertEqual(result["running_processes"], 0)
+                self.assertEqual(result["temp_files"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,213 @@
+"""install_ffmpeg contro un server HTTP locale (Range, connessioni interrotte, checksum).
+
+Le soglie del modulo (dimensione minima dei segmenti, attesa tra i
+tentativi) vengono ridotte perché uno zip di pochi MB usi più segmenti.
+Esecuzione: python -m pytest tests.
+"""
+import hashlib
+import http.server
+import io
+import os
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+import zipfile
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ffmpeg_install  # noqa: E402
+from utils import FFMPEG_EXE, FFPROBE_EXE  # noqa: E402
+
+SEGMENT_SIZE = 256 * 1024
+_RANGE_RE = re.compile(r"bytes=(\d+)-(\d*)")
+
+
+def _make_zip(extra=()):
+    """Zip non compresso con ffmpeg/ffprobe (contenuto casuale) e i file extra indicati."""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as archive:
+        archive.writestr(f"ffmpeg-build/bin/{FFMPEG_EXE}", os.urandom(3 * SEGMENT_SIZE))
+        archive.writestr(f"ffmpeg-build/bin/{FFPROBE_EXE}", os.urandom(SEGMENT_SIZE))
+        for name in extra:
+            archive.writestr(name, b"extra")
+    return buffer.getvalue()
+
+
+class _ZipHandler(http.server.BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        if self.path == "/ffmpeg.zip.sha256":
+            if server.checksum is None:
+                self.send_error(404)
+                return
+            body = f"{server.checksum}  ffmpeg.zip\n".encode("ascii")
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        if self.path != "/ffmpeg.zip":
+            self.send_error(404)
+            return
+
+        data = server.data
+        with server.lock:
+            server.requests.append(self.headers.get("Range"))
+        match = _RANGE_RE.match(self.headers.get("Range") or "")
+        if match and server.ranges:
+            start = int(match.group(1))
+            end = int(match.group(2)) if match.group(2) else len(data) - 1
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(data)}")
+        else:
+            start, end = 0, len(data) - 1
+            self.send_response(200)
+        body = data[start:end + 1]
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", '"v1"')
+        self.end_headers()
+
+        with server.lock:
+            # Solo le richieste dei segmenti, non la sonda di un byte
+            drop = len(body) > 1 and server.drops > 0
+            if drop:
+                server.drops -= 1
+        if drop:
+            # Connessione caduta a metà segmento
+            self.wfile.write(body[:len(body) // 2])
+            self.close_connection = True
+            with server.lock:
+                server.bytes_sent += len(body) // 2
+            return
+        self.wfile.write(body)
+        with server.lock:
+            server.bytes_sent += len(body)
+
+
+class _ZipServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, data):
+        super().__init__(("127.0.0.1", 0), _ZipHandler)
+        self.lock = threading.Lock()
+        self.data = data
+        self.checksum = hashlib.sha256(data).hexdigest()
+        self.ranges = True
+        self.drops = 0
+        self.bytes_sent = 0
+        # Intestazione Range di ogni richiesta dello zip (None = file intero)
+        self.requests = []
+
+    def handle_error(self, request, client_address):
+        # Il client chiude le connessioni interrotte: non sono errori del test
+        pass
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/ffmpeg.zip"
+
+
+class InstallFfmpegTest(unittest.TestCase):
+    def setUp(self):
+        patches = [
+            mock.patch.object(ffmpeg_install, "MIN_SEGMENT_SIZE", SEGMENT_SIZE),
+            mock.patch.object(ffmpeg_install, "CHUNK_SIZE", 16 * 1024),
+            mock.patch.object(ffmpeg_install, "RETRY_DELAY", 0),
+            mock.patch.object(ffmpeg_install, "STATE_SAVE_INTERVAL", 0),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.target = tempfile.mkdtemp(prefix="yt-dlp-gui-ffmpeg-")
+        self.addCleanup(shutil.rmtree, self.target, ignore_errors=True)
+        self.server = self._serve(_make_zip())
+
+    def _serve(self, data):
+        server = _ZipServer(data)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server
+
+    def _zip_member(self, name):
+        with zipfile.ZipFile(io.BytesIO(self.server.data)) as archive:
+            return archive.read(f"ffmpeg-build/bin/{name}")
+
+    def assertInstalled(self, result=(True, True)):
+        self.assertEqual(
+            ffmpeg_install.install_ffmpeg(self.target, self.server.url), result
+        )
+        self.assertEqual(sorted(os.listdir(self.target)), sorted([FFMPEG_EXE, FFPROBE_EXE]))
+        for name in (FFMPEG_EXE, FFPROBE_EXE):
+            with open(os.path.join(self.target, name), "rb") as handle:
+                self.assertEqual(handle.read(), self._zip_member(name))
+
+    def test_segmented_download(self):
+        self.assertInstalled()
+        # Sonda di un byte, poi un segmento per thread (lo zip supera i 4 segmenti minimi)
+        segments = [r for r in self.server.requests if r != "bytes=0-0"]
+        self.assertEqual(len(segments), ffmpeg_install.DOWNLOAD_SEGMENTS)
+
+    def test_retry_after_dropped_connection(self):
+        self.server.drops = 2
+        self.assertInstalled()
+        self.assertEqual(self.server.drops, 0)
+
+    def test_resume_from_partial_download(self):
+        self.server.drops = 1
+        with mock.patch.object(ffmpeg_install, "SEGMENT_RETRIES", 0):
+            with self.assertRaises(OSError):
+                ffmpeg_install.install_ffmpeg(self.target, self.server.url)
+        zip_path = os.path.join(self.target, "ffmpeg.zip")
+        self.assertTrue(os.path.isfile(zip_path + ".part"))
+        self.assertTrue(os.path.isfile(zip_path + ".part.json"))
+
+        sent = self.server.bytes_sent
+        reports = []
+        self.assertEqual(
+            ffmpeg_install.install_ffmpeg(
+                self.target, self.server.url, lambda percent, message: reports.append(message)
+            ),
+            (True, True),
+        )
+        # Riscaricata solo la metà mancante del segmento interrotto
+        resent = self.server.bytes_sent - sent
+        self.assertLess(resent, len(self.server.data) // ffmpeg_install.DOWNLOAD_SEGMENTS)
+        self.assertIn("Download ripreso e completato.", reports)
+        self.assertEqual(sorted(os.listdir(self.target)), sorted([FFMPEG_EXE, FFPROBE_EXE]))
+
+    def test_checksum_mismatch_discards_download(self):
+        self.server.checksum = "0" * 64
+        with self.assertRaises(ValueError):
+            ffmpeg_install.install_ffmpeg(self.target, self.server.url)
+        # Niente file parziale né stato: il tentativo successivo riparte da zero
+        self.assertEqual(os.listdir(self.target), [])
+
+    def test_server_without_range_support(self):
+        self.server.ranges = False
+        self.server.checksum = None
+        self.assertInstalled(result=(True, False))
+        # Dopo la sonda un solo flusso senza Range
+        self.assertEqual(self.server.requests, ["bytes=0-0", None])
+
+    def test_extracts_only_ffmpeg_binaries(self):
+        self.server.data = _make_zip(
+            extra=("../outside.txt", "ffmpeg-build/README.txt", "doc/ffplay")
+        )
+        self.server.checksum = hashlib.sha256(self.server.data).hexdigest()
+        self.assertInstalled()
+        self.assertFalse(
+            os.path.exists(os.path.join(os.path.dirname(self.target), "outside.txt"))
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,39 +1,226 @@
+import importlib
 import os
 import tempfile
+import threading
+import time
 from PySide6.QtWidgets import (
-    QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-    QLabel, QLineEdit, QTextEdit, QPushButton, QRadioButton,
-    QComboBox, QFileDialog, QCheckBox, QProgressBar, QButtonGroup,
+    QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
+    QLabel, QLineEdit, QPlainTextEdit, QPushButton, QRadioButton,
+    QComboBox, QFileDialog, QCheckBox, QProgressBar, QButtonGroup, QSpinBox,
+    QDoubleSpinBox, QInputDialog, QMessageBox,
+)
+from PySide6.QtCore import QObject, Qt, QThread, QTimer, Signal
+import startup
+from archive import KIND_AUDIO, KIND_AUDIO_VIDEO, KIND_VIDEO, DownloadArchive
+from bandwidth import DEFAULT_PER_HOST_CONNECTIONS, MB, parse_bandwidth_profiles
+from defaults import (
+    AUDIO_FORMAT_MP3,
+    AUDIO_FORMAT_ORIGINAL,
+    DEFAULT_CONCURRENCY,
+    DEFAULT_FFMPEG_CORES,
+    DEFAULT_RETRIES,
+    MAX_CONCURRENCY,
+    MAX_RETRIES,
+    POLICY_FAIR,
+    POLICY_FIFO,
+    POLICY_PRIORITY,
+    POLICY_SJF,
+)
+from fragments import FRAGMENTS_AUTO, MAX_FRAGMENT_CONCURRENCY
+from jobqueue import JobQueue
+from progress import (
+    STATUS_DOWNLOADING,
+    STATUS_POSTPROCESSING,
+    format_bytes,
+    format_eta,
+    format_speed,
+)
+from ffmpeg_dialog import FFmpegCheckWorker, FFmpegDialog
+from url_ingest import (
+    UrlCanonicalizer,
+    UrlIngest,
+    ensure_scheme,
+    iter_file_urls,
+    iter_text_urls,
 )
-from PySide6.QtCore import Qt, QThread
-from downloader import YtDlpDownloader
 from utils import (
-    get_ffmpeg_status,
-    get_persistent_ffmpeg_dir,
-    get_bundled_ffmpeg_dir,
-    parse_urls,
+    get_cached_ffmpeg_snapshot,
     sanitize_log_text,
 )
 
 
+# Righe massime mantenute nel log a video (il log completo è su file)
+LOG_MAX_BLOCKS = 5000
+PROGRESS_REFRESH_MS = 250
+PROGRESS_BAR_MAX = 1000
+
+
+def parse_item_selection(text, urls):
+    """Indici (da 1) indicati come numeri, intervalli "7-9" o URL della sessione.
+
+    Restituisce (indici, voci non riconosciute).
+    """
+    positions = {url: i for i, url in enumerate(urls, 1)}
+    indices, invalid = [], []
+    for token in text.replace(",", " ").split():
+        first, sep, last = token.partition("-")
+        if first.isdigit() and (not sep or last.isdigit()):
+            start, end = int(first), int(last or first)
+            found = [i for i in range(start, end + 1) if 1 <= i <= len(urls)]
+            if found:
+                indices.extend(found)
+                continue
+        else:
+            index = positions.get(token) or positions.get(ensure_scheme(token))
+            if index:
+                indices.append(index)
+                continue
+        invalid.append(token)
+    return sorted(set(indices)), invalid
+
+
+class ArchiveRebuildWorker(QThread):
+    progress_signal = Signal(int, int)
+    finished_signal = Signal(int, int, str)  # (aggiunti, rimossi, errore)
+
+    def __init__(self, folder, kind):
+        super().__init__()
+        self.folder = folder
+        self.kind = kind
+
+    def run(self):
+        try:
+            archive = DownloadArchive(self.folder, self.kind)
+            try:
+                added, removed = archive.rebuild(self.progress_signal.emit)
+            finally:
+                archive.close()
+            self.finished_signal.emit(added, removed, "")
+        except Exception as e:
+            self.finished_signal.emit(0, 0, str(e))
+
+
+class UrlImportWorker(QThread):
+    """Legge, normalizza e deduplica gli URL (casella di testo e/o file) fuori dal thread della GUI.
+
+    seed_urls sono gli URL già in coda: servono solo a scartare i duplicati;
+    urls sono URL già validati (es. importati da file) da riconsiderare.
+    """
+
+    progress_signal = Signal(int, int)  # (voci elaborate, URL aggiunti)
+    finished_signal = Signal(object, str)  # (UrlIngest, errore)
+
+    def __init__(self, canonicalizer, seed_urls, text="", paths=(), urls=()):
+        super().__init__()
+        self.canonicalizer = canonicalizer
+        self.seed_urls = seed_urls
+        self.urls = urls
+        self.text = text
+        self.paths = paths
+        self._stop = False
+
+    def stop(self):
+        self._stop = True
+
+    def run(self):
+        ingest = UrlIngest(self.canonicalizer)
+        stop = lambda: self._stop
+        try:
+            ingest.seed(self.seed_urls, stop)
+            ingest.extend(((url, True) for url in self.urls), self.progress_signal.emit, stop)
+            ingest.extend(
+                iter_text_urls(self.text.splitlines(), strict=False),
+                self.progress_signal.emit,
+                stop,
+            )
+            for path in self.paths:
+                if self._stop:
+                    break
+                ingest.extend(iter_file_urls(path), self.progress_signal.emit, stop)
+        except Exception as e:
+            self.finished_signal.emit(ingest, str(e))
+            return
+        self.finished_signal.emit(ingest, "")
+
+
+class ModulePreloader(QObject):
+    """Importa yt-dlp (via downloader) in un thread daemon a finestra già visibile.
+
+    Il thread non blocca la chiusura dell'applicazione; un download avviato
+    prima della fine attende semplicemente l'import in corso.
+    """
+
+    finished_signal = Signal(float, str)  # (secondi, errore)
+
+    def start(self):
+        threading.Thread(target=self._run, name="module-preload", daemon=True).start()
+
+    def _run(self):
+        started = time.perf_counter()
+        error = ""
+        for name in startup.PRELOAD_MODULES:
+            try:
+                importlib.import_module(name)
+            except Exception as e:
+                error = f"{name}: {e}"
+                break
+        self.finished_signal.emit(time.perf_counter() - started, error)
+
+
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
         self.setWindowTitle("yt-dlp GUI - ChiricoG 2025")
         self.setMinimumSize(600, 500)
         self.is_downloading = False
+        # Servizio di download persistente (creato al primo avvio) e il suo thread
         self.worker = None
         self.thread = None
+        self.item_states = {}
+        self.item_progress = {}
+        self.completed_count = 0
+        self.total_count = 0
+        self.rebuild_worker = None
+        self.preloader = None
+        self.last_metrics = None
+        # Coda URL: importati da file (già deduplicati) e quelli della sessione in corso
+        self.canonicalizer = UrlCanonicalizer()
+        self.imported_urls = []
+        self.session_urls = []
+        self.import_worker = None
+        self.pending_options = None
+        # Chiusura richiesta: la finestra è nascosta finché i thread non terminano
+        self._closing = False
         self._init_ui()
+        self.progress_timer = QTimer(self)
+        self.progress_timer.setInterval(PROGRESS_REFRESH_MS)
+        self.progress_timer.timeout.connect(self._refresh_progress)
 
     def _init_ui(self):
         central = QWidget()
         layout = QVBoxLayout()
 
-        self.url_input = QTextEdit()
+        self.url_input = QPlainTextEdit()
         self.url_input.setPlaceholderText("Incolla uno o più URL (uno per riga, oppure separati da spazi)")
         self.url_input.setMaximumHeight(80)
-        layout.addWidget(QLabel("URL Video:"))
+        url_header = QHBoxLayout()
+        url_header.addWidget(QLabel("URL Video:"))
+        url_header.addStretch()
+        self.import_label = QLabel("")
+        url_header.addWidget(self.import_label)
+        self.import_button = QPushButton("Importa file...")
+        self.import_button.setToolTip(
+            "Aggiunge gli URL di file di testo o CSV; i duplicati (stesso video "
+            "anche con URL diversi) vengono scartati"
+        )
+        self.import_button.clicked.connect(self.import_files)
+        url_header.addWidget(self.import_button)
+        self.clear_import_button = QPushButton("Svuota")
+        self.clear_import_button.setToolTip("Rimuove gli URL importati da file")
+        self.clear_import_button.setVisible(False)
+        self.clear_import_button.clicked.connect(self.clear_imported)
+        url_header.addWidget(self.clear_import_button)
+        layout.addLayout(url_header)
         layout.addWidget(self.url_input)
 
         format_layout = QHBoxLayout()
@@ -48,6 +235,16 @@ class MainWindow(QMainWindow):
         format_layout.addWidget(self.radio_audio)
         format_layout.addWidget(self.radio_video)
         format_layout.addWidget(self.radio_both)
+        self.audio_format_combo = QComboBox()
+        self.audio_format_combo.addItem("mp3", AUDIO_FORMAT_MP3)
+        self.audio_format_combo.addItem("Originale (senza ricodifica)", AUDIO_FORMAT_ORIGINAL)
+        self.audio_format_combo.setToolTip(
+            "Formato dei file \"Solo Audio\": mp3 ricodifica a 192k, "
+            "originale copia il flusso audio (m4a, opus, ...)"
+        )
+        self.audio_format_combo.setEnabled(False)
+        self.radio_audio.toggled.connect(self.audio_format_combo.setEnabled)
+        format_layout.addWidget(self.audio_format_combo)
         layout.addLayout(format_layout)
 
         layout.addWidget(QLabel("Qualità desiderata:"))
@@ -55,6 +252,101 @@ class MainWindow(QMainWindow):
         self.quality_combo.addItems(["best", "worst", "1080p", "720p", "480p"])
         layout.addWidget(self.quality_combo)
 
+        concurrency_layout = QHBoxLayout()
+        self.concurrency_spin = QSpinBox()
+        self.concurrency_spin.setRange(1, MAX_CONCURRENCY)
+        self.concurrency_spin.setValue(DEFAULT_CONCURRENCY)
+        concurrency_layout.addWidget(QLabel("Download paralleli:"))
+        concurrency_layout.addWidget(self.concurrency_spin)
+        concurrency_layout.addWidget(QLabel("Connessioni per host:"))
+        self.per_host_spin = QSpinBox()
+        self.per_host_spin.setRange(0, MAX_CONCURRENCY)
+        self.per_host_spin.setValue(DEFAULT_PER_HOST_CONNECTIONS)
+        self.per_host_spin.setSpecialValueText("illimitate")
+        concurrency_layout.addWidget(self.per_host_spin)
+        concurrency_layout.addWidget(QLabel("Tentativi:"))
+        self.retries_spin = QSpinBox()
+        self.retries_spin.setRange(0, MAX_RETRIES)
+        self.retries_spin.setValue(DEFAULT_RETRIES)
+        self.retries_spin.setSpecialValueText("nessuno")
+        self.retries_spin.setToolTip(
+            "Nuovi tentativi dopo errori temporanei (429, 5xx, timeout), con attesa "
+            "crescente; un host con troppi errori viene messo in pausa"
+        )
+        concurrency_layout.addWidget(self.retries_spin)
+        concurrency_layout.addWidget(QLabel("Frammenti paralleli:"))
+        self.fragments_spin = QSpinBox()
+        self.fragments_spin.setRange(0, MAX_FRAGMENT_CONCURRENCY)
+        self.fragments_spin.setValue(FRAGMENTS_AUTO)
+        self.fragments_spin.setSpecialValueText("auto")
+        self.fragments_spin.setToolTip(
+            "Frammenti scaricati in parallelo per i flussi HLS/DASH; "
+            "in automatico il valore si adatta alla velocità misurata"
+        )
+        concurrency_layout.addWidget(self.fragments_spin)
+        concurrency_layout.addWidget(QLabel("Core ffmpeg:"))
+        self.ffmpeg_cores_spin = QSpinBox()
+        self.ffmpeg_cores_spin.setRange(1, os.cpu_count() or 1)
+        self.ffmpeg_cores_spin.setValue(DEFAULT_FFMPEG_CORES)
+        self.ffmpeg_cores_spin.setToolTip(
+            "Core usati da merge e conversioni, eseguiti in parallelo ai download"
+        )
+        concurrency_layout.addWidget(self.ffmpeg_cores_spin)
+        concurrency_layout.addStretch()
+        layout.addLayout(concurrency_layout)
+
+        schedule_layout = QHBoxLayout()
+        self.schedule_combo = QComboBox()
+        self.schedule_combo.addItem("Come inseriti", POLICY_FIFO)
+        self.schedule_combo.addItem("Prima i più brevi", POLICY_SJF)
+        self.schedule_combo.addItem("Per priorità", POLICY_PRIORITY)
+        self.schedule_combo.addItem("A turno tra i gruppi aggiunti", POLICY_FAIR)
+        self.schedule_combo.setToolTip(
+            "Ordine in cui gli URL in coda vengono estratti e scaricati; "
+            "modificabile durante il download"
+        )
+        self.schedule_combo.currentIndexChanged.connect(self.on_schedule_changed)
+        self.priority_spin = QSpinBox()
+        self.priority_spin.setRange(-9, 9)
+        self.priority_spin.setToolTip(
+            "Priorità degli URL avviati o aggiunti alla coda: con l'ordine "
+            "\"Per priorità\" quelli più alti passano davanti"
+        )
+        schedule_layout.addWidget(QLabel("Ordine coda:"))
+        schedule_layout.addWidget(self.schedule_combo)
+        schedule_layout.addWidget(QLabel("Priorità:"))
+        schedule_layout.addWidget(self.priority_spin)
+        self.reprioritize_button = QPushButton("Applica a URL in coda...")
+        self.reprioritize_button.setToolTip(
+            "Assegna la priorità indicata a URL già in coda (numeri [i/N] del log o URL)"
+        )
+        self.reprioritize_button.setVisible(False)
+        self.reprioritize_button.clicked.connect(self.on_reprioritize)
+        schedule_layout.addWidget(self.reprioritize_button)
+        schedule_layout.addStretch()
+        layout.addLayout(schedule_layout)
+
+        bandwidth_layout = QHBoxLayout()
+        self.rate_spin = QDoubleSpinBox()
+        self.rate_spin.setRange(0, 1000)
+        self.rate_spin.setDecimals(1)
+        self.rate_spin.setSingleStep(0.5)
+        self.rate_spin.setSuffix(" MB/s")
+        self.rate_spin.setSpecialValueText("nessuno")
+        self.rate_spin.setToolTip("Banda totale per tutti i download; modificabile durante il download")
+        self.rate_spin.valueChanged.connect(self.on_rate_limit_changed)
+        self.profiles_input = QLineEdit()
+        self.profiles_input.setPlaceholderText("Fasce orarie, es. 08:00-18:00=2; 18:00-08:00=0")
+        self.profiles_input.setToolTip(
+            "Limite in MB/s per fascia oraria (0 = nessun limite); "
+            "fuori dalle fasce vale il limite di banda"
+        )
+        self.profiles_input.editingFinished.connect(self.on_profiles_changed)
+        bandwidth_layout.addWidget(QLabel("Limite banda:"))
+        bandwidth_layout.addWidget(self.rate_spin)
+        bandwidth_layout.addWidget(self.profiles_input)
+        layout.addLayout(bandwidth_layout)
+
         path_layout = QHBoxLayout()
         self.dest_path = QLineEdit()
         self.dest_path.setPlaceholderText("Cartella destinazione")
@@ -62,60 +354,393 @@ class MainWindow(QMainWindow):
         self.browse_button.clicked.connect(self.choose_folder)
         path_layout.addWidget(self.dest_path)
         path_layout.addWidget(self.browse_button)
+        self.rebuild_button = QPushButton("Ricostruisci archivio")
+        self.rebuild_button.setToolTip(
+            "Indicizza i file già presenti nella cartella: gli URL già scaricati "
+            "vengono saltati senza richieste di rete"
+        )
+        self.rebuild_button.clicked.connect(self.rebuild_archive)
+        path_layout.addWidget(self.rebuild_button)
         layout.addLayout(path_layout)
 
+        scratch_layout = QHBoxLayout()
+        self.scratch_path = QLineEdit()
+        self.scratch_path.setPlaceholderText("Cartella temporanea locale (facoltativa)")
+        self.scratch_path.setToolTip(
+            "Download e post-processing avvengono qui (es. un SSD locale); i file "
+            "finiti vengono spostati nella destinazione in background"
+        )
+        self.scratch_browse_button = QPushButton("Sfoglia")
+        self.scratch_browse_button.clicked.connect(self.choose_scratch_folder)
+        scratch_layout.addWidget(self.scratch_path)
+        scratch_layout.addWidget(self.scratch_browse_button)
+        scratch_layout.addWidget(QLabel("Buffer:"))
+        self.buffer_spin = QSpinBox()
+        self.buffer_spin.setRange(0, 65536)
+        self.buffer_spin.setSuffix(" KB")
+        self.buffer_spin.setSpecialValueText("auto")
+        self.buffer_spin.setToolTip("Buffer di lettura iniziale dei download HTTP")
+        scratch_layout.addWidget(self.buffer_spin)
+        scratch_layout.addWidget(QLabel("Blocchi HTTP:"))
+        self.chunk_spin = QSpinBox()
+        self.chunk_spin.setRange(0, 1024)
+        self.chunk_spin.setSuffix(" MB")
+        self.chunk_spin.setSpecialValueText("nessuno")
+        self.chunk_spin.setToolTip(
+            "Scarica i file HTTP a blocchi di questa dimensione "
+            "(utile con i siti che rallentano le richieste lunghe)"
+        )
+        scratch_layout.addWidget(self.chunk_spin)
+        layout.addLayout(scratch_layout)
+
         self.checkbox_subs = QCheckBox("Scarica sottotitoli")
         self.checkbox_simulate = QCheckBox("Simula (non scarica)")
+        self.checkbox_simulate.setToolTip(
+            "Risolve gli URL senza scaricarli e stima dimensione totale, durata "
+            "e spazio su disco necessario"
+        )
         layout.addWidget(self.checkbox_subs)
         layout.addWidget(self.checkbox_simulate)
 
         self.progress_label = QLabel("Pronto per il download")
         self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, PROGRESS_BAR_MAX)
         self.progress_bar.setVisible(False)
+        self.active_label = QLabel("")
+        self.active_label.setVisible(False)
         layout.addWidget(self.progress_label)
         layout.addWidget(self.progress_bar)
+        layout.addWidget(self.active_label)
 
-        self.log_output = QTextEdit()
+        self.log_output = QPlainTextEdit()
         self.log_output.setReadOnly(True)
-        layout.addWidget(QLabel("Log download:"))
+        self.log_output.setMaximumBlockCount(LOG_MAX_BLOCKS)
+        log_header = QHBoxLayout()
+        log_header.addWidget(QLabel("Log download:"))
+        log_header.addStretch()
+        self.metrics_button = QPushButton("Esporta metriche")
+        self.metrics_button.setToolTip(
+            "Salva tempi per fase, byte e velocità di ogni URL dell'ultima sessione "
+            "(JSON o CSV)"
+        )
+        self.metrics_button.setEnabled(False)
+        self.metrics_button.clicked.connect(self.export_metrics)
+        log_header.addWidget(self.metrics_button)
+        layout.addLayout(log_header)
         layout.addWidget(self.log_output)
 
+        download_layout = QHBoxLayout()
         self.download_button = QPushButton("Avvia Download")
         self.download_button.clicked.connect(self.on_download_button_clicked)
-        layout.addWidget(self.download_button)
+        download_layout.addWidget(self.download_button)
+        self.enqueue_button = QPushButton("Aggiungi alla coda")
+        self.enqueue_button.setToolTip(
+            "Aggiunge gli URL nuovi della casella (e quelli importati) ai download in corso"
+        )
+        self.enqueue_button.setVisible(False)
+        self.enqueue_button.clicked.connect(self.start_download)
+        download_layout.addWidget(self.enqueue_button)
+        layout.addLayout(download_layout)
 
         central.setLayout(layout)
         self.setCentralWidget(central)
 
-        if not get_ffmpeg_status():
-            self.log(
-                f"[ATTENZIONE] ffmpeg non trovato (né di sistema, né in {get_persistent_ffmpeg_dir()}, "
-                f"né in {get_bundled_ffmpeg_dir()}). Alcune funzionalità potrebbero non funzionare."
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if startup.report.mark(startup.PHASE_FIRST_PAINT):
+            self._startup_phase_done()
+
+    def preload_modules(self):
+        """Carica yt-dlp in background, dopo la comparsa della finestra."""
+        self.preloader = ModulePreloader(self)
+        self.preloader.finished_signal.connect(self.on_modules_preloaded)
+        self.preloader.start()
+
+    def on_modules_preloaded(self, seconds, error):
+        if error:
+            self.log(f"[ERRORE] Precaricamento moduli non riuscito ({error})")
+        startup.report.record(startup.PHASE_PRELOAD, seconds)
+        self._startup_phase_done()
+
+    def _startup_phase_done(self):
+        if startup.report.complete:
+            self.log(f"[INFO] Tempi di avvio: {startup.report.describe()}")
+            startup.report.save()
+
+    def check_ffmpeg(self):
+        """Verifica ffmpeg: subito se la cache è valida, altrimenti in background."""
+        started = time.perf_counter()
+        snap = get_cached_ffmpeg_snapshot()
+        if snap is not None:
+            startup.report.record(
+                startup.PHASE_FFMPEG, time.perf_counter() - started, "cache"
             )
+            self.on_ffmpeg_checked(snap)
+            return
+        self.log("[INFO] Verifica di ffmpeg in corso...")
+        self.ffmpeg_check_worker = FFmpegCheckWorker()
+        self.ffmpeg_check_worker.finished_signal.connect(
+            lambda snap: self._on_ffmpeg_validated(snap, started)
+        )
+        self.ffmpeg_check_worker.start()
+
+    def _on_ffmpeg_validated(self, snap, started):
+        startup.report.record(
+            startup.PHASE_FFMPEG, time.perf_counter() - started, "verifica"
+        )
+        self._startup_phase_done()
+        self.on_ffmpeg_checked(snap)
+
+    def on_ffmpeg_checked(self, snap):
+        if snap["available"]:
+            return
+        dialog = FFmpegDialog(self)
+        dialog.exec()
+        if dialog.success:
+            self.log("[OK] ffmpeg installato.")
+            return
+        self.log(
+            f"[ATTENZIONE] ffmpeg non trovato (né di sistema, né in {snap['persistent_dir']}, "
+            f"né in {snap['bundled_dir']})."
+        )
+        self.close()
 
     def choose_folder(self):
         folder = QFileDialog.getExistingDirectory(self, "Scegli cartella destinazione")
         if folder:
             self.dest_path.setText(folder)
 
+    def choose_scratch_folder(self):
+        folder = QFileDialog.getExistingDirectory(self, "Scegli cartella temporanea")
+        if folder:
+            self.scratch_path.setText(folder)
+
+    def _archive_kind(self):
+        if self.radio_audio.isChecked():
+            return KIND_AUDIO
+        if self.radio_video.isChecked():
+            return KIND_VIDEO
+        return KIND_AUDIO_VIDEO
+
+    def rebuild_archive(self):
+        if self.rebuild_worker and self.rebuild_worker.isRunning():
+            return
+        dest = self._validate_destination(False)
+        if dest is None:
+            return
+
+        self.rebuild_button.setEnabled(False)
+        self.log(f"[ARCHIVIO] Ricostruzione indice per {dest}...")
+        self.rebuild_worker = ArchiveRebuildWorker(dest, self._archive_kind())
+        self.rebuild_worker.progress_signal.connect(self.on_rebuild_progress)
+        self.rebuild_worker.finished_signal.connect(self.on_rebuild_finished)
+        self.rebuild_worker.start()
+
+    def on_rebuild_progress(self, current, total):
+        if not self.is_downloading:
+            self.progress_label.setText(f"Analisi file: {current}/{total}")
+
+    def on_rebuild_finished(self, added, removed, error_msg):
+        self.rebuild_button.setEnabled(True)
+        if error_msg:
+            self.log(f"[ERRORE] Ricostruzione archivio fallita: {error_msg}")
+            return
+        self.log(
+            f"[ARCHIVIO] Indice aggiornato: {added} file aggiunti, "
+            f"{removed} voci rimosse (file non più presenti)."
+        )
+        if not self.is_downloading:
+            self.progress_label.setText("Pronto per il download")
+
+    def on_rate_limit_changed(self, value):
+        if self.is_downloading and self.worker:
+            self.worker.set_rate_limit(value * MB)
+
+    def on_schedule_changed(self):
+        if self.is_downloading and self.worker:
+            self.worker.set_policy(self.schedule_combo.currentData())
+
+    def on_reprioritize(self):
+        if not (self.is_downloading and self.worker):
+            return
+        priority = self.priority_spin.value()
+        text, ok = QInputDialog.getText(
+            self,
+            "Priorità URL",
+            f"URL a cui dare priorità {priority} (numeri come 3, 7-9 oppure URL):",
+        )
+        if not ok or not text.strip():
+            return
+        indices, invalid = parse_item_selection(text, self.worker.urls)
+        if invalid:
+            self.log(f"[ERRORE] URL non presenti nella sessione: {' '.join(invalid)}")
+        if not indices:
+            return
+        # La priorità conta solo con l'ordine "Per priorità"
+        if self.schedule_combo.currentData() != POLICY_PRIORITY:
+            self.schedule_combo.setCurrentIndex(self.schedule_combo.findData(POLICY_PRIORITY))
+        for index in indices:
+            self.worker.set_priority(index, priority)
+
+    def _bandwidth_profiles(self):
+        """Fasce orarie inserite dall'utente; None (con errore a log) se non valide."""
+        try:
+            return parse_bandwidth_profiles(self.profiles_input.text())
+        except ValueError as e:
+            self.log(f"[ERRORE] {e} (formato: 08:00-18:00=2; 18:00-08:00=0)")
+            return None
+
+    def on_profiles_changed(self):
+        if self.is_downloading and self.worker:
+            profiles = self._bandwidth_profiles()
+            if profiles is not None:
+                self.worker.set_bandwidth_profiles(profiles)
+                self.log("[INFO] Fasce orarie di banda aggiornate.")
+
+    def export_metrics(self):
+        if self.last_metrics is None:
+            return
+        path, selected = QFileDialog.getSaveFileName(
+            self,
+            "Esporta metriche",
+            os.path.join(self.dest_path.text() or os.getcwd(), "metriche.json"),
+            "JSON (*.json);;CSV (*.csv)",
+        )
+        if not path:
+            return
+        if not os.path.splitext(path)[1]:
+            path += ".csv" if selected.startswith("CSV") else ".json"
+        try:
+            self.last_metrics.export(path)
+        except OSError as e:
+            self.log(f"[ERRORE] Esportazione metriche non riuscita: {e}")
+            return
+        self.log(f"[OK] Metriche esportate in {path}")
+
+    def _start_ingest(self, on_finished, text="", paths=(), seed_urls=(), urls=()):
+        """Avvia l'elaborazione degli URL in background; False se già in corso."""
+        if self.import_worker is not None:
+            self.log("[ERRORE] Importazione URL già in corso, attendi che finisca.")
+            return False
+        self.import_worker = UrlImportWorker(
+            self.canonicalizer, list(seed_urls), text, paths, list(urls)
+        )
+        self.import_worker.progress_signal.connect(self.on_import_progress)
+        self.import_worker.finished_signal.connect(on_finished)
+        self.import_worker.finished.connect(self._on_import_thread_finished)
+        self.import_button.setEnabled(False)
+        self.import_worker.start()
+        return True
+
+    def _on_import_thread_finished(self):
+        self.import_worker = None
+        self.import_button.setEnabled(True)
+        if self._closing:
+            self.close()
+
+    def on_import_progress(self, processed, added):
+        self.import_label.setText(f"Analisi URL: {processed} voci, {added} nuovi...")
+
+    def _update_import_label(self):
+        count = len(self.imported_urls)
+        self.import_label.setText(f"{count} URL importati" if count else "")
+        self.clear_import_button.setVisible(bool(count))
+
+    def import_files(self):
+        paths, _ = QFileDialog.getOpenFileNames(
+            self,
+            "Importa URL",
+            "",
+            "Liste di URL (*.txt *.csv *.tsv *.list);;Tutti i file (*)",
+        )
+        if paths:
+            # Confronto con gli URL già importati e con quelli della sessione in corso
+            self._start_ingest(
+                self.on_import_finished,
+                paths=paths,
+                seed_urls=self.imported_urls + self.session_urls,
+            )
+
+    def on_import_finished(self, ingest, error):
+        self.imported_urls.extend(ingest.urls)
+        self._update_import_label()
+        if error:
+            self.log(f"[ERRORE] Importazione interrotta: {error}")
+        self.log(f"[INFO] Importati da file: {ingest.describe()}")
+
+    def clear_imported(self):
+        if self.import_worker is None:
+            self.imported_urls = []
+            self._update_import_label()
+
     def log(self, msg):
-        self.log_output.append(sanitize_log_text(msg))
+        self.log_output.appendPlainText(sanitize_log_text(msg))
 
     def update_progress(self, current, total):
-        if total > 0:
-            progress_percent = int((current / total) * 100)
-            self.progress_bar.setValue(progress_percent)
-            self.progress_label.setText(
-                f"Progresso: {current}/{total} completati ({progress_percent}%)"
-            )
-        else:
+        self.completed_count = current
+        self.total_count = total
+        self._refresh_progress()
+
+    def update_item_status(self, index, status):
+        self.item_states[index] = status
+        if status not in (STATUS_DOWNLOADING, STATUS_POSTPROCESSING):
+            self.item_progress.pop(index, None)
+
+    def update_item_progress(self, event):
+        self.item_progress[event.index] = event
+
+    def _refresh_progress(self):
+        total = self.total_count
+        if total <= 0:
             self.progress_bar.setValue(0)
             self.progress_label.setText("Pronto per il download")
+            self.active_label.setVisible(False)
+            return
+
+        # Avanzamento frazionario: URL conclusi + frazione in byte di quelli attivi
+        active = [
+            index for index, state in self.item_states.items()
+            if state in (STATUS_DOWNLOADING, STATUS_POSTPROCESSING)
+        ]
+        partial = 0.0
+        downloaded = 0
+        speed = 0.0
+        lines = []
+        for index in sorted(active):
+            event = self.item_progress.get(index)
+            if event is None:
+                continue
+            fraction = event.fraction
+            if fraction is not None:
+                partial += fraction
+            downloaded += event.downloaded_bytes
+            speed += event.speed or 0.0
+            percent = f"{fraction * 100:.0f}%" if fraction is not None else "--"
+            lines.append(
+                f"[{index}] {percent} {format_bytes(event.downloaded_bytes)}/"
+                f"{format_bytes(event.total_bytes)} @ {format_speed(event.speed)} "
+                f"ETA {format_eta(event.eta)}"
+            )
+
+        overall = min((self.completed_count + partial) / total, 1.0)
+        self.progress_bar.setValue(int(overall * PROGRESS_BAR_MAX))
+        text = (
+            f"Progresso: {self.completed_count}/{total} completati "
+            f"({overall * 100:.0f}%)"
+        )
+        if active:
+            text += (
+                f" - {len(active)} in corso, {format_bytes(downloaded)} "
+                f"@ {format_speed(speed)}"
+            )
+        self.progress_label.setText(text)
+        self.active_label.setText("\n".join(lines))
+        self.active_label.setVisible(bool(lines))
 
     def on_download_button_clicked(self):
         if self.is_downloading:
             if self.worker:
-                self.worker.stop_requested = True
+                self.worker.request_stop()
             self.download_button.setText("Annullamento...")
             self.download_button.setEnabled(False)
         else:
@@ -139,12 +764,9 @@ class MainWindow(QMainWindow):
         return dest
 
     def start_download(self):
-        if self.is_downloading or (self.thread and self.thread.isRunning()):
-            self.log("[ERRORE] Attendi la fine del download in corso.")
-            return
-
-        urls = parse_urls(self.url_input.toPlainText())
-        if not urls:
+        """Avvia una sessione o, se è in corso, le aggiunge gli URL nuovi."""
+        text = self.url_input.toPlainText()
+        if not text.strip() and not self.imported_urls:
             self.log("[ERRORE] Inserisci almeno un URL valido!")
             return
 
@@ -152,59 +774,237 @@ class MainWindow(QMainWindow):
         output_path = self._validate_destination(simulate)
         if output_path is None:
             return
-
-        self.log_output.clear()
-
-        self.download_button.setText("Annulla download")
-        self.download_button.setEnabled(True)
-        self.progress_bar.setVisible(True)
-        self.progress_bar.setValue(0)
-        self.progress_label.setText("Inizializzazione...")
-
-        if len(urls) > 1:
-            self.log("\n=== INIZIO SESSIONE DOWNLOAD ===")
-            self.log(f"URLs da scaricare: {len(urls)}")
+        profiles = self._bandwidth_profiles()
+        if profiles is None:
+            return
 
         options = {
-            "urls": urls,
             "audio_only": self.radio_audio.isChecked(),
+            "audio_format": self.audio_format_combo.currentData(),
             "video_only": self.radio_video.isChecked(),
             "quality": self.quality_combo.currentText(),
             "output_path": output_path,
             "subs": self.checkbox_subs.isChecked(),
             "simulate": simulate,
+            "concurrency": self.concurrency_spin.value(),
+            "per_host_connections": self.per_host_spin.value(),
+            "retries": self.retries_spin.value(),
+            "schedule": self.schedule_combo.currentData(),
+            "priority": self.priority_spin.value(),
+            "fragment_concurrency": self.fragments_spin.value(),
+            "ffmpeg_cores": self.ffmpeg_cores_spin.value(),
+            "rate_limit": self.rate_spin.value() * MB,
+            "bandwidth_profiles": profiles,
+            "scratch_dir": self.scratch_path.text().strip(),
+            "buffersize": self.buffer_spin.value() * 1024,
+            "http_chunk_size": self.chunk_spin.value() * MB,
         }
+        # URL importati e della casella deduplicati tra loro e con quelli già in coda
+        if self._start_ingest(
+            self.on_start_urls_ready,
+            text=text,
+            seed_urls=self.session_urls,
+            urls=self.imported_urls,
+        ):
+            self.pending_options = options
+            button = self.enqueue_button if self.is_downloading else self.download_button
+            button.setText("Preparazione URL...")
+            button.setEnabled(False)
+
+    def on_start_urls_ready(self, ingest, error):
+        options, self.pending_options = self.pending_options, None
+        self.enqueue_button.setText("Aggiungi alla coda")
+        self.enqueue_button.setEnabled(True)
+        if not self.is_downloading:
+            self.download_button.setText("Avvia Download")
+            self.download_button.setEnabled(True)
+        self._update_import_label()
+        if error or options is None:
+            if error:
+                self.log(f"[ERRORE] Lettura degli URL non riuscita: {error}")
+            return
+        if not ingest.urls:
+            if self.is_downloading:
+                self.log("[INFO] Nessun URL nuovo da aggiungere alla coda.")
+            else:
+                self.log("[ERRORE] Inserisci almeno un URL valido!")
+            return
+        options["urls"] = ingest.urls
+        self._submit_batch(options)
+        if ingest.duplicates:
+            self.log(f"[INFO] {ingest.duplicates} URL duplicati ignorati")
+
+    def _submit_batch(self, options):
+        """Affida gli URL al servizio di download, avviandolo se necessario.
+
+        Il servizio resta attivo tra una sessione e l'altra: istanze yt-dlp,
+        connessioni e pool di thread vengono riutilizzati.
+        """
+        if self.is_downloading:
+            self.session_urls.extend(options["urls"])
+        else:
+            self._prepare_session(options["urls"])
+
+        if self.worker is not None:
+            self.worker.add_batch(options)
+            return
+
+        from downloader import YtDlpDownloader
 
         self.thread = QThread()
-        self.worker = YtDlpDownloader(options)
+        self.worker = YtDlpDownloader(options, persistent=True)
         self.worker.moveToThread(self.thread)
 
         self.thread.started.connect(self.worker.run)
         self.worker.log_signal.connect(self.log)
         self.worker.progress_signal.connect(self.update_progress)
-        self.worker.finished.connect(self.on_download_finished)
+        self.worker.item_status_signal.connect(self.update_item_status)
+        self.worker.item_progress_signal.connect(self.update_item_progress)
+        self.worker.session_started.connect(self.on_session_started)
+        self.worker.session_finished.connect(self.on_download_finished)
         self.worker.finished.connect(self.thread.quit)
         self.worker.finished.connect(self.worker.deleteLater)
-        self.thread.finished.connect(self.thread.deleteLater)
+        self.thread.finished.connect(self._on_thread_finished)
+        self.thread.start()
+
+    def on_session_started(self):
+        # Un batch aggiunto mentre la sessione precedente si chiudeva ne apre una nuova
+        if not self.is_downloading:
+            self._prepare_session([])
+        self.last_metrics = self.worker.metrics
+        self.metrics_button.setEnabled(True)
+
+    def _prepare_session(self, urls):
+        self.log_output.clear()
 
+        self.download_button.setText("Annulla download")
+        self.download_button.setEnabled(True)
+        self.progress_bar.setVisible(True)
+        self.progress_bar.setValue(0)
+        self.progress_label.setText("Inizializzazione...")
+        self.item_progress = {}
+        self.completed_count = 0
+        self.total_count = 0
+
+        if len(urls) > 1:
+            self.log("\n=== INIZIO SESSIONE DOWNLOAD ===")
+            self.log(f"URLs da scaricare: {len(urls)}")
+
+        self.item_states = {}
+        self.session_urls = list(urls)
+        self.enqueue_button.setVisible(True)
+        self.reprioritize_button.setVisible(True)
         self.is_downloading = True
-        self.thread.start()
+        self.progress_timer.start()
 
-    def on_download_finished(self):
-        self.is_downloading = False
+    def _on_thread_finished(self):
+        # Il QThread va rilasciato solo a thread terminato, non all'emissione di finished
         self.worker = None
         self.thread = None
+        if self._closing:
+            self.close()
+
+    def on_download_finished(self):
+        self.is_downloading = False
+        self.session_urls = []
+        self.progress_timer.stop()
+        self.active_label.setVisible(False)
+        self.enqueue_button.setVisible(False)
+        self.reprioritize_button.setVisible(False)
         self.download_button.setText("Avvia Download")
         self.download_button.setEnabled(True)
         self.progress_bar.setVisible(False)
         self.progress_label.setText("Download terminato - puoi avviarne un altro")
+        if self._closing:
+            return
         self.show()
         self.raise_()
         self.activateWindow()
 
+    def offer_resume(self):
+        """Propone di riprendere l'ultima sessione interrotta (chiusura o crash)."""
+        try:
+            jobs = JobQueue()
+        except Exception as e:
+            self.log(f"[WARN] Coda persistente non disponibile: {e}")
+            return
+        try:
+            batches = jobs.interrupted_batches()
+            if not batches:
+                return
+            batch = batches[0]
+            started = time.strftime("%d/%m/%Y %H:%M", time.localtime(batch["created"]))
+            answer = QMessageBox.question(
+                self,
+                "Sessione interrotta",
+                f"La sessione di download del {started} non è stata completata: "
+                f"{batch['remaining']} URL su {batch['total']} ancora da scaricare.\n\n"
+                "Riprendere ora? I download parziali (.part) verranno continuati.",
+            )
+            if answer != QMessageBox.Yes:
+                jobs.discard_batch(batch["id"])
+                return
+            options = jobs.resume_batch(batch["id"])
+        finally:
+            jobs.close()
+        if options is None:
+            return
+
+        self.radio_audio.setChecked(options.get("audio_only", False))
+        self.audio_format_combo.setCurrentIndex(
+            max(
+                0,
+                self.audio_format_combo.findData(
+                    options.get("audio_format", AUDIO_FORMAT_MP3)
+                ),
+            )
+        )
+        self.radio_video.setChecked(options.get("video_only", False))
+        self.radio_both.setChecked(
+            not options.get("audio_only") and not options.get("video_only")
+        )
+        self.quality_combo.setCurrentText(options.get("quality", "best"))
+        self.dest_path.setText(options.get("output_path", ""))
+        self.checkbox_subs.setChecked(options.get("subs", False))
+        self.checkbox_simulate.setChecked(options.get("simulate", False))
+        self.concurrency_spin.setValue(options.get("concurrency", DEFAULT_CONCURRENCY))
+        self.per_host_spin.setValue(
+            options.get("per_host_connections", DEFAULT_PER_HOST_CONNECTIONS)
+        )
+        self.retries_spin.setValue(options.get("retries", DEFAULT_RETRIES))
+        self.schedule_combo.setCurrentIndex(
+            max(0, self.schedule_combo.findData(options.get("schedule", POLICY_FIFO)))
+        )
+        self.priority_spin.setValue(options.get("priority", 0))
+        self.fragments_spin.setValue(
+            options.get("fragment_concurrency", FRAGMENTS_AUTO)
+        )
+        self.ffmpeg_cores_spin.setValue(
+            options.get("ffmpeg_cores", DEFAULT_FFMPEG_CORES)
+        )
+        self.rate_spin.setValue((options.get("rate_limit") or 0) / MB)
+        self.scratch_path.setText(options.get("scratch_dir", ""))
+        self.buffer_spin.setValue((options.get("buffersize") or 0) // 1024)
+        self.chunk_spin.setValue((options.get("http_chunk_size") or 0) // MB)
+        self.url_input.setPlainText("\n".join(options["urls"]))
+        self._submit_batch(options)
+
     def closeEvent(self, event):
-        if self.is_downloading and self.worker:
-            self.worker.stop_requested = True
-            if self.thread and self.thread.isRunning():
-                self.thread.wait(10000)
+        """Annulla importazione e download senza bloccare l'interfaccia.
+
+        La finestra viene nascosta subito; la chiusura si completa quando i
+        thread terminano (_on_thread_finished / _on_import_thread_finished).
+        """
+        self._closing = True
+        if self.import_worker is not None:
+            self.import_worker.stop()
+        if self.worker:
+            self.worker.shutdown(resumable=True)
+        if self.import_worker is not None or self.thread is not None:
+            self.hide()
+            event.ignore()
+            return
         event.accept()
+        if self.isHidden():
+            # Chiusura rimandata: la finestra era già nascosta e Qt non termina da solo
+            QApplication.quit()
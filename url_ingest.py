@@ -0,0 +1,214 @@
+import csv
+import re
+from urllib.parse import urlsplit
+from extract_cache import normalize_url
+
+# Intestazioni di colonna riconosciute nei CSV (altrimenti si usa ogni cella con un URL)
+URL_COLUMN_NAMES = ("url", "urls", "link", "links", "href", "webpage_url", "original_url")
+CSV_EXTENSIONS = (".csv", ".tsv")
+CSV_DELIMITERS = ",;\t|"
+SNIFF_BYTES = 64 * 1024
+# Ogni quanti elementi viene riportato l'avanzamento dell'importazione
+INGEST_BATCH = 2000
+# Scansioni complete senza extractor dedicato dopo cui un host è considerato generico
+GENERIC_HOST_SCANS = 16
+
+_DOMAIN_RE = re.compile(r"^(?:[\w-]+\.)+[a-z]{2,}(?::\d+)?(?:[/?#]|$)", re.IGNORECASE)
+# Prefissi di ricerca di yt-dlp (ytsearch:, ytsearch5:, scsearch:, ...)
+_SEARCH_RE = re.compile(r"^[a-z0-9]+search\w*:\S", re.IGNORECASE)
+
+
+def ensure_scheme(url):
+    """Aggiunge https:// agli URL senza schema (es. youtu.be/ID)."""
+    url = url.strip()
+    if "://" not in url and _DOMAIN_RE.match(url):
+        return "https://" + url
+    return url
+
+
+def looks_like_url(token):
+    """True per URL con schema, domini con percorso e ricerche yt-dlp."""
+    token = token.strip()
+    if "://" in token:
+        return bool(urlsplit(token).netloc)
+    return bool(_DOMAIN_RE.match(token) or _SEARCH_RE.match(token))
+
+
+def iter_text_urls(lines, strict=True):
+    """URL da righe di testo, spazi come separatore secondario; le righe # sono commenti.
+
+    Con strict=False ogni token è accettato come URL (casella di testo della GUI).
+    Restituisce coppie (url, valido): i token scartati arrivano con valido=False.
+    """
+    for line in lines:
+        if line.lstrip().startswith("#"):
+            continue
+        for token in line.split():
+            if not strict or looks_like_url(token):
+                yield ensure_scheme(token), True
+            else:
+                yield token, False
+
+
+def _sniff_delimiter(sample, path):
+    if path.lower().endswith(".tsv"):
+        return "\t"
+    try:
+        return csv.Sniffer().sniff(sample, delimiters=CSV_DELIMITERS).delimiter
+    except csv.Error:
+        return ","
+
+
+def iter_csv_urls(handle, delimiter=","):
+    """URL da un CSV letto riga per riga.
+
+    Se la prima riga ha una colonna "url" (o simile) si legge solo quella,
+    altrimenti ogni cella che contiene un URL.
+    """
+    column = None
+    for number, row in enumerate(csv.reader(handle, delimiter=delimiter)):
+        if number == 0:
+            names = [cell.strip().lower() for cell in row]
+            column = next((i for i, n in enumerate(names) if n in URL_COLUMN_NAMES), None)
+            if column is not None:
+                continue
+        cells = row if column is None else row[column:column + 1]
+        for cell in cells:
+            cell = cell.strip()
+            if not cell or cell.startswith("#"):
+                continue
+            if looks_like_url(cell):
+                yield ensure_scheme(cell), True
+            else:
+                yield cell, False
+
+
+def iter_file_urls(path):
+    """URL da un file di testo o CSV, senza caricarlo tutto in memoria."""
+    with open(path, encoding="utf-8-sig", errors="replace", newline="") as handle:
+        if path.lower().endswith(CSV_EXTENSIONS):
+            delimiter = _sniff_delimiter(handle.read(SNIFF_BYTES), path)
+            handle.seek(0)
+            yield from iter_csv_urls(handle, delimiter)
+        else:
+            yield from iter_text_urls(handle)
+
+
+class UrlCanonicalizer:
+    """Chiave canonica di un URL: extractor:id se riconosciuto, altrimenti l'URL normalizzato.
+
+    Stessa chiave della cache delle estrazioni, ma pensata per liste enormi:
+    gli extractor che hanno già riconosciuto un host vengono provati per primi
+    e, dopo GENERIC_HOST_SCANS URL senza extractor dedicato, gli host gestiti
+    solo dall'extractor generico non vengono più confrontati con le ~1800
+    espressioni regolari di yt-dlp. Non è thread-safe: un solo thread per volta.
+    """
+
+    def __init__(self):
+        self._classes = None
+        self._host_extractors = {}
+        self._generic_scans = {}
+        self._keys = {}
+
+    def _extractors(self):
+        if self._classes is None:
+            from yt_dlp.extractor import gen_extractor_classes
+
+            self._classes = list(gen_extractor_classes())
+        return self._classes
+
+    @staticmethod
+    def _match(ie, url):
+        """(trovato, id): trovato è True se l'extractor gestisce l'URL."""
+        if not ie.suitable(url):
+            return False, None
+        return True, ie.get_temp_id(url)
+
+    def _extractor_id(self, url, host):
+        known = self._host_extractors.setdefault(host, [])
+        for ie in known:
+            matched, video_id = self._match(ie, url)
+            if matched:
+                return ie.ie_key(), video_id
+        if self._generic_scans.get(host, 0) >= GENERIC_HOST_SCANS:
+            return None, None
+
+        for ie in self._extractors():
+            matched, video_id = self._match(ie, url)
+            if not matched:
+                continue
+            if ie.ie_key() == "Generic":
+                break
+            known.append(ie)
+            return ie.ie_key(), video_id
+        self._generic_scans[host] = self._generic_scans.get(host, 0) + 1
+        return None, None
+
+    def key(self, url):
+        cached = self._keys.get(url)
+        if cached is not None:
+            return cached
+        try:
+            host = urlsplit(url).netloc.lower()
+        except ValueError:
+            host = ""
+        ie_key, video_id = self._extractor_id(url, host) if host else (None, None)
+        key = f"{ie_key}:{video_id}" if video_id else normalize_url(url)
+        self._keys[url] = key
+        return key
+
+
+class UrlIngest:
+    """Lista ordinata di URL senza duplicati (per chiave canonica).
+
+    seed() registra gli URL già in coda senza aggiungerli; add() restituisce
+    False per i duplicati (contati in duplicates), skipped conta i token che
+    non sono URL.
+    """
+
+    def __init__(self, canonicalizer=None):
+        self.canonicalizer = canonicalizer or UrlCanonicalizer()
+        self.urls = []
+        self.keys = set()
+        self.duplicates = 0
+        self.skipped = 0
+        self.processed = 0
+
+    def seed(self, urls, stop=None):
+        for number, url in enumerate(urls):
+            if stop is not None and number % INGEST_BATCH == 0 and stop():
+                return
+            self.keys.add(self.canonicalizer.key(url))
+
+    def add(self, url):
+        key = self.canonicalizer.key(url)
+        if key in self.keys:
+            self.duplicates += 1
+            return False
+        self.keys.add(key)
+        self.urls.append(url)
+        return True
+
+    def extend(self, entries, progress=None, stop=None):
+        """Consuma coppie (url, valido); progress(elaborati, aggiunti) ogni INGEST_BATCH."""
+        for url, valid in entries:
+            self.processed += 1
+            if valid:
+                self.add(url)
+            else:
+                self.skipped += 1
+            if self.processed % INGEST_BATCH == 0:
+                if progress:
+                    progress(self.processed, len(self.urls))
+                if stop is not None and stop():
+                    return False
+        return True
+
+    def describe(self):
+        parts = [f"{len(self.urls)} URL"]
+        if self.duplicates:
+            parts.append(f"{self.duplicates} duplicati ignorati")
+        if self.skipped:
+            parts.append(f"{self.skipped} voci non riconosciute come URL")
+        return ", ".join(parts)
+
@@ -1,10 +1,11 @@
 
+import json
 import os
 import re
 import shutil
 import subprocess
 import sys
-import tempfile
+import threading
 
 # Sequenze ANSI (es. colori nel progresso yt-dlp) e caratteri di controllo
 _ANSI_ESCAPE_RE = re.compile(r"\x1b\[[0-?]*[ -/]*[@-~]")
@@ -13,14 +14,28 @@ _CONTROL_CHARS_RE = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f\x7f]")
 FFMPEG_EXE = "ffmpeg.exe" if sys.platform == "win32" else "ffmpeg"
 FFPROBE_EXE = "ffprobe.exe" if sys.platform == "win32" else "ffprobe"
 
+# Versione del formato di ffmpeg_snapshot.json: se cambia, la cache su disco è ignorata
+FFMPEG_CACHE_VERSION = 1
+
 _dir_cache: dict[str, bool] = {}
 _ffmpeg_snapshot: dict | None = None
+_ffmpeg_lock = threading.RLock()
+
+
+def _ffmpeg_cache_path():
+    return os.path.join(get_user_data_dir(), "ffmpeg_snapshot.json")
 
 
 def invalidate_ffmpeg_cache():
+    """Dimentica il rilevamento di ffmpeg (in memoria e su disco)."""
     global _ffmpeg_snapshot
-    _dir_cache.clear()
-    _ffmpeg_snapshot = None
+    with _ffmpeg_lock:
+        _dir_cache.clear()
+        _ffmpeg_snapshot = None
+        try:
+            os.remove(_ffmpeg_cache_path())
+        except OSError:
+            pass
 
 
 def get_app_dir():
@@ -37,6 +52,24 @@ def get_bundle_dir():
     return get_app_dir()
 
 
+def get_user_data_dir():
+    """Cartella dati per-utente persistente (cache, archivio, coda delle sessioni).
+
+    LOCALAPPDATA su Windows, ~/Library/Application Support su macOS,
+    $XDG_DATA_HOME (o ~/.local/share) altrove: non la temp di sistema, che
+    su Linux viene svuotata al riavvio.
+    """
+    base = os.environ.get("LOCALAPPDATA")
+    if not base:
+        if sys.platform == "darwin":
+            base = os.path.join(os.path.expanduser("~"), "Library", "Application Support")
+        else:
+            base = os.environ.get("XDG_DATA_HOME") or os.path.join(
+                os.path.expanduser("~"), ".local", "share"
+            )
+    return os.path.join(base, "yt-dlp-gui")
+
+
 def _can_write_dir(directory):
     try:
         os.makedirs(directory, exist_ok=True)
@@ -49,15 +82,24 @@ def _can_write_dir(directory):
         return False
 
 
+def _persistent_ffmpeg_candidates():
+    return (
+        os.path.join(get_app_dir(), "ffmpeg", "bin"),
+        os.path.join(get_user_data_dir(), "ffmpeg", "bin"),
+    )
+
+
 def get_persistent_ffmpeg_dir():
     """Cartella ffmpeg/bin persistente; fallback in LOCALAPPDATA se non scrivibile."""
-    primary = os.path.join(get_app_dir(), "ffmpeg", "bin")
-    fallback = os.path.join(
-        os.environ.get("LOCALAPPDATA", tempfile.gettempdir()),
-        "yt-dlp-gui",
-        "ffmpeg",
-        "bin",
-    )
+    snap = _ffmpeg_snapshot
+    if snap is not None:
+        # Scelta già fatta (anche da cache su disco): niente test di scrittura
+        return snap["persistent_dir"]
+    return _resolve_persistent_ffmpeg_dir()
+
+
+def _resolve_persistent_ffmpeg_dir():
+    primary, fallback = _persistent_ffmpeg_candidates()
     if os.path.normpath(primary) == os.path.normpath(fallback):
         return primary
     if _is_valid_ffmpeg_dir(primary, use_cache=True) or _can_write_dir(primary):
@@ -97,14 +139,14 @@ def _is_valid_ffmpeg_dir(directory, use_cache=True):
 
 
 def _build_ffmpeg_snapshot():
-    persistent_dir = get_persistent_ffmpeg_dir()
+    persistent_dir = _resolve_persistent_ffmpeg_dir()
     bundled_dir = get_bundled_ffmpeg_dir()
     persistent_valid = _is_valid_ffmpeg_dir(persistent_dir)
     bundled_valid = (
         os.path.normpath(bundled_dir) != os.path.normpath(persistent_dir)
         and _is_valid_ffmpeg_dir(bundled_dir)
     )
-    system = shutil.which("ffmpeg") is not None
+    system_path = shutil.which("ffmpeg")
 
     if persistent_valid:
         local_dir = persistent_dir
@@ -121,7 +163,9 @@ def _build_ffmpeg_snapshot():
     )
 
     return {
-        "system": system,
+        "system": system_path is not None,
+        "system_path": system_path,
+        "system_probe_path": shutil.which("ffprobe"),
         "persistent_dir": persistent_dir,
         "bundled_dir": bundled_dir,
         "persistent_valid": persistent_valid,
@@ -131,15 +175,96 @@ def _build_ffmpeg_snapshot():
         "local_kind": local_kind,
         "local_path": os.path.join(local_dir, FFMPEG_EXE) if local_dir else None,
         "ytdlp_location": ytdlp_location,
-        "available": system or persistent_valid or bundled_valid,
+        "available": system_path is not None or persistent_valid or bundled_valid,
     }
 
 
+def _file_signature(path):
+    """(percorso, dimensione, mtime) del file, None se non esiste."""
+    if not path:
+        return None
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [os.path.normcase(os.path.abspath(path)), st.st_size, st.st_mtime_ns]
+
+
+def _ffmpeg_fingerprint(system_path, system_probe_path):
+    """Impronta dei binari ffmpeg candidati: solo stat(), nessun processo.
+
+    Copre le cartelle persistenti e bundled, il PATH e i binari di sistema
+    trovati l'ultima volta: se nulla di questo cambia, il rilevamento
+    precedente è ancora valido.
+    """
+    dirs = [*_persistent_ffmpeg_candidates(), get_bundled_ffmpeg_dir()]
+    return {
+        "version": FFMPEG_CACHE_VERSION,
+        "path_env": os.environ.get("PATH", ""),
+        "dirs": [
+            [
+                os.path.normcase(os.path.abspath(d)),
+                _file_signature(os.path.join(d, FFMPEG_EXE)),
+                _file_signature(os.path.join(d, FFPROBE_EXE)),
+            ]
+            for d in dirs
+        ],
+        "system": [_file_signature(system_path), _file_signature(system_probe_path)],
+    }
+
+
+def _load_cached_snapshot():
+    try:
+        with open(_ffmpeg_cache_path(), encoding="utf-8") as handle:
+            data = json.load(handle)
+        snap = data["snapshot"]
+        expected = _ffmpeg_fingerprint(
+            snap.get("system_path"), snap.get("system_probe_path")
+        )
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        return None
+    return snap if data.get("fingerprint") == expected else None
+
+
+def _save_cached_snapshot(snap):
+    path = _ffmpeg_cache_path()
+    data = {
+        "fingerprint": _ffmpeg_fingerprint(
+            snap["system_path"], snap["system_probe_path"]
+        ),
+        "snapshot": snap,
+    }
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as handle:
+            json.dump(data, handle)
+        os.replace(temp_path, path)
+    except OSError:
+        pass
+
+
+def get_cached_ffmpeg_snapshot():
+    """Snapshot di ffmpeg senza avviare processi; None se va rivalidato.
+
+    Usa quello in memoria o quello su disco se i binari non sono cambiati
+    (stessi percorsi, dimensioni e date di modifica).
+    """
+    global _ffmpeg_snapshot
+    with _ffmpeg_lock:
+        if _ffmpeg_snapshot is None:
+            _ffmpeg_snapshot = _load_cached_snapshot()
+        return _ffmpeg_snapshot
+
+
 def get_ffmpeg_snapshot():
+    """Snapshot di ffmpeg; se la cache non è valida esegue il rilevamento (lento)."""
     global _ffmpeg_snapshot
-    if _ffmpeg_snapshot is None:
-        _ffmpeg_snapshot = _build_ffmpeg_snapshot()
-    return _ffmpeg_snapshot
+    with _ffmpeg_lock:
+        if get_cached_ffmpeg_snapshot() is None:
+            _ffmpeg_snapshot = _build_ffmpeg_snapshot()
+            _save_cached_snapshot(_ffmpeg_snapshot)
+        return _ffmpeg_snapshot
 
 
 def has_system_ffmpeg():
@@ -163,6 +288,14 @@ def get_local_ffmpeg_path():
     return snap["local_path"] or os.path.join(get_persistent_ffmpeg_dir(), FFMPEG_EXE)
 
 
+def get_ffprobe_path():
+    """ffprobe locale (persistente o bundled) se presente, altrimenti quello del PATH."""
+    snap = get_ffmpeg_snapshot()
+    if snap["local_dir"]:
+        return os.path.join(snap["local_dir"], FFPROBE_EXE)
+    return snap["system_probe_path"]
+
+
 def get_ffmpeg_status():
     return get_ffmpeg_snapshot()["available"]
 
@@ -171,17 +304,6 @@ def get_ffmpeg_location_for_ytdlp():
     return get_ffmpeg_snapshot()["ytdlp_location"]
 
 
-def parse_urls(text):
-    """Estrae URL da testo (una o più righe, spazi come separatore secondario)."""
-    urls = []
-    for line in text.replace("\r\n", "\n").split("\n"):
-        for part in line.split():
-            part = part.strip()
-            if part:
-                urls.append(part)
-    return urls
-
-
 def sanitize_log_text(text):
     """Rimuove codici ANSI e caratteri di controllo per log leggibili in QTextEdit."""
     if text is None: